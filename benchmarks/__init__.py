@@ -0,0 +1,5 @@
+"""
+Benchmarks de rendimiento con generadores de datos sintéticos.
+
+Uso: python -m benchmarks.run --scale 1 10 100
+"""
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use('Agg')  # Los benchmarks nunca abren ventanas
+
+# Los scripts del proyecto están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import synthetic
+
+# ----------------------------------------------------------
+# Tamaños base (escala 1 ~ volumen actual de datos del proyecto)
+# ----------------------------------------------------------
+BASE_SIZES = {
+    'html_pages': 20,        # páginas de CavityPlus
+    'cavities': 10,          # cavidades por página / por .xlsx
+    'xlsx_files': 10,        # .xlsx por carpeta (4 carpetas)
+    'rawdata_rows': 200,     # filas de RawData.csv
+    'rmsd_models': 4,        # modelos por matriz RMSD
+    'pdb_residues': 600,     # residuos por modelo PDB
+}
+
+
+# ----------------------------------------------------------
+# Medición: tiempo mínimo y pico de memoria
+# ----------------------------------------------------------
+def measure(fn, repeat=3):
+    """
+    Ejecuta fn `repeat` veces y devuelve (mejor_tiempo_s, pico_memoria_MB).
+    El pico se mide con tracemalloc en una ejecución aparte, para que el
+    rastreo no distorsione los tiempos.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 2**20
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silencia la salida por consola de los scripts medidos."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+# ----------------------------------------------------------
+# Benchmarks por script
+# ----------------------------------------------------------
+def bench_parsing(tmp, scale, repeat):
+    import parsingCavityPlus
+    n_pages = BASE_SIZES['html_pages'] * scale
+    paths = synthetic.write_cavityplus_pages(os.path.join(tmp, 'html'), n_pages,
+                                             BASE_SIZES['cavities'])
+    yield 'parsingCavityPlus.parse_files', n_pages, measure(
+        lambda: parsingCavityPlus.parse_files(paths, workers=1), repeat)
+
+    import scoresResume
+    frames = parsingCavityPlus.parse_files(paths, workers=1)
+    root = os.path.join(tmp, 'dataset')
+    yield 'parsingCavityPlus.write_dataset', n_pages, measure(
+        lambda: parsingCavityPlus.write_dataset(paths, frames, root), repeat)
+
+    def dataset_resume():
+        with quiet():
+            scoresResume.process_dataset(root, out_dir=os.path.join(tmp, 'resumen'))
+
+    yield 'scoresResume.process_dataset', n_pages, measure(dataset_resume, repeat)
+
+
+def bench_resume(tmp, scale, repeat):
+    import scoresResume
+    n_files = BASE_SIZES['xlsx_files'] * scale
+    folders = synthetic.write_cavity_folders(os.path.join(tmp, 'TopModels'), 4, n_files,
+                                             BASE_SIZES['cavities'])
+
+    def full():
+        with quiet():
+            scoresResume.process_folders(folders, incremental=False, workers=1)
+
+    def incremental():
+        with quiet():
+            scoresResume.process_folders(folders, incremental=True, workers=1)
+
+    yield 'scoresResume.process_folders (completo)', 4 * n_files, measure(full, repeat)
+    incremental()  # Deja el manifiesto al día
+    yield 'scoresResume.process_folders (incremental)', 4 * n_files, measure(incremental, repeat)
+
+
+def _import_dashboard(tmp, n_rows):
+    # scoresDashboard carga el CSV de forma diferida: basta con apuntarlo
+    csv_path = os.path.join(tmp, 'RawData.csv')
+    synthetic.write_rawdata_csv(csv_path, n_rows)
+    import scoresDashboard
+    scoresDashboard.use_data_source(csv_path)
+    with quiet():
+        scoresDashboard.get_data()
+    return scoresDashboard, csv_path
+
+
+def bench_dashboard(tmp, scale, repeat):
+    n_rows = BASE_SIZES['rawdata_rows'] * scale
+    D, csv_path = _import_dashboard(tmp, n_rows)
+    args = (True, ['MON'], ['AF', 'SM'], 10, None, None, ['Base', 'Relaxed1'], False, 5)
+
+    def cold():
+        D._filter_index = None  # Fuerza la construcción del índice
+        D.filter_data(D.df, *args)
+
+    def warm():
+        D.filter_data(D.df, *args)
+
+    def selection():
+        return D.update_selection([True], ['MON'], ['AF', 'SM'], None, None,
+                                  ['Base', 'Relaxed1'], [], 5)
+
+    selected = selection()
+
+    with quiet():
+        load = measure(lambda: D.load_data(csv_path, use_cache=False), repeat)
+    yield 'scoresDashboard.load_data (sin caché)', n_rows, load
+    yield 'scoresDashboard.filter_data (índice nuevo)', n_rows, measure(cold, repeat)
+    yield 'scoresDashboard.filter_data (caché)', n_rows, measure(warm, repeat)
+    with quiet():
+        D.open_shared_store(csv_path)  # Primera apertura: construye el almacén
+
+    def attach():
+        with quiet():
+            D.open_shared_store(csv_path)
+
+    yield 'scoresDashboard.open_shared_store (abrir)', n_rows, measure(attach, repeat)
+    yield 'scoresDashboard.update_selection', n_rows, measure(selection, repeat)
+    yield 'scoresDashboard.update_ranking', n_rows, measure(
+        lambda: D.update_ranking(selected, 10, 1), repeat)
+    yield 'scoresDashboard.update_distribution', n_rows, measure(
+        lambda: D.update_distribution(selected), repeat)
+    yield 'scoresDashboard.update_model_ranking', n_rows, measure(
+        lambda: D.update_model_ranking(selected), repeat)
+
+
+def bench_heatmap(tmp, scale, repeat):
+    import heatMaps
+    n = BASE_SIZES['rmsd_models'] * scale
+    matrix = synthetic.rmsd_matrix(n)
+    labels = [f"M{k}" for k in range(n)]
+    out = os.path.join(tmp, 'heatmap.png')
+    yield 'heatMaps.plot_heatmap_with_values', n, measure(
+        lambda: heatMaps.plot_heatmap_with_values(matrix, labels, 'bench', out, show=False), repeat)
+
+
+def bench_rmsd(tmp, scale, repeat):
+    import rmsdEnsemble
+    n = BASE_SIZES['rmsd_models'] * scale
+    directory = os.path.join(tmp, 'pdbs')
+    synthetic.write_pdb_ensemble(directory, n, BASE_SIZES['pdb_residues'])
+    yield 'rmsdEnsemble.load_ensemble', n, measure(
+        lambda: rmsdEnsemble.load_ensemble(directory), repeat)
+    _, coords = rmsdEnsemble.load_ensemble(directory)
+    yield 'rmsdEnsemble.rmsd_condensed', n, measure(
+        lambda: rmsdEnsemble.rmsd_condensed(coords), repeat)
+
+
+def bench_ramachandran(tmp, scale, repeat):
+    import ramachandranScore
+    n = BASE_SIZES['rmsd_models'] * scale
+    paths = synthetic.write_pdb_ensemble(os.path.join(tmp, 'pdbs'), n, BASE_SIZES['pdb_residues'])
+    # Esqueletos con geometría real: si algo fuese NaN solo se mediría la lectura
+    rows = ramachandranScore.score_files(paths, workers=1)
+    assert all(math.isfinite(v) for row in rows for v in list(row.values())[1:]), rows[:3]
+    yield 'ramachandranScore.score_files', n, measure(
+        lambda: ramachandranScore.score_files(paths, workers=1), repeat)
+
+
+def bench_consensus(tmp, scale, repeat):
+    import cavityConsensus
+    n_pages = BASE_SIZES['html_pages'] * scale
+    synthetic.write_cavityplus_pages(os.path.join(tmp, 'html'), n_pages, BASE_SIZES['cavities'])
+    cavities = cavityConsensus.load_cavities([os.path.join(tmp, 'html')], workers=1)
+    yield 'cavityConsensus.consensus_pockets', len(cavities), measure(
+        lambda: cavityConsensus.consensus_pockets(cavities), repeat)
+
+
+def bench_ranking(tmp, scale, repeat):
+    import modelRanking
+    n_rows = BASE_SIZES['rawdata_rows'] * scale
+    df = synthetic.rawdata_frame(n_rows)
+    criteria = modelRanking.find_criteria(df.columns)
+    matrix = modelRanking.criteria_matrix(df, criteria)
+    yield 'modelRanking.pareto_front (2 criterios)', n_rows, measure(
+        lambda: modelRanking.pareto_front(matrix[:, :2]), repeat)
+    yield 'modelRanking.pareto_front', n_rows, measure(
+        lambda: modelRanking.pareto_front(matrix), repeat)
+    ranking, _, _ = modelRanking.rank_models(df.assign(Software=df['FileName'].str.split('-').str[1]))
+    yield 'modelRanking.bootstrap_ci', n_rows, measure(
+        lambda: modelRanking.bootstrap_ci(ranking, ['Software'], 'Score'), repeat)
+
+
+BENCHMARKS = {
+    'parsing': bench_parsing,
+    'resume': bench_resume,
+    'dashboard': bench_dashboard,
+    'heatmap': bench_heatmap,
+    'rmsd': bench_rmsd,
+    'consensus': bench_consensus,
+    'ramachandran': bench_ramachandran,
+    'ranking': bench_ranking,
+}
+
+
+# ----------------------------------------------------------
+# Ejecución desde línea de comandos
+# ----------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks de tiempo y memoria con datos sintéticos escalables."
+    )
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10],
+                        help="Factores de escala respecto a BASE_SIZES")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS),
+                        help="Ejecuta solo estos grupos")
+    parser.add_argument('--repeat', type=int, default=3, help="Repeticiones por medida")
+    parser.add_argument('--json', help="Añade los resultados como líneas JSON a este archivo")
+    args = parser.parse_args(argv)
+
+    names = args.only or list(BENCHMARKS)
+    results = []
+    print(f"{'benchmark':48s} {'escala':>6s} {'n':>8s} {'tiempo (s)':>11s} {'pico (MB)':>10s}")
+    for scale in args.scale:
+        for name in names:
+            with tempfile.TemporaryDirectory() as tmp:
+                for label, n, (seconds, peak) in BENCHMARKS[name](tmp, scale, args.repeat):
+                    print(f"{label:48s} {scale:6d} {n:8d} {seconds:11.4f} {peak:10.2f}")
+                    results.append({'benchmark': label, 'scale': scale, 'n': n,
+                                    'seconds': seconds, 'peak_mb': peak})
+
+    if args.json:
+        with open(args.json, 'a', encoding='utf-8') as fh:
+            for row in results:
+                fh.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------
+# Vocabulario de los nombres de archivo del proyecto
+# ----------------------------------------------------------
+STRUCTURES = ['MON', 'DIM']
+SOFTWARES = ['AF', 'RF', 'SM', 'MD']
+PROTEINS = ['NCChumano', 'NCCAnguila']
+RELAX_LEVELS = ['', 'Relaxed1', 'Relaxed2', 'Relaxed3']
+DRUGGABILITY = ['Weak', 'Medium', 'Strong']
+
+
+# ----------------------------------------------------------
+# Páginas de resultados de CavityPlus
+# ----------------------------------------------------------
+def cavityplus_html(n_cavities, seed=0):
+    """
+    Página HTML con la estructura de resultados de CavityPlus: una fila
+    principal por cavidad seguida de su fila de detalle colapsable.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(1, n_cavities + 1):
+        rows.append(
+            f'<tr data-v-92dc5b31=""><td>{i}</td>'
+            f'<td>{rng.uniform(4, 9):.2f}</td><td>{rng.uniform(3, 7):.2f}</td>'
+            f'<td>{rng.uniform(-1, 2):.2f}</td>'
+            f'<td>{DRUGGABILITY[rng.integers(3)]}</td></tr>'
+        )
+        residues = ' '.join(f"A:ALA{r}" for r in np.sort(rng.choice(600, 12, replace=False)) + 1)
+        details = [
+            ('Surface Area (Å2)', f"{rng.uniform(100, 2500):.1f}"),
+            ('Volume (Å3)', f"{rng.uniform(100, 4000):.1f}"),
+            ('Residues', residues),
+        ]
+        detail = ''.join(f'<tr><th>{k}</th><td>{v}</td></tr>' for k, v in details)
+        rows.append(f'<tr id="collapse{i}"><td colspan="5"><div><table>{detail}</table></div></td></tr>')
+    return (
+        '<html><head><meta charset="utf-8"></head><body>'
+        '<table data-v-92dc5b31="" class="table align-center text-center">'
+        '<thead><tr><th>Index</th><th>Pred Max pKd</th><th>Pred Ave pKd</th>'
+        '<th>DrugScore</th><th>Druggability</th></tr></thead>'
+        f'<tbody>{"".join(rows)}</tbody></table></body></html>'
+    )
+
+
+def write_cavityplus_pages(directory, n_pages, n_cavities, seed=0):
+    """Escribe n_pages páginas HTML y devuelve sus rutas."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for k in range(n_pages):
+        path = os.path.join(directory, f"{model_name(k, seed)}.html")
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(cavityplus_html(n_cavities, seed + k))
+        paths.append(path)
+    return paths
+
+
+# ----------------------------------------------------------
+# Datos MolProbity (RawData.csv)
+# ----------------------------------------------------------
+def model_name(k, seed=0):
+    """Nombre de modelo válido para load_data, p. ej. MON-AF-NCChumano-03-Relaxed2-000017."""
+    rng = np.random.default_rng((seed, k))
+    relax = RELAX_LEVELS[rng.integers(len(RELAX_LEVELS))]
+    parts = [STRUCTURES[rng.integers(2)], SOFTWARES[rng.integers(4)],
+             PROTEINS[rng.integers(2)], f"{rng.integers(1, 6):02d}"]
+    if relax:
+        parts.append(relax)
+    parts.append(f"{k:06d}")
+    return '-'.join(parts)
+
+
+def rawdata_frame(n_rows, seed=0):
+    """DataFrame con el esquema de RawData.csv y nombres de archivo válidos."""
+    rng = np.random.default_rng(seed)
+    structure = np.array(STRUCTURES)[rng.integers(2, size=n_rows)]
+    software = np.array(SOFTWARES)[rng.integers(4, size=n_rows)]
+    protein = np.array(PROTEINS)[rng.integers(2, size=n_rows)]
+    model = rng.integers(1, 6, size=n_rows)
+    relax = np.array(RELAX_LEVELS)[rng.integers(len(RELAX_LEVELS), size=n_rows)]
+    names = [
+        f"{s}-{sw}-{p}-{m:02d}" + (f"-{r}" if r else '') + f"-{k:06d}"
+        for k, (s, sw, p, m, r) in enumerate(zip(structure, software, protein, model, relax))
+    ]
+    return pd.DataFrame({
+        'FileName': names,
+        'Ramachandran Favored (>98%)': np.round(100 - rng.gamma(1.5, 1.2, n_rows), 2),
+        'Ramachandran Outliers (<0.05%)': np.round(rng.exponential(0.1, n_rows), 2),
+        'Ramachandran Z-Score (abs(ZScore)<2)': np.round(rng.normal(-0.5, 1.2, n_rows), 2),
+        'Clashscore': np.round(rng.gamma(2.0, 3.0, n_rows), 2),
+        'Rotamer Outliers (%)': np.round(rng.exponential(1.0, n_rows), 2),
+    })
+
+
+def write_rawdata_csv(path, n_rows, seed=0):
+    rawdata_frame(n_rows, seed).to_csv(path, index=False)
+    return path
+
+
+# ----------------------------------------------------------
+# Carpetas de tablas de cavidades (.xlsx)
+# ----------------------------------------------------------
+def cavity_frame(n_cavities, seed=0):
+    """Tabla de cavidades con las columnas que usa scoresResume."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Index': np.arange(1, n_cavities + 1),
+        'Pred Max pKd': np.round(rng.uniform(4, 9, n_cavities), 2),
+        'Pred Ave pKd': np.round(rng.uniform(3, 7, n_cavities), 2),
+        'DrugScore': np.round(rng.uniform(-1, 2, n_cavities), 2),
+        'Druggability': np.array(DRUGGABILITY)[rng.integers(3, size=n_cavities)],
+        'Surface Area (Å2)': np.round(rng.uniform(100, 2500, n_cavities), 1),
+    })
+
+
+def write_cavity_folders(root, n_folders, n_files, n_cavities, seed=0):
+    """Crea n_folders carpetas con n_files .xlsx cada una; devuelve las carpetas."""
+    folders = []
+    for f in range(n_folders):
+        folder = os.path.join(root, f"folder{f:02d}")
+        os.makedirs(folder, exist_ok=True)
+        for k in range(n_files):
+            name = model_name(f * n_files + k, seed)
+            cavity_frame(n_cavities, seed + f * n_files + k).to_excel(
+                os.path.join(folder, name + '.xlsx'), index=False)
+        folders.append(folder)
+    return folders
+
+
+# ----------------------------------------------------------
+# Matrices RMSD y ensambles PDB
+# ----------------------------------------------------------
+def ensemble_coords(n_models, n_atoms, noise=0.8, seed=0):
+    """
+    Coordenadas (n_modelos, n_átomos, 3): una estructura base con ruido,
+    rotada y trasladada al azar en cada modelo.
+    """
+    rng = np.random.default_rng(seed)
+    base = np.cumsum(rng.normal(size=(n_atoms, 3)) * 2.2, axis=0)
+    q = rng.normal(size=(n_models, 4))
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    a, b, c, d = q.T
+    R = np.stack([
+        np.stack([a*a + b*b - c*c - d*d, 2*(b*c - a*d), 2*(b*d + a*c)], -1),
+        np.stack([2*(b*c + a*d), a*a - b*b + c*c - d*d, 2*(c*d - a*b)], -1),
+        np.stack([2*(b*d - a*c), 2*(c*d + a*b), a*a - b*b - c*c + d*d], -1),
+    ], 1)
+    X = base + rng.normal(size=(n_models, n_atoms, 3)) * noise
+    return np.einsum('mij,mnj->mni', R, X) + rng.normal(size=(n_models, 1, 3)) * 10
+
+
+def rmsd_matrix(n, seed=0):
+    """Matriz simétrica con diagonal cero y valores RMSD plausibles (0.5-3 Å)."""
+    rng = np.random.default_rng(seed)
+    m = rng.uniform(0.5, 3.0, size=(n, n))
+    m = (m + m.T) / 2
+    np.fill_diagonal(m, 0.0)
+    return m
+
+
+# Geometría ideal del esqueleto peptídico (Engh & Huber): enlaces en Å y
+# ángulos en grados
+BOND = {'N-CA': 1.458, 'CA-C': 1.525, 'C-N': 1.329}
+ANGLE = {'N-CA-C': 111.2, 'CA-C-N': 116.2, 'C-N-CA': 121.7}
+# Conformaciones base de las que se muestrean phi/psi (hélice alfa y lámina beta)
+PHI_PSI = [(-63.0, -43.0), (-120.0, 130.0)]
+
+
+def _place(a, b, c, bond, angle, torsion):
+    """Posición del átomo d con |cd| = bond, ángulo b-c-d y diedro a-b-c-d (NeRF)."""
+    bc = c - b
+    bc /= np.linalg.norm(bc, axis=-1, keepdims=True)
+    n = np.cross(b - a, bc)
+    n /= np.linalg.norm(n, axis=-1, keepdims=True)
+    m = np.cross(n, bc)
+    theta, chi = np.radians(angle), np.radians(torsion)
+    return (c - bond * np.cos(theta) * bc
+            + (bond * np.sin(theta) * np.cos(chi))[..., None] * m
+            + (bond * np.sin(theta) * np.sin(chi))[..., None] * n)
+
+
+def backbone_coords(n_models, n_residues, angle_noise=8.0, seed=0):
+    """
+    Coordenadas N, CA, C (n_modelos, 3 * n_residuos, 3) con enlaces y
+    ángulos ideales y omega = 180. Cada residuo toma phi/psi de hélice o
+    lámina; cada modelo añade ruido angular (grados) y una rotación y
+    traslación al azar, así que las puntuaciones Ramachandran son finitas
+    y los RMSD entre modelos, plausibles.
+    """
+    rng = np.random.default_rng(seed)
+    base = np.array(PHI_PSI)[rng.integers(len(PHI_PSI), size=n_residues)]
+    angles = base + rng.normal(scale=angle_noise, size=(n_models, n_residues, 2))
+    phi, psi = angles[..., 0], angles[..., 1]
+
+    X = np.empty((n_models, 3 * n_residues, 3))
+    # Primer residuo en el plano xy
+    X[:, 0] = 0.0
+    X[:, 1] = [BOND['N-CA'], 0.0, 0.0]
+    t = np.radians(180.0 - ANGLE['N-CA-C'])
+    X[:, 2] = X[:, 1] + BOND['CA-C'] * np.array([np.cos(t), np.sin(t), 0.0])
+    for r in range(1, n_residues):
+        a = 3 * r
+        X[:, a] = _place(X[:, a - 3], X[:, a - 2], X[:, a - 1],
+                         BOND['C-N'], ANGLE['CA-C-N'], psi[:, r - 1])
+        X[:, a + 1] = _place(X[:, a - 2], X[:, a - 1], X[:, a],
+                             BOND['N-CA'], ANGLE['C-N-CA'], np.full(n_models, 180.0))
+        X[:, a + 2] = _place(X[:, a - 1], X[:, a], X[:, a + 1],
+                             BOND['CA-C'], ANGLE['N-CA-C'], phi[:, r])
+
+    q = rng.normal(size=(n_models, 4))
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    a, b, c, d = q.T
+    R = np.stack([
+        np.stack([a*a + b*b - c*c - d*d, 2*(b*c - a*d), 2*(b*d + a*c)], -1),
+        np.stack([2*(b*c + a*d), a*a - b*b + c*c - d*d, 2*(c*d - a*b)], -1),
+        np.stack([2*(b*d - a*c), 2*(c*d + a*b), a*a - b*b - c*c + d*d], -1),
+    ], 1)
+    return np.einsum('mij,mnj->mni', R, X) + rng.normal(size=(n_models, 1, 3)) * 10
+
+
+def write_pdb_ensemble(directory, n_models, n_residues, angle_noise=8.0, seed=0):
+    """Escribe un PDB por modelo con átomos N, CA y C por residuo (geometría ideal)."""
+    os.makedirs(directory, exist_ok=True)
+    coords = backbone_coords(n_models, n_residues, angle_noise, seed)
+    names = ('N', 'CA', 'C')
+    paths = []
+    for k, X in enumerate(coords):
+        path = os.path.join(directory, f"{model_name(k, seed)}.pdb")
+        lines = []
+        for a, (x, y, z) in enumerate(X):
+            res = a // 3 + 1
+            name = names[a % 3]
+            lines.append(
+                f"ATOM  {a + 1:5d}  {name:<3s} ALA A{res:4d}    "
+                f"{x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00           {name[0]}\n"
+            )
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.writelines(lines)
+            fh.write("END\n")
+        paths.append(path)
+    return paths
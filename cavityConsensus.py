@@ -0,0 +1,413 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from parsingCavityPlus import expand_inputs, parse_files, save_table
+
+# ----------------------------------------------------------
+# Configuración del consenso de cavidades
+# ----------------------------------------------------------
+# Métodos de modelado, tal como aparecen en los nombres de archivo
+METHODS = ['AF', 'RF', 'SM', 'MD']
+
+# Residuo en la lista de CavityPlus: cadena opcional, nombre y número
+# (p. ej. 'A:ALA542', 'B:GLY12', 'ALA542' o '542') o un rango de números
+# ('542-546'). Cada token completo, separado por espacios, comas o punto
+# y coma; un token que no es un residuo (p. ej. 'X12') se ignora entero.
+RESIDUE_PATTERN = re.compile(
+    r'(?<![^\s,;])(?:(?P<chain>[A-Za-z0-9]):)?(?P<name>[A-Za-z]{3})?'
+    r'(?P<num>\d+)(?:-(?P<end>\d+))?(?![^\s,;])'
+)
+# Columnas de las tablas que escribe este script (bolsillos y
+# asignaciones): una tabla con ellas no es una lista de cavidades
+OUTPUT_COLUMNS = ('Pocket', 'Core Residues')
+
+# Jaccard mínimo entre dos cavidades para considerarlas el mismo bolsillo
+JACCARD_MIN = 0.3
+# Fracción de miembros en la que debe estar un residuo para ser del núcleo
+CORE_MIN = 0.5
+# Enlace con el que se valida cada componente conexa (ver consensus_pockets)
+LINKAGE = 'average'
+# Cavidades máximas de un componente para refinarlo (matriz densa m²/2)
+LINKAGE_MAX = 8000
+# Palabras de 64 bits procesadas por bloque (limita la memoria temporal)
+BLOCK_WORDS = 1 << 22
+
+
+# ----------------------------------------------------------
+# Carga de cavidades: HTML de CavityPlus o tablas ya exportadas
+# ----------------------------------------------------------
+def method_of(name):
+    """Método de modelado (AF, RF, SM, MD) a partir del nombre de archivo."""
+    for token in re.split(r'[-_. ]', os.path.basename(name).upper()):
+        if token in METHODS:
+            return token
+    return 'NA'
+
+
+def _residue_column(df):
+    """Columna con las listas de residuos de cada cavidad, o None."""
+    for col in df.columns:
+        name = str(col).lower()
+        if ('residue' in name and col not in OUTPUT_COLUMNS
+                and not pd.api.types.is_numeric_dtype(df[col])):
+            return col
+    return None
+
+
+def _is_cavity_table(df):
+    # Cavidades de un modelo: Index y residuos, sin columnas de salida propias
+    return ('Index' in df.columns and _residue_column(df) is not None
+            and not any(col in df.columns for col in OUTPUT_COLUMNS))
+
+
+def load_cavities(inputs, workers=None):
+    """
+    Lee cavidades de páginas HTML, tablas .xlsx/.csv (p. ej. la tabla
+    combinada de parsingCavityPlus) o carpetas con cualquiera de ellas.
+    Solo se aceptan tablas con Index y una columna de residuos; el resto
+    (p. ej. consenso_bolsillos.xlsx guardado en la misma carpeta) se
+    omite con un aviso.
+
+    Devuelve un DataFrame con SourceFile, Index, Method y Residues.
+    """
+    html, tables = [], []
+    for item in inputs:
+        if os.path.isdir(item):
+            html.extend(expand_inputs([item]))
+            tables.extend(os.path.join(item, f) for f in sorted(os.listdir(item))
+                          if f.endswith(('.xlsx', '.csv')))
+        elif item.endswith(('.xlsx', '.csv')):
+            tables.append(item)
+        else:
+            html.extend(expand_inputs([item]))
+
+    frames = parse_files(html, workers) if html else []
+    for path in tables:
+        df = pd.read_csv(path) if path.endswith('.csv') else pd.read_excel(path)
+        if not _is_cavity_table(df):
+            print(f"Aviso: se omite {path}: no es una tabla de cavidades (Index y residuos)")
+            continue
+        if 'SourceFile' not in df.columns:
+            df.insert(0, 'SourceFile', os.path.basename(path))
+        frames.append(df)
+    if not frames:
+        raise SystemExit("No se encontraron cavidades en las entradas indicadas.")
+
+    cavities = []
+    for df in frames:
+        column = _residue_column(df)
+        if column is None:
+            raise KeyError(f"{df['SourceFile'].iloc[0]}: la página no tiene una columna de residuos")
+        cavities.append(pd.DataFrame({
+            'SourceFile': df['SourceFile'].astype(str),
+            'Index': df['Index'],
+            'Residues': df[column].fillna('').astype(str),
+        }))
+    cavities = pd.concat(cavities, ignore_index=True)
+    cavities.insert(2, 'Method', [method_of(s) for s in cavities['SourceFile']])
+    return cavities
+
+
+# ----------------------------------------------------------
+# Residuos como bitsets sobre la secuencia
+# ----------------------------------------------------------
+class ResidueSets:
+    """
+    Cavidades codificadas como bitsets (una fila de palabras uint64 por
+    cavidad) sobre el universo de residuos observados, con un índice
+    invertido residuo -> cavidades en formato CSR.
+
+    - labels: etiqueta de cada bit (p. ej. 'A:ALA542').
+    - bits: array (n_cavidades, n_palabras) uint64.
+    - sizes: número de residuos de cada cavidad.
+    - cav_ptr / cav_res: residuos de cada cavidad (CSR).
+    - res_ptr / res_cav: cavidades que contienen cada residuo (CSR).
+    """
+
+    def __init__(self, residue_lists):
+        keys = {}
+        rows, cols = [], []
+        for i, text in enumerate(residue_lists):
+            for m in RESIDUE_PATTERN.finditer(text):
+                chain = (m['chain'] or '').upper()
+                label = f"{chain}:" if chain else ''
+                first = int(m['num'])
+                last = int(m['end']) if m['end'] else first
+                # Un rango se expande a sus residuos; el nombre solo
+                # identifica al primero
+                for num in range(first, last + 1):
+                    key = (chain, num)
+                    if key not in keys:
+                        name = (m['name'] or '').upper() if num == first else ''
+                        keys[key] = f"{label}{name}{num}"
+                    rows.append(i)
+                    cols.append(key)
+
+        # Bits ordenados por cadena y número de residuo (orden de secuencia)
+        universe = sorted(keys)
+        position = {key: b for b, key in enumerate(universe)}
+        self.labels = [keys[key] for key in universe]
+        n, u = len(residue_lists), len(universe)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.fromiter((position[key] for key in cols), dtype=np.int64, count=len(cols))
+        member = np.zeros((n, max(u, 1)), dtype=bool)
+        member[rows, cols] = True
+
+        # Empaquetado en palabras de 64 bits (relleno a múltiplo de 8 bytes)
+        packed = np.packbits(member, axis=1)
+        pad = -packed.shape[1] % 8
+        packed = np.pad(packed, ((0, 0), (0, pad)))
+        self.bits = np.ascontiguousarray(packed).view(np.uint64)
+        self.sizes = np.bitwise_count(self.bits).sum(axis=1, dtype=np.int64)
+
+        # Índices CSR en ambos sentidos sin duplicados
+        ci, cr = np.nonzero(member[:, :u])
+        self.cav_ptr = np.concatenate([[0], np.cumsum(np.bincount(ci, minlength=n))])
+        self.cav_res = cr
+        order = np.argsort(cr, kind='stable')
+        self.res_ptr = np.concatenate([[0], np.cumsum(np.bincount(cr, minlength=u))])
+        self.res_cav = ci[order]
+
+    def __len__(self):
+        return self.bits.shape[0]
+
+    def cavities_with(self, residues):
+        """Cavidades que comparten al menos un residuo con la lista dada."""
+        residues = np.asarray(residues, dtype=np.int64)
+        if residues.size == 0:
+            return np.empty(0, dtype=np.int64)
+        starts, ends = self.res_ptr[residues], self.res_ptr[residues + 1]
+        lengths = ends - starts
+        # Rangos concatenados de las listas de cada residuo
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return np.unique(self.res_cav[offsets + np.arange(lengths.sum())])
+
+
+def jaccard_pairs(sets, threshold=JACCARD_MIN, groups=None):
+    """
+    Pares (i, j, jaccard) con i < j y jaccard >= threshold.
+
+    Las filas se procesan por bloques: el índice invertido limita las
+    columnas a las cavidades que comparten algún residuo con el bloque, y
+    la intersección se cuenta con AND + popcount sobre los bitsets.
+    Con groups (un código por cavidad) se ignoran los pares del mismo
+    grupo, p. ej. dos cavidades distintas de un mismo modelo.
+    """
+    n, words = sets.bits.shape
+    out_i, out_j, out_s = [], [], []
+    start = 0
+    while start < n:
+        # Bloque que cabe en BLOCK_WORDS con el peor caso de candidatos
+        step = max(1, BLOCK_WORDS // max(1, (n - start) * words))
+        stop = min(n, start + step)
+        block_res = sets.cav_res[sets.cav_ptr[start]:sets.cav_ptr[stop]]
+        cand = sets.cavities_with(np.unique(block_res))
+        cand = cand[cand > start]
+        if cand.size:
+            rows = np.arange(start, stop)
+            inter = np.bitwise_count(sets.bits[rows, None, :] & sets.bits[None, cand, :])
+            inter = inter.sum(axis=2, dtype=np.int64)
+            union = sets.sizes[rows, None] + sets.sizes[None, cand] - inter
+            score = np.divide(inter, union, out=np.zeros(inter.shape), where=union > 0)
+            keep = (score >= threshold) & (cand[None, :] > rows[:, None])
+            if groups is not None:
+                keep &= groups[rows, None] != groups[None, cand]
+            bi, bj = np.nonzero(keep)
+            out_i.append(rows[bi])
+            out_j.append(cand[bj])
+            out_s.append(score[bi, bj])
+        start = stop
+    if not out_i:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+    return np.concatenate(out_i), np.concatenate(out_j), np.concatenate(out_s)
+
+
+def component_distances(sets, members, groups=None):
+    """
+    Distancias 1 - Jaccard entre las cavidades members, en forma
+    condensada (orden de scipy); los pares del mismo grupo quedan a
+    distancia 1. Cada fila es una operación AND + popcount vectorizada.
+    """
+    bits, sizes = sets.bits[members], sets.sizes[members]
+    m = len(members)
+    out = np.empty(m * (m - 1) // 2)
+    pos = 0
+    for r in range(m - 1):
+        inter = np.bitwise_count(bits[r] & bits[r + 1:]).sum(axis=1, dtype=np.int64)
+        union = sizes[r] + sizes[r + 1:] - inter
+        score = np.divide(inter, union, out=np.zeros(len(inter)), where=union > 0)
+        if groups is not None:
+            score[groups[members[r + 1:]] == groups[members[r]]] = 0.0
+        out[pos:pos + m - r - 1] = 1.0 - score
+        pos += m - r - 1
+    return out
+
+
+def refine_components(sets, comp, threshold, groups=None, method=LINKAGE):
+    """
+    Valida cada componente conexa con un agrupamiento jerárquico cortado
+    en 1 - threshold y la divide si hace falta.
+
+    Las componentes conexas del grafo Jaccard >= threshold equivalen a
+    single linkage: unas pocas cavidades puente bastan para encadenar dos
+    bolsillos vecinos (p. ej. el ortostérico y el de Ala542). Con average
+    linkage dos subgrupos solo se unen si su Jaccard medio entre todos sus
+    pares es >= threshold. Con method='single' no se modifica nada.
+
+    Devuelve las etiquetas de componente renumeradas desde 0.
+    """
+    if method == 'single':
+        return comp
+    comp = comp.astype(np.int64)
+    order = np.argsort(comp, kind='stable')
+    bounds = np.flatnonzero(np.r_[True, comp[order][1:] != comp[order][:-1], True])
+    next_label = comp.max() + 1 if len(comp) else 0
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        members = order[start:stop]
+        # Con dos cavidades, su única unión ya cumple el umbral
+        if len(members) < 3:
+            continue
+        if len(members) > LINKAGE_MAX:
+            print(f"Aviso: componente de {len(members)} cavidades sin refinar "
+                  f"(más de {LINKAGE_MAX})")
+            continue
+        tree = linkage(component_distances(sets, members, groups), method=method)
+        sub = fcluster(tree, t=1.0 - threshold, criterion='distance')
+        if sub.max() > 1:
+            comp[members] = np.where(sub == 1, comp[members], next_label + sub - 2)
+            next_label += sub.max() - 1
+    return np.unique(comp, return_inverse=True)[1]
+
+
+# ----------------------------------------------------------
+# Bolsillos de consenso
+# ----------------------------------------------------------
+def consensus_pockets(cavities, threshold=JACCARD_MIN, core_min=CORE_MIN, method=LINKAGE):
+    """
+    Agrupa las cavidades en bolsillos de consenso.
+
+    Dos cavidades de modelos distintos quedan unidas si su Jaccard de
+    residuos es >= threshold; cada componente conexa se valida con
+    refine_components (average linkage por defecto) y cada grupo
+    resultante es un bolsillo.
+
+    Devuelve (asignaciones, bolsillos):
+    - asignaciones: cavities con las columnas Pocket y Residues_n.
+    - bolsillos: una fila por bolsillo con el número de cavidades y de
+      modelos, el soporte por método (modelos distintos), el Jaccard
+      medio de sus uniones y los residuos del núcleo (presentes en al
+      menos core_min de sus cavidades). Pocket 1 es el de mayor soporte.
+    """
+    sets = ResidueSets(cavities['Residues'].tolist())
+    models = cavities['SourceFile'].astype('category').cat.codes.to_numpy()
+    i, j, score = jaccard_pairs(sets, threshold, groups=models)
+
+    n = len(sets)
+    graph = coo_matrix((np.ones(len(i)), (i, j)), shape=(n, n))
+    _, comp = connected_components(graph, directed=False)
+    comp = refine_components(sets, comp, threshold, models, method)
+    n_comp = int(comp.max()) + 1 if n else 0
+    counts = np.bincount(comp, minlength=n_comp)
+
+    # Soporte: modelos distintos por componente, en total y por método
+    methods = cavities['Method'].astype('category')
+    model_method = np.zeros(models.max() + 1 if n else 0, dtype=np.int64)
+    model_method[models] = methods.cat.codes.to_numpy()
+    pairs = np.unique(comp.astype(np.int64) * len(model_method) + models)
+    pair_comp, pair_model = np.divmod(pairs, max(len(model_method), 1))
+    support = np.bincount(pair_comp, minlength=n_comp)
+    by_method = np.zeros((n_comp, len(methods.cat.categories)), dtype=np.int64)
+    np.add.at(by_method, (pair_comp, model_method[pair_model]), 1)
+
+    # Jaccard medio de las uniones dentro de cada bolsillo
+    inside = comp[i] == comp[j]
+    edges = np.bincount(comp[i[inside]], minlength=n_comp)
+    edge_mean = (np.bincount(comp[i[inside]], weights=score[inside], minlength=n_comp)
+                 / np.maximum(edges, 1))
+
+    # Residuos del núcleo: frecuencia de cada residuo dentro del componente
+    entry_comp = np.repeat(comp, np.diff(sets.cav_ptr))
+    freq = coo_matrix((np.ones(len(entry_comp)), (entry_comp, sets.cav_res)),
+                      shape=(n_comp, len(sets.labels))).tocsr()
+    freq.sum_duplicates()
+    core_rows = np.repeat(np.arange(n_comp), np.diff(freq.indptr))
+    in_core = freq.data >= core_min * counts[core_rows]
+
+    # Numeración de bolsillos por soporte descendente
+    ranking = np.lexsort((np.arange(n_comp), -counts, -support))
+    pocket_of = np.empty(n_comp, dtype=np.int64)
+    pocket_of[ranking] = np.arange(1, n_comp + 1)
+
+    pockets = pd.DataFrame({
+        'Pocket': pocket_of[ranking],
+        'Cavities': counts[ranking],
+        'Models': support[ranking],
+    })
+    for k, method in enumerate(methods.cat.categories):
+        pockets[method] = by_method[ranking, k]
+    for method in METHODS:
+        if method not in pockets.columns:
+            pockets[method] = 0
+    extra = [m for m in methods.cat.categories if m not in METHODS]
+    pockets = pockets[['Pocket', 'Cavities', 'Models'] + METHODS + extra]
+    pockets['Mean Jaccard'] = np.where(edges[ranking] > 0, edge_mean[ranking].round(3), np.nan)
+    pockets['Core Residues'] = [
+        ' '.join(sets.labels[b] for b in
+                 freq.indices[freq.indptr[c]:freq.indptr[c + 1]][in_core[freq.indptr[c]:freq.indptr[c + 1]]])
+        for c in ranking
+    ]
+
+    assigned = cavities.assign(Residues_n=sets.sizes)
+    assigned.insert(0, 'Pocket', pocket_of[comp])
+    assigned = assigned.sort_values(['Pocket', 'SourceFile', 'Index'])
+    return assigned.reset_index(drop=True), pockets
+
+
+# ----------------------------------------------------------
+# Ejecución desde línea de comandos
+# ----------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Bolsillos de consenso entre modelos a partir de los residuos de CavityPlus."
+    )
+    parser.add_argument('inputs', nargs='+',
+                        help="Páginas HTML, tablas .xlsx/.csv de cavidades o carpetas")
+    parser.add_argument('-o', '--output', default='consenso_bolsillos.xlsx',
+                        help="Tabla de bolsillos de consenso (.xlsx o .csv)")
+    parser.add_argument('--assignments',
+                        help="Además, guarda el bolsillo asignado a cada cavidad")
+    parser.add_argument('--threshold', type=float, default=JACCARD_MIN,
+                        help="Jaccard mínimo para unir dos cavidades")
+    parser.add_argument('--core', type=float, default=CORE_MIN,
+                        help="Fracción de cavidades para que un residuo sea del núcleo")
+    parser.add_argument('--linkage', choices=['average', 'complete', 'single'], default=LINKAGE,
+                        help="Enlace con el que se valida cada grupo conexo "
+                             "(single = componentes conexas sin validar)")
+    parser.add_argument('--min-models', type=int, default=1,
+                        help="Solo se guardan bolsillos con al menos este soporte")
+    parser.add_argument('--workers', type=int, help="Procesos para parsear HTML")
+    args = parser.parse_args(argv)
+
+    cavities = load_cavities(args.inputs, args.workers)
+    assigned, pockets = consensus_pockets(cavities, args.threshold, args.core, args.linkage)
+    pockets = pockets[pockets['Models'] >= args.min_models]
+    save_table(pockets, args.output)
+    if args.assignments:
+        save_table(assigned, args.assignments)
+    print(f"ok {args.output} ({len(cavities)} cavidades, "
+          f"{cavities['SourceFile'].nunique()} modelos, {len(pockets)} bolsillos)")
+    print(pockets.head(10).drop(columns='Core Residues').to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
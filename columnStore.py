@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------
+# Almacén columnar en disco, abierto con memory-mapping
+# ----------------------------------------------------------
+# Cada columna es un .npy: las numéricas con su dtype, las categóricas
+# como códigos enteros (categorías en el manifiesto) y las de texto como
+# cadenas de ancho fijo. Los procesos que abren el almacén comparten las
+# mismas páginas de memoria del sistema operativo (solo lectura), así
+# que la memoria no crece con el número de workers.
+STORE_VERSION = 1
+MANIFEST_NAME = 'store.json'
+
+
+def _column_file(k):
+    return f"col{k:03d}.npy"
+
+
+def build_store(df, directory, arrays=None, meta=None):
+    """
+    Escribe df como almacén columnar en directory.
+
+    Parámetros:
+    - df: DataFrame a guardar (índice descartado).
+    - directory: carpeta de destino; se crea de forma atómica (carpeta
+      temporal + rename), así que varios procesos pueden intentarlo a la
+      vez y los lectores nunca ven un almacén a medias.
+    - arrays: arrays adicionales {nombre: ndarray} (p. ej. índices
+      precalculados) que también se abren con memory-mapping.
+    - meta: diccionario JSON libre guardado en el manifiesto.
+
+    Devuelve directory.
+    """
+    tmp = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    columns = []
+    for k, col in enumerate(df.columns):
+        values = df[col]
+        entry = {'name': col, 'file': _column_file(k)}
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            entry['kind'] = 'category'
+            entry['categories'] = values.cat.categories.tolist()
+            data = values.cat.codes.to_numpy()
+        elif pd.api.types.is_numeric_dtype(values.dtype) or pd.api.types.is_bool_dtype(values.dtype):
+            entry['kind'] = 'numeric'
+            data = values.to_numpy()
+        else:
+            entry['kind'] = 'text'
+            data = values.fillna('').astype(str).to_numpy().astype(str)
+        np.save(os.path.join(tmp, entry['file']), data)
+        columns.append(entry)
+    for name, data in (arrays or {}).items():
+        np.save(os.path.join(tmp, f"array_{name}.npy"), np.asarray(data))
+    manifest = {
+        'version': STORE_VERSION,
+        'rows': len(df),
+        'columns': columns,
+        'arrays': sorted(arrays or {}),
+        'meta': meta or {},
+    }
+    with open(os.path.join(tmp, MANIFEST_NAME), 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, ensure_ascii=False)
+    try:
+        os.rename(tmp, directory)
+    except OSError:
+        # Otro proceso lo creó antes: se usa el suyo
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+            raise
+    return directory
+
+
+def read_manifest(directory):
+    """Manifiesto del almacén, o None si no existe o es de otra versión."""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), 'r', encoding='utf-8') as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == STORE_VERSION else None
+
+
+def update_meta(directory, **meta):
+    """
+    Actualiza claves del meta del manifiesto de forma atómica (archivo
+    temporal + replace); las columnas no se tocan.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"No hay un almacén válido en {directory}")
+    manifest['meta'].update(meta)
+    path = os.path.join(directory, MANIFEST_NAME)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, ensure_ascii=False)
+    os.replace(tmp, path)
+    return manifest['meta']
+
+
+class ColumnStore:
+    """
+    Almacén abierto en modo solo lectura. Las columnas y los arrays
+    adicionales son np.memmap: abrirlo no lee los datos, y las filas se
+    materializan solo al pedirlas con take().
+    """
+
+    def __init__(self, directory):
+        manifest = read_manifest(directory)
+        if manifest is None:
+            raise FileNotFoundError(f"No hay un almacén válido en {directory}")
+        self.directory = directory
+        self.n = manifest['rows']
+        self.meta = manifest['meta']
+        self.columns = [c['name'] for c in manifest['columns']]
+        self._entries = {c['name']: c for c in manifest['columns']}
+        self._data = {
+            c['name']: np.load(os.path.join(directory, c['file']), mmap_mode='r')
+            for c in manifest['columns']
+        }
+        self.arrays = {
+            name: np.load(os.path.join(directory, f"array_{name}.npy"), mmap_mode='r')
+            for name in manifest['arrays']
+        }
+
+    def __len__(self):
+        return self.n
+
+    def column(self, name, positions=None):
+        """
+        Columna como array (vista sobre el memmap si positions es None);
+        las categóricas se devuelven como pd.Categorical sobre los códigos.
+        """
+        entry = self._entries[name]
+        data = self._data[name]
+        if positions is not None:
+            data = data[positions]
+        if entry['kind'] == 'category':
+            return pd.Categorical.from_codes(data, entry['categories'])
+        if entry['kind'] == 'text' and positions is not None:
+            return data.astype(object)
+        return data
+
+    def take(self, positions=None, columns=None):
+        """
+        DataFrame con las filas positions (todas si es None) y solo las
+        columnas indicadas. Sin positions, las columnas numéricas y
+        categóricas quedan como vistas del memmap, sin copia.
+        """
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({col: self.column(col, positions) for col in columns}, copy=False)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+import numpy as np
+from scipy.cluster.hierarchy import leaves_list, linkage, optimal_leaf_ordering
+
+# ----------------------------------------------------------
+# Forma condensada de matrices de distancia simétricas
+# ----------------------------------------------------------
+# Las matrices RMSD son simétricas con diagonal cero: solo se guarda el
+# triángulo superior (i < j) fila a fila, en float32, con el mismo orden
+# que scipy.spatial.distance.squareform.
+DTYPE = np.float32
+
+# Hasta este número de modelos se aplica el reordenamiento óptimo de hojas
+OPTIMAL_ORDER_MAX = 1000
+
+
+def condensed_size(n):
+    """Número de pares i < j de una matriz n x n."""
+    return n * (n - 1) // 2
+
+
+def condensed_n(size):
+    """Lado n de la matriz a partir del tamaño de su forma condensada."""
+    n = int(round((1 + np.sqrt(1 + 8 * size)) / 2))
+    if condensed_size(n) != size:
+        raise ValueError(f"{size} no es el tamaño de una matriz condensada")
+    return n
+
+
+def row_offset(i, n):
+    """Posición en la forma condensada del par (i, i + 1)."""
+    return i * n - i * (i + 1) // 2
+
+
+def condensed_index(i, j, n):
+    """Posición del par (i, j) con i != j (admite arrays de numpy)."""
+    i, j = np.minimum(i, j), np.maximum(i, j)
+    return row_offset(i, n) + (j - i - 1)
+
+
+def to_condensed(matrix):
+    """Triángulo superior de una matriz cuadrada, en float32."""
+    matrix = np.asarray(matrix)
+    return matrix[np.triu_indices(matrix.shape[0], k=1)].astype(DTYPE)
+
+
+def condensed_rows(cond, rows):
+    """
+    Reconstruye filas completas (len(rows), n) de la matriz cuadrada sin
+    materializar el resto.
+    """
+    n = condensed_n(len(cond))
+    rows = np.atleast_1d(rows)
+    cols = np.arange(n)
+    out = np.zeros((len(rows), n), dtype=DTYPE)
+    for k, i in enumerate(rows):
+        mask = cols != i
+        out[k, mask] = cond[condensed_index(i, cols[mask], n)]
+    return out
+
+
+def squareform(cond):
+    """Matriz cuadrada float32 a partir de la forma condensada."""
+    n = condensed_n(len(cond))
+    matrix = np.zeros((n, n), dtype=DTYPE)
+    iu = np.triu_indices(n, k=1)
+    matrix[iu] = cond
+    matrix.T[iu] = cond
+    return matrix
+
+
+def reorder(cond, order):
+    """
+    Forma condensada de la matriz con filas y columnas permutadas según
+    order (new[a, b] = old[order[a], order[b]]), fila a fila.
+    """
+    order = np.asarray(order)
+    n = len(order)
+    out = np.empty(condensed_size(n), dtype=DTYPE)
+    for a in range(n - 1):
+        start = row_offset(a, n)
+        out[start:start + n - a - 1] = cond[condensed_index(order[a], order[a + 1:], n)]
+    return out
+
+
+# ----------------------------------------------------------
+# Agrupamiento jerárquico y orden de hojas
+# ----------------------------------------------------------
+def cluster_order(cond, method='average', optimal=None):
+    """
+    Orden de los modelos que agrupa los más parecidos.
+
+    Parámetros:
+    - cond: matriz RMSD en forma condensada.
+    - method: método de enlace de scipy (average, complete, ward...).
+    - optimal: aplicar optimal_leaf_ordering; None = solo si hay como
+      mucho OPTIMAL_ORDER_MAX modelos (su coste crece rápido con n).
+
+    Devuelve un array con la permutación de los índices.
+    """
+    n = condensed_n(len(cond))
+    if n < 3:
+        return np.arange(n)
+    dist = np.asarray(cond, dtype=np.float64)
+    Z = linkage(dist, method=method)
+    if optimal is None:
+        optimal = n <= OPTIMAL_ORDER_MAX
+    if optimal:
+        Z = optimal_leaf_ordering(Z, dist)
+    return leaves_list(Z)
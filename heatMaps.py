@@ -1,46 +1,241 @@
 #!/usr/bin/env python
 
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import matplotlib.pyplot as plt
 
+import condensedMatrix as cm
+
 # ----------------------------------------------------------
 # Configuración global para renderizado de texto matemático
 # ----------------------------------------------------------
 plt.rcParams['mathtext.fontset'] = 'dejavusans'  # Fuente para símbolos LaTeX
 
+# Matrices de hasta este tamaño llevan el valor numérico en cada celda
+ANNOTATE_MAX = 30
+# Lado máximo (en celdas) de la imagen; matrices mayores se promedian por bloques
+RENDER_MAX = 600
+# Número máximo de etiquetas por eje
+TICKS_MAX = 60
+# Lado (en celdas) de cada tile de plot_heatmap_tiles
+TILE_SIZE = 500
+
+# ----------------------------------------------------------
+# Reducción de matrices grandes antes de dibujar
+# ----------------------------------------------------------
+def downsample_matrix(matrix, max_size=RENDER_MAX):
+    """
+    Promedia la matriz en bloques de factor x factor para que su lado no
+    supere max_size. Devuelve (matriz_reducida, factor).
+    """
+    n = matrix.shape[0]
+    factor = -(-n // max_size)
+    if factor <= 1:
+        return matrix, 1
+    m = -(-n // factor)
+    padded = np.full((m * factor, m * factor), np.nan, dtype=np.float64)
+    padded[:n, :n] = matrix
+    blocks = padded.reshape(m, factor, m, factor)
+    # Promedio sin contar el relleno NaN del último bloque
+    return np.nanmean(blocks, axis=(1, 3)), factor
+
+
+def downsample_condensed(cond, max_size=RENDER_MAX):
+    """
+    Como downsample_matrix, pero a partir de la forma condensada: solo se
+    reconstruyen `factor` filas a la vez, nunca la matriz cuadrada entera.
+    Devuelve (matriz_reducida, factor).
+    """
+    n = cm.condensed_n(len(cond))
+    factor = -(-n // max_size)
+    if factor <= 1:
+        return cm.squareform(cond), 1
+    m = -(-n // factor)
+    out = np.empty((m, m), dtype=np.float64)
+    for b in range(m):
+        rows = cm.condensed_rows(cond, np.arange(b * factor, min((b + 1) * factor, n)))
+        padded = np.full((rows.shape[0], m * factor), np.nan)
+        padded[:, :n] = rows
+        out[b] = np.nanmean(padded.reshape(rows.shape[0], m, factor), axis=(0, 2))
+    return out, factor
+
+
 # ----------------------------------------------------------
 # Función para graficar heatmap con valores en cada celda
 # ----------------------------------------------------------
-def plot_heatmap_with_values(matrix, labels, title, filename):
+def plot_heatmap_with_values(matrix, labels, title, filename, show=True,
+                             annotate=None, max_size=RENDER_MAX, cluster=False):
     """
     Dibuja y guarda un heatmap de RMSD con valores numéricos overlay.
 
     Parámetros:
-    - matrix: numpy array cuadrada con valores RMSD.
+    - matrix: numpy array cuadrada con valores RMSD, o su forma condensada
+      (1-D, ver condensedMatrix).
     - labels: lista de etiquetas para ejes x e y.
     - title: título de la figura (puede contener LaTeX).
     - filename: ruta de archivo PNG para guardar la figura.
+    - show: si es False (modo batch/headless) no se llama a plt.show y la
+      figura se cierra tras guardarla.
+    - annotate: True/False fuerza los valores por celda; None los dibuja
+      solo si la matriz tiene como mucho ANNOTATE_MAX filas.
+    - max_size: lado máximo de la imagen; por encima se promedia por bloques.
+    - cluster: reordena filas y columnas por agrupamiento jerárquico para
+      que los modelos convergentes queden juntos.
     """
-    # Configuración de figura y ejes
-    plt.figure(figsize=(6, 5))
+    matrix = np.asarray(matrix)
+    labels = list(labels)
+    if cluster:
+        cond = matrix if matrix.ndim == 1 else cm.to_condensed(matrix)
+        order = cm.cluster_order(cond)
+        matrix = cm.reorder(cond, order)
+        labels = [labels[k] for k in order]
+    if matrix.ndim == 1:
+        matrix, factor = downsample_condensed(matrix, max_size)
+    else:
+        matrix, factor = downsample_matrix(matrix, max_size)
+    labels = labels[::factor]
+    n = matrix.shape[0]
+    if annotate is None:
+        annotate = n <= ANNOTATE_MAX
+
+    # Configuración de figura y ejes (crece con la matriz hasta un límite)
+    side = min(max(6, n * 0.25), 24)
+    fig = plt.figure(figsize=(side, side * 5 / 6))
     plt.imshow(matrix, cmap='coolwarm', interpolation='nearest')  # Mapa de calor
     plt.colorbar(label='RMSD (Å)')                            # Barra de color con etiqueta
-    
+
     # Etiquetas de los ejes X e Y con rotación para evitar solapamiento
-    plt.xticks(ticks=np.arange(len(labels)), labels=labels, rotation=45, ha='right')
-    plt.yticks(ticks=np.arange(len(labels)), labels=labels)
+    step = -(-n // TICKS_MAX)
+    ticks = np.arange(0, n, step)
+    tick_labels = labels[::step]
+    plt.xticks(ticks=ticks, labels=tick_labels, rotation=45, ha='right')
+    plt.yticks(ticks=ticks, labels=tick_labels)
 
-    # Iteramos sobre cada celda para colocar el valor numérico
-    for i in range(matrix.shape[0]):
-        for j in range(matrix.shape[1]):
-            value = matrix[i, j]
-            plt.text(j, i, f"{value:.2f}", ha='center', va='center', color='black')
+    # Colocamos el valor numérico de cada celda
+    if annotate:
+        for i in range(n):
+            for j in range(n):
+                plt.text(j, i, f"{matrix[i, j]:.2f}", ha='center', va='center', color='black')
 
     # Ajustes finales antes de guardar y mostrar
+    if factor > 1:
+        title = f"{title} (bloques de {factor}x{factor})"
     plt.title(title)
     plt.tight_layout()
     plt.savefig(filename, dpi=300)  # Guardado en alta resolución
-    plt.show()
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
+
+
+def plot_tile(block, row_labels, col_labels, title, filename, annotate=False):
+    """Dibuja y guarda un tile de plot_heatmap_tiles (sin mostrarlo)."""
+    fig = plt.figure(figsize=(6, 5))
+    plt.imshow(block, cmap='coolwarm', interpolation='nearest')
+    plt.colorbar(label='RMSD (Å)')
+    # Etiquetas de los ejes limitadas a TICKS_MAX, como en la figura completa
+    for axis, labels, n in ((plt.xticks, col_labels, block.shape[1]),
+                            (plt.yticks, row_labels, block.shape[0])):
+        step = -(-n // TICKS_MAX)
+        kwargs = dict(rotation=45, ha='right') if axis is plt.xticks else {}
+        axis(ticks=np.arange(0, n, step), labels=list(labels)[::step], **kwargs)
+    if annotate:
+        for i in range(block.shape[0]):
+            for j in range(block.shape[1]):
+                plt.text(j, i, f"{block[i, j]:.2f}", ha='center', va='center',
+                         color='black', fontsize=6)
+    plt.title(title)
+    plt.tight_layout()
+    plt.savefig(filename, dpi=300)
+    plt.close(fig)
+    return filename
+
+
+def tile_jobs(matrix, labels, title, filename, tile_size=TILE_SIZE):
+    """
+    Genera los trabajos de plot_tile de una matriz simétrica: solo los
+    tiles del triángulo superior (c >= r), ya que el resto son sus
+    espejos. Acepta la matriz cuadrada o su forma condensada (1-D); en
+    ese caso solo se reconstruyen las filas de una franja de tiles a la vez.
+    """
+    matrix = np.asarray(matrix)
+    condensed = matrix.ndim == 1
+    labels = list(labels)
+    base, ext = os.path.splitext(filename)
+    n = cm.condensed_n(len(matrix)) if condensed else matrix.shape[0]
+    for r, i0 in enumerate(range(0, n, tile_size)):
+        rows = slice(i0, i0 + tile_size)
+        # Franja de filas desde la diagonal (len(rows), n - i0)
+        if condensed:
+            strip = cm.condensed_rows(matrix, np.arange(n)[rows])[:, i0:]
+        else:
+            strip = matrix[rows, i0:]
+        for c, j0 in enumerate(range(i0, n, tile_size), start=r):
+            cols = slice(j0, j0 + tile_size)
+            yield dict(plot=plot_tile,
+                       block=np.array(strip[:, j0 - i0:j0 - i0 + tile_size]),
+                       row_labels=labels[rows], col_labels=labels[cols],
+                       title=f"{title} [{r}, {c}]",
+                       filename=f"{base}_r{r}_c{c}{ext or '.png'}",
+                       annotate=tile_size <= ANNOTATE_MAX)
+
+
+def plot_heatmap_tiles(matrix, labels, title, filename, tile_size=TILE_SIZE, workers=None):
+    """
+    Exporta una matriz grande como varias figuras a resolución completa,
+    una por cada tile de tile_size x tile_size del triángulo superior
+    (p. ej. heatmap_r0_c1.png), dibujadas en paralelo con render_jobs.
+    Con tile_size <= ANNOTATE_MAX cada celda lleva su valor.
+    Devuelve la lista de archivos generados.
+    """
+    return render_jobs(tile_jobs(matrix, labels, title, filename, tile_size), workers)
+
+
+# ----------------------------------------------------------
+# Exportación por lotes en procesos paralelos
+# ----------------------------------------------------------
+# Trabajos en vuelo por proceso (acota la memoria de los pendientes)
+JOBS_PER_WORKER = 4
+
+
+def _render_job(job):
+    # Cada proceso dibuja sin pantalla; 'plot' elige la función de dibujo
+    plt.switch_backend('Agg')
+    args = dict(job)
+    plot = args.pop('plot', None)
+    if plot is None:
+        plot_heatmap_with_values(show=False, **args)
+    else:
+        plot(**args)
+    return args['filename']
+
+
+def render_jobs(jobs, workers=None):
+    """
+    Dibuja una lista o un generador de figuras (diccionarios con los
+    argumentos de plot_heatmap_with_values, o de la función indicada en
+    'plot') en modo headless, repartidas en un pool de procesos. Como
+    mucho JOBS_PER_WORKER trabajos por proceso esperan en la cola, así
+    que un generador no se materializa entero.
+    Devuelve los archivos generados en el orden de jobs.
+    """
+    if workers == 1 or (isinstance(jobs, (list, tuple)) and len(jobs) <= 1):
+        return [_render_job(job) for job in jobs]
+    workers = workers or os.cpu_count() or 1
+    outputs, pending = [], deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for job in jobs:
+            if len(pending) >= JOBS_PER_WORKER * workers:
+                outputs.append(pending.popleft().result())
+            pending.append(pool.submit(_render_job, job))
+        outputs.extend(futuro.result() for futuro in pending)
+    return outputs
+
 
 # ----------------------------------------------------------
 # Datos de RMSD: matrices para monómeros y dímeros
@@ -70,20 +265,6 @@ labels_hum = [
     r"RB $\mathrm{humanNCC}$", r"SM $\mathrm{humanNCC}$"
 ]
 
-# Graficar heatmaps de RMSD para monómeros
-plot_heatmap_with_values(
-    rmsd_pez,
-    labels_pez,
-    r"Figure 1 – Heatmap RMSD $\beta\mathrm{NCC}$ Monomer",
-    "heatmap_monomeros_pez.png"
-)
-plot_heatmap_with_values(
-    rmsd_hum,
-    labels_hum,
-    r"Figure 2 – Heatmap RMSD $\mathrm{humanNCC}$ Monomer",
-    "heatmap_monomeros_humano.png"
-)
-
 # RMSD para dímero de βNCC y humanNCC combinados
 rmsd_dimers = np.array([
     [0.000, 1.093, 1.288, 1.122],
@@ -96,10 +277,37 @@ labels_dimers = [
     r"SM $\mathrm{humanNCC}$", r"AF $\mathrm{humanNCC}$"
 ]
 
-# Graficar heatmap de RMSD para dímeros
-plot_heatmap_with_values(
-    rmsd_dimers,
-    labels_dimers,
-    "Figure 3 – Heatmap RMSD dimer models",
-    "heatmap_dimers.png"
-)
+# Figuras del artículo como lista de trabajos
+JOBS = [
+    # Heatmaps de RMSD para monómeros
+    dict(matrix=rmsd_pez, labels=labels_pez,
+         title=r"Figure 1 – Heatmap RMSD $\beta\mathrm{NCC}$ Monomer",
+         filename="heatmap_monomeros_pez.png"),
+    dict(matrix=rmsd_hum, labels=labels_hum,
+         title=r"Figure 2 – Heatmap RMSD $\mathrm{humanNCC}$ Monomer",
+         filename="heatmap_monomeros_humano.png"),
+    # Heatmap de RMSD para dímeros
+    dict(matrix=rmsd_dimers, labels=labels_dimers,
+         title="Figure 3 – Heatmap RMSD dimer models",
+         filename="heatmap_dimers.png"),
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Heatmaps de RMSD de las figuras del artículo.")
+    parser.add_argument('--batch', action='store_true',
+                        help="Modo headless: guarda las figuras sin mostrarlas")
+    parser.add_argument('--workers', type=int,
+                        help="Procesos para exportar en paralelo (modo batch)")
+    args = parser.parse_args(argv)
+
+    if args.batch:
+        for filename in render_jobs(JOBS, args.workers):
+            print(f"ok {filename}")
+    else:
+        for job in JOBS:
+            plot_heatmap_with_values(**job)
+
+
+if __name__ == '__main__':
+    main()
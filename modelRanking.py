@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import re
+from glob import glob
+
+import numpy as np
+import pandas as pd
+
+from parsingCavityPlus import read_dataset, save_table, source_metadata
+from rawData import load_data
+
+# ----------------------------------------------------------
+# Criterios de calidad: columna -> True si "más es mejor"
+# ----------------------------------------------------------
+RAMA_CRITERIA = {
+    'Ramachandran Favored (>98%)': True,
+    'Ramachandran Outliers (<0.05%)': False,
+    # Se minimiza |Z| (MolProbity considera buenos los valores |Z| < 2)
+    'Ramachandran Z-Score (abs(ZScore)<2)': False,
+}
+# Columnas de MolProbity opcionales, por nombre exacto (sin distinguir
+# mayúsculas): una columna desconocida, p. ej. un percentil, se ignora en
+# lugar de adivinar su sentido
+OPTIONAL_CRITERIA = {
+    'Clashscore': False,
+    'Clashscore, all atoms': False,
+    'Rotamer Outliers (%)': False,
+    'Poor Rotamers (<0.3%)': False,
+    'Rotamer Favored (%)': True,
+    'Favored Rotamers (>98%)': True,
+    'MolProbity Score': False,
+}
+# Métricas de cavidades de scoresResume que se suman como criterios
+CAVITY_CRITERIA = {'max_drugscore': True, 'promedio_druggability': True}
+# Columnas de clave para unir RawData.csv con las cavidades
+KEY_COLUMNS = ['Method', 'Species', 'Structure', 'ModelBase', 'Relaxed']
+
+# Remuestreos bootstrap y elementos (remuestreos x valores) por bloque
+RESAMPLES = 10000
+BOOTSTRAP_BLOCK = 1 << 22
+CONFIDENCE = 0.95
+# Tamaño de bloque por debajo del cual el frente se calcula por fuerza bruta
+KUNG_LEAF = 128
+
+
+def find_criteria(columns):
+    """Criterios presentes en columns: {columna: más_es_mejor}."""
+    criteria = {col: up for col, up in RAMA_CRITERIA.items() if col in columns}
+    optional = {name.lower(): up for name, up in OPTIONAL_CRITERIA.items()}
+    for col in columns:
+        up = optional.get(str(col).strip().lower())
+        if up is not None and col not in criteria:
+            criteria[col] = up
+    for col, up in CAVITY_CRITERIA.items():
+        if col in columns:
+            criteria[col] = up
+    return criteria
+
+
+def criteria_matrix(df, criteria):
+    """
+    Matriz (n, k) en la que mayor siempre es mejor: las columnas a
+    minimizar cambian de signo (el Z-score en valor absoluto). Los
+    valores ausentes quedan como NaN: un modelo sin archivo de cavidades
+    no es "el peor" en esos criterios, simplemente no se le evalúa en ellos.
+    """
+    matrix = np.empty((len(df), len(criteria)), dtype=np.float64)
+    for k, (col, up) in enumerate(criteria.items()):
+        values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+        if 'Z-Score' in col:
+            values = np.abs(values)
+        matrix[:, k] = values if up else -values
+    return matrix
+
+
+# ----------------------------------------------------------
+# Frente de Pareto
+# ----------------------------------------------------------
+def _dominated_by(front, points):
+    """Máscara de points dominados por algún punto de front (por bloques)."""
+    out = np.zeros(len(points), dtype=bool)
+    if len(front) == 0:
+        return out
+    step = max(1, BOOTSTRAP_BLOCK // len(front))
+    for start in range(0, len(points), step):
+        p = points[start:start + step]
+        # Comparaciones criterio a criterio sobre matrices (puntos x frente)
+        ge = np.ones((len(p), len(front)), dtype=bool)
+        gt = np.zeros((len(p), len(front)), dtype=bool)
+        for c in range(points.shape[1]):
+            ge &= front[:, c] >= p[:, c, None]
+            gt |= front[:, c] > p[:, c, None]
+        out[start:start + step] = (ge & gt).any(axis=1)
+    return out
+
+
+def _dominated_2d(top, bottom):
+    """
+    Máscara de bottom con algún punto de top >= en los criterios 1 y 2.
+    Si todo top precede a bottom en orden lexicográfico descendente (luego
+    es >= en el criterio 0) y no hay puntos repetidos, con 3 criterios
+    equivale a estar dominado. O((|top| + |bottom|) log |top|).
+    """
+    order = np.argsort(top[:, 1], kind='stable')
+    y = top[order, 1]
+    # Máximo del criterio 2 entre los puntos de top con y >= y[pos]
+    z_max = np.maximum.accumulate(top[order, 2][::-1])[::-1]
+    pos = np.searchsorted(y, bottom[:, 1], side='left')
+    out = np.zeros(len(bottom), dtype=bool)
+    has = pos < len(y)
+    out[has] = z_max[pos[has]] >= bottom[has, 2]
+    return out
+
+
+def _kung(points, order):
+    # Algoritmo de Kung sobre puntos distintos ya ordenados
+    # lexicográficamente; los bloques pequeños se resuelven comparando
+    # todos contra todos
+    if len(order) <= KUNG_LEAF:
+        return order[~_dominated_by(points[order], points[order])]
+    half = len(order) // 2
+    top = _kung(points, order[:half])
+    bottom = _kung(points, order[half:])
+    # Mezcla: solo los candidatos dominados en la proyección sobre los
+    # criterios 1 y 2 pueden estarlo del todo (con 3 criterios, son ellos)
+    candidates = _dominated_2d(points[top], points[bottom])
+    if points.shape[1] > 3 and candidates.any():
+        candidates[candidates] = _dominated_by(points[top], points[bottom[candidates]])
+    return np.concatenate([top, bottom[~candidates]])
+
+
+def pareto_front(matrix):
+    """
+    Posiciones de las filas no dominadas (mayor es mejor en todas las
+    columnas, sin NaN). Una fila domina a otra si es >= en todo y > en algo.
+
+    - 1 criterio: los máximos.
+    - 2 criterios: barrido en O(n log n) tras ordenar por el primero.
+    - 3 criterios: algoritmo de Kung (divide y vencerás) con la mezcla
+      resuelta como consulta de dominancia 2-D (orden + máximo acumulado
+      + búsqueda binaria): O(n log² n).
+    - 4 o más: misma recursión, pero los candidatos de la consulta 2-D se
+      confirman por fuerza bruta contra la mitad superior, así que el peor
+      caso (casi todos los puntos mutuamente no dominados) es
+      O(n · |frente|); de ahí el límite de filas del dashboard.
+
+    Las filas se ordenan de forma lexicográfica descendente, de modo que
+    ninguna fila puede dominar a otra anterior; las filas repetidas se
+    agrupan antes (no se dominan entre sí) y comparten resultado.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    n, k = matrix.shape
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k == 1:
+        return np.flatnonzero(matrix[:, 0] == matrix[:, 0].max())
+    if k == 2:
+        order = np.lexsort((-matrix[:, 1], -matrix[:, 0]))
+        x, y = matrix[order, 0], matrix[order, 1]
+        # Mejor segundo criterio entre las filas con primer criterio estrictamente mayor
+        best = np.maximum.accumulate(y)
+        first_of_x = np.r_[True, x[1:] != x[:-1]]
+        group_start = np.maximum.accumulate(np.where(first_of_x, np.arange(n), 0))
+        before = best[np.maximum(group_start - 1, 0)]
+        # Dentro de un mismo x, solo los de y máximo (el primero del grupo);
+        # las filas idénticas entre sí no se dominan y se conservan todas
+        keep = ((group_start == 0) | (y > before)) & (y == y[group_start])
+        return np.sort(order[keep])
+    unique, inverse = np.unique(matrix, axis=0, return_inverse=True)
+    order = np.lexsort(tuple(-unique[:, c] for c in reversed(range(k))))
+    front = np.zeros(len(unique), dtype=bool)
+    front[_kung(unique, order)] = True
+    return np.flatnonzero(front[inverse.ravel()])
+
+
+def composite_score(matrix):
+    """
+    Puntuación combinada en [0, 1]: media de los percentiles de cada
+    criterio (1 = mejor modelo en todos), insensible a las escalas. Cada
+    percentil se calcula entre los modelos que tienen ese criterio y la
+    media usa solo los criterios disponibles de cada modelo (NaN si no
+    tiene ninguno).
+    """
+    ranks = np.full(matrix.shape, np.nan)
+    for k in range(matrix.shape[1]):
+        # Percentil medio en empates (como rankdata 'average')
+        valid = np.flatnonzero(~np.isnan(matrix[:, k]))
+        m = len(valid)
+        if m == 0:
+            continue
+        if m == 1:
+            ranks[valid, k] = 1.0
+            continue
+        col = matrix[valid, k]
+        order = np.argsort(col, kind='stable')
+        sorted_col = col[order]
+        starts = np.flatnonzero(np.r_[True, sorted_col[1:] != sorted_col[:-1]])
+        ends = np.r_[starts[1:], m]
+        avg = (starts + ends - 1) / 2
+        ranks[valid[order], k] = np.repeat(avg, ends - starts) / (m - 1)
+    counts = (~np.isnan(ranks)).sum(axis=1)
+    return np.where(counts > 0, np.nansum(ranks, axis=1) / np.maximum(counts, 1), np.nan)
+
+
+# ----------------------------------------------------------
+# Intervalos de confianza bootstrap
+# ----------------------------------------------------------
+def bootstrap_means(values, resamples=RESAMPLES, seed=0):
+    """
+    Medias de `resamples` remuestreos con reemplazo de las filas de values
+    (n,) o (n, m). Los remuestreos se generan como una matriz de índices
+    (remuestreos x n) y se promedian de una vez, por bloques de
+    BOOTSTRAP_BLOCK elementos para acotar memoria; todas las columnas usan
+    los mismos índices. Los NaN se excluyen de cada media.
+
+    Devuelve un array (resamples,) o (resamples, m).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    flat = values.ndim == 1
+    values = values.reshape(len(values), -1)
+    n, m = values.shape
+    valid = ~np.isnan(values)
+    filled = np.asfortranarray(np.where(valid, values, 0.0))
+    valid = np.asfortranarray(valid)
+    rng = np.random.default_rng(seed)
+    means = np.empty((resamples, m))
+    step = max(1, BOOTSTRAP_BLOCK // max(n * m, 1))
+    for start in range(0, resamples, step):
+        stop = min(resamples, start + step)
+        idx = rng.integers(0, n, size=(stop - start, n))
+        # Columna a columna: indexar arrays 1-D contiguos es mucho más
+        # rápido que reunir filas de la matriz (remuestreos, n, m)
+        for k in range(m):
+            if valid[:, k].all():
+                means[start:stop, k] = filled[:, k][idx].mean(axis=1)
+            else:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    means[start:stop, k] = (filled[:, k][idx].sum(axis=1)
+                                            / valid[:, k][idx].sum(axis=1))
+    return means[:, 0] if flat else means
+
+
+def bootstrap_ci(df, group_cols, value_cols, resamples=RESAMPLES,
+                 confidence=CONFIDENCE, seed=0):
+    """
+    Media e intervalo de confianza percentil de cada columna de value_cols
+    para cada valor de cada columna de group_cols (p. ej. Software y
+    Relaxed). Las métricas de un mismo grupo comparten los remuestreos.
+
+    Devuelve un DataFrame con Group, Value, Metric, n, mean, ci_low, ci_high.
+    """
+    if isinstance(value_cols, str):
+        value_cols = [value_cols]
+    alpha = (1 - confidence) / 2
+    values = df[value_cols].apply(pd.to_numeric, errors='coerce')
+    rows = []
+    for group in group_cols:
+        for key, sub in values.groupby(df[group], observed=True, sort=True):
+            sub = sub.dropna(how='all').to_numpy(dtype=np.float64)
+            if len(sub) == 0:
+                continue
+            means = bootstrap_means(sub, resamples, seed)
+            low, high = np.nanquantile(means, [alpha, 1 - alpha], axis=0)
+            for k, col in enumerate(value_cols):
+                rows.append({'Group': group, 'Value': key, 'Metric': col,
+                             'n': int((~np.isnan(sub[:, k])).sum()),
+                             'mean': np.nanmean(sub[:, k]),
+                             'ci_low': low[k], 'ci_high': high[k]})
+    return pd.DataFrame(rows, columns=['Group', 'Value', 'Metric', 'n', 'mean',
+                                       'ci_low', 'ci_high'])
+
+
+# ----------------------------------------------------------
+# Métricas de cavidades (scoresResume) unidas por claves de nombre
+# ----------------------------------------------------------
+def model_key(path):
+    """
+    Clave de unión a partir de la ruta o del nombre de un modelo: método,
+    especie, estructura, modelo base (dos dígitos) y relajación, con las
+    mismas reglas para RawData.csv (MON-AF-NCChumano-03-Relaxed2-000017)
+    y para las páginas de cavidades (SM-NCCHUMANO-RELAXED03-03).
+    """
+    meta = source_metadata(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    base = re.search(r'(?:^|-)(\d{2})(?=-|$)', stem)
+    return (meta['Method'], meta['Species'], meta['Structure'],
+            base[1] if base else 'NA', meta['Relaxed'])
+
+
+def cavity_metrics(folders=(), dataset=None):
+    """
+    Métricas por modelo de scoresResume (una fila por archivo de
+    cavidades), desde los manifiestos de las carpetas (leyendo solo los
+    .xlsx sin métricas vigentes) y/o desde el dataset Parquet.
+    """
+    import scoresResume
+
+    rows = []
+    for folder in folders:
+        manifest = scoresResume.load_manifest(folder)
+        for filepath in sorted(glob(os.path.join(folder, '*.xlsx'))):
+            name = os.path.basename(filepath)
+            entry = scoresResume.lookup_cached(filepath, manifest.get(name))
+            resultado = entry['resultado'] if entry else scoresResume.summarize_file(filepath)[1]
+            if resultado:
+                rows.append(dict(resultado, path=filepath))
+    if dataset:
+        df = read_dataset(dataset, columns=scoresResume.DATASET_COLUMNS + ['Species', 'Structure'])
+        for (species, structure, name), frame in df.groupby(
+                ['Species', 'Structure', 'SourceFile'], observed=True, sort=True):
+            _, resultado = scoresResume.summarize_frame(frame, name)
+            if resultado:
+                rows.append(dict(resultado, path=os.path.join(species, structure, name)))
+    metrics = pd.DataFrame(rows)
+    if metrics.empty:
+        return metrics
+    keys = pd.DataFrame([model_key(p) for p in metrics['path']], columns=KEY_COLUMNS)
+    return pd.concat([metrics, keys], axis=1)
+
+
+def _examples(names, limit=5):
+    names = list(names)
+    extra = f" (+{len(names) - limit})" if len(names) > limit else ''
+    return ', '.join(names[:limit]) + extra
+
+
+def join_cavity_metrics(df, metrics):
+    """
+    Añade a df (filas de RawData.csv) las métricas de cavidades del mismo
+    modelo, unidas por la clave completa KEY_COLUMNS; si varias páginas
+    comparten clave se promedian.
+
+    Los archivos de cavidades con algún campo de la clave desconocido
+    ('NA', p. ej. sin estructura en el nombre ni en la carpeta) se
+    descartan, y los que no corresponden a ningún modelo de df se
+    avisan: ninguno se asigna a modelos por una clave parcial.
+    """
+    if metrics.empty:
+        return df
+    known = (metrics[KEY_COLUMNS] != 'NA').all(axis=1)
+    if not known.all():
+        print(f"Aviso: {int((~known).sum())} archivos de cavidades sin clave completa "
+              f"({'/'.join(KEY_COLUMNS)}), descartados: {_examples(metrics.loc[~known, 'path'])}")
+    metrics = metrics[known]
+    cols = [c for c in CAVITY_CRITERIA if c in metrics.columns]
+    keys = pd.DataFrame([model_key(name) for name in df['FileName']],
+                        columns=KEY_COLUMNS, index=df.index)
+    if metrics.empty:
+        return df.assign(**{c: np.nan for c in cols})
+    per_key = metrics.groupby(KEY_COLUMNS, sort=False)[cols].mean()
+    unmatched = ~metrics.set_index(KEY_COLUMNS).index.isin(keys.set_index(KEY_COLUMNS).index)
+    if unmatched.any():
+        print(f"Aviso: {int(unmatched.sum())} archivos de cavidades sin modelo en RawData: "
+              f"{_examples(metrics.loc[unmatched, 'path'])}")
+    joined = keys.join(per_key, on=KEY_COLUMNS)
+    return df.assign(**{c: joined[c].to_numpy() for c in cols})
+
+
+# ----------------------------------------------------------
+# Informe de ranking
+# ----------------------------------------------------------
+def rank_models(df, criteria=None):
+    """
+    Ranking multicriterio de df: añade Pareto (True en el frente), Score
+    (puntuación combinada sobre los criterios disponibles de cada modelo)
+    y Missing (criterios sin valor), y ordena por frente y puntuación.
+
+    El frente se calcula con los criterios que tienen todos los modelos:
+    un criterio con huecos (p. ej. cavidades de solo algunos modelos)
+    entra en Score pero no en la dominancia, para no favorecer a los
+    grupos con más cobertura.
+
+    Devuelve (ranking, criterios usados, criterios del frente).
+    """
+    criteria = criteria or find_criteria(df.columns)
+    if not criteria:
+        raise ValueError("No hay columnas de calidad reconocidas para el ranking")
+    matrix = criteria_matrix(df, criteria)
+    missing = np.isnan(matrix)
+    complete = ~missing.any(axis=0)
+    front_criteria = [col for col, ok in zip(criteria, complete) if ok]
+    pareto = np.zeros(len(df), dtype=bool)
+    if front_criteria:
+        pareto[pareto_front(matrix[:, complete])] = True
+    ranking = df.assign(Pareto=pareto, Score=composite_score(matrix),
+                        Missing=missing.sum(axis=1))
+    ranking = ranking.sort_values(['Pareto', 'Score'], ascending=[False, False],
+                                  kind='stable', na_position='last')
+    return ranking.reset_index(drop=True), criteria, front_criteria
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Ranking multicriterio de modelos: frente de Pareto, puntuación "
+                    "combinada e intervalos bootstrap por software y relajación."
+    )
+    parser.add_argument('rawdata', nargs='?', default='RawData.csv', help="CSV de MolProbity")
+    parser.add_argument('--folders', nargs='+', default=(),
+                        help="Carpetas de .xlsx de cavidades (métricas de scoresResume)")
+    parser.add_argument('--dataset', help="Dataset Parquet de cavidades (parsingCavityPlus)")
+    parser.add_argument('--resamples', type=int, default=RESAMPLES, help="Remuestreos bootstrap")
+    parser.add_argument('--seed', type=int, default=0, help="Semilla del bootstrap")
+    parser.add_argument('--top', type=int, default=20, help="Modelos mostrados en consola")
+    parser.add_argument('-o', '--output', help="Guarda el ranking completo (.xlsx o .csv)")
+    parser.add_argument('--ci-output', help="Guarda los intervalos de confianza (.xlsx o .csv)")
+    args = parser.parse_args(argv)
+
+    df = load_data(args.rawdata)
+    if args.folders or args.dataset:
+        df = join_cavity_metrics(df, cavity_metrics(args.folders, args.dataset))
+    ranking, criteria, front_criteria = rank_models(df)
+
+    print(f"Criterios: {', '.join(criteria)}")
+    partial = [col for col in criteria if col not in front_criteria]
+    if partial:
+        print(f"Con valores ausentes (solo en Score): {', '.join(partial)}")
+    print(f"Modelos: {len(ranking)}; en el frente de Pareto: {int(ranking['Pareto'].sum())}\n")
+    shown = ['FileName', 'Pareto', 'Score', 'Missing'] + list(criteria)
+    print(ranking[shown].head(args.top).to_string(index=False))
+
+    metrics = ['Score'] + [col for col in criteria if col in RAMA_CRITERIA]
+    ci = bootstrap_ci(ranking, ['Software', 'Relaxed'], metrics, args.resamples, seed=args.seed)
+    print(f"\nIntervalos de confianza {CONFIDENCE:.0%} (bootstrap, {args.resamples} remuestreos):")
+    print(ci.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    if args.output:
+        save_table(ranking, args.output)
+    if args.ci_output:
+        save_table(ci, args.ci_output)
+
+
+if __name__ == '__main__':
+    main()
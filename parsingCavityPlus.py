@@ -1,61 +1,381 @@
 #!/usr/bin/env python
 
+import argparse
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+
 import pandas as pd
-from bs4 import BeautifulSoup
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from lxml import etree
+
+import telemetry
 
 # ----------------------------------------------------------
 # Documento HTML de ejemplo: tabla con datos de cavidades
 # ----------------------------------------------------------
 html_doc = """<table data-v-92dc5b31="" class="table align-center text-center" ... >... </table>"""
 
+# Columnas de la fila principal de cada cavidad, en orden de celda
+MAIN_COLUMNS = ['Index', 'Pred Max pKd', 'Pred Ave pKd', 'DrugScore', 'Druggability']
+
+# Extensiones aceptadas al recibir una carpeta de resultados
+HTML_PATTERNS = ('*.html', '*.htm')
+
+# Tabla combinada por defecto (nombre del flujo original)
+DEFAULT_OUTPUT = "SM-NCCHUMANO-RELAXED03-03.xlsx"
+
+# Dataset tipado: esquema fijo, igual en todas las páginas. Las columnas
+# numéricas conocidas se convierten a número (lo que no lo es, p. ej.
+# "N/A", queda nulo), Druggability es categoría y cualquier otra columna
+# se guarda como texto.
+INTEGER_COLUMNS = ['Index']
+FLOAT_COLUMNS = ['Pred Max pKd', 'Pred Ave pKd', 'DrugScore',
+                 'Surface Area (Å2)', 'Volume (Å3)']
+DRUGGABILITY_LEVELS = ['Weak', 'Medium', 'Strong']
+DRUGGABILITY_TYPE = pa.dictionary(pa.int8(), pa.string())
+# Metadatos de origen, extraídos de la ruta y el nombre de cada página
+SOURCE_COLUMNS = ['Species', 'Structure', 'Method', 'Relaxed']
+# Columnas de partición del dataset (carpetas Species=.../Structure=...)
+PARTITION_COLUMNS = ['Species', 'Structure']
+# Esquema común del dataset (convención de Parquet; pyarrow lo ignora al listar)
+COMMON_METADATA = '_common_metadata'
+
+SPECIES_TOKENS = {'HUMAN': 'Human', 'ANGUILA': 'Anguila', 'EEL': 'Anguila', 'PEZ': 'Anguila'}
+STRUCTURE_TOKENS = {'MON': 'MON', 'MONOMER': 'MON', 'MONOMERO': 'MON',
+                    'DIM': 'DIM', 'DIMER': 'DIM', 'DIMERO': 'DIM'}
+METHOD_TOKENS = ('AF', 'RF', 'SM', 'MD')
+
+
 # ----------------------------------------------------------
-# Parseo del HTML con BeautifulSoup
+# Extracción de datos: filas principales y detalles colapsables
 # ----------------------------------------------------------
-# Creamos el objeto BeautifulSoup para navegar la estructura HTML
-soup = BeautifulSoup(html_doc, 'html.parser')
-# Buscamos el primer <tbody> que contiene las filas de datos principales
-tbody = soup.find('tbody')
-if tbody is None:
+def _text(element):
+    """Texto del elemento con cada fragmento recortado (como get_text(strip=True))."""
+    return ''.join(t.strip() for t in element.itertext())
+
+
+def _extract_rows(tbody):
+    """
+    Recorre las filas directas de <tbody> y devuelve una lista de
+    diccionarios: las celdas de la fila principal más los pares
+    <th>/<td> de la tabla de detalle en la fila siguiente.
+    """
+    trs = [tr for tr in tbody if tr.tag == 'tr']
+    rows = []  # Lista para almacenar cada entrada como diccionario
+    for pos, row in enumerate(trs):
+        # Saltamos filas de detalle (tienen atributo 'id')
+        if row.get('id'):
+            continue
+
+        # Extraemos celdas de la fila principal
+        cells = [td for td in row if td.tag == 'td']
+        entry = {col: _text(cells[k]) for k, col in enumerate(MAIN_COLUMNS)}
+
+        # La siguiente fila contiene la tabla de detalles colapsables
+        det = trs[pos + 1]
+        tbl = next(det.iter('table'))
+        # Iteramos por cada fila de detalle (clave: <th>, valor: <td>)
+        for dtr in tbl.iter('tr'):
+            key = _text(next(dtr.iter('th')))
+            entry[key] = _text(next(dtr.iter('td')))
+
+        rows.append(entry)
+    return rows
+
+
+def parse_cavityplus(source, encoding='utf-8'):
+    """
+    Parsea una página de resultados de CavityPlus.
+
+    Parámetros:
+    - source: ruta a un archivo HTML o un objeto binario tipo archivo.
+    - encoding: codificación del documento (libxml2 asume latin-1 si la
+      página guardada no la declara, lo que rompe claves como 'Å2').
+
+    El documento se lee en streaming con lxml y el análisis se detiene al
+    cerrar el primer <tbody> de nivel superior, sin construir el resto del
+    árbol. Devuelve la lista de entradas (una por cavidad).
+    """
+    for _, tbody in etree.iterparse(source, events=('end',), tag='tbody',
+                                    html=True, recover=True, encoding=encoding):
+        # Un <tbody> dentro de una tabla de detalle se cierra antes que el
+        # principal; solo nos interesa el primero del documento.
+        if any(anc.tag == 'tbody' for anc in tbody.iterancestors()):
+            continue
+        return _extract_rows(tbody)
     # Si no existe <tbody>, alertamos al usuario
     raise RuntimeError("No se encontró <tbody>. ¿Pegaste bien tu HTML?")
 
+
 # ----------------------------------------------------------
-# Extracción de datos: filas principales y detalles colapsables
+# Procesamiento por lotes de archivos HTML
+# ----------------------------------------------------------
+def expand_inputs(inputs):
+    """
+    Convierte carpetas, patrones glob y rutas sueltas en una lista
+    ordenada y sin duplicados de archivos HTML.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for pattern in HTML_PATTERNS:
+                paths.extend(glob(os.path.join(item, pattern)))
+        elif any(ch in item for ch in '*?['):
+            paths.extend(glob(item))
+        else:
+            paths.append(item)
+    return sorted(set(paths))
+
+
+def parse_file(path, tr=telemetry.NULL_TRACE):
+    """Parsea un archivo y devuelve su DataFrame etiquetado con SourceFile."""
+    rows = parse_cavityplus(path)
+    tr.mark('parse')
+    tr.count('cavities', len(rows))
+    df = pd.DataFrame(rows)
+    df.insert(0, 'SourceFile', os.path.basename(path))
+    tr.mark('dataframe')
+    return df
+
+
+def _parse_file_traced(path):
+    # Unidad de trabajo del pool; la traza vuelve al proceso principal
+    tr = telemetry.trace('parsingCavityPlus.file', file=os.path.basename(path))
+    return parse_file(path, tr), tr.close()
+
+
+def parse_files(paths, workers=None):
+    """
+    Parsea varios archivos repartidos en un pool de procesos.
+
+    Parámetros:
+    - paths: lista de archivos HTML.
+    - workers: número de procesos (None = todos los núcleos).
+
+    Devuelve la lista de DataFrames en el mismo orden que paths.
+    """
+    if len(paths) <= 1 or workers == 1:
+        salidas = [_parse_file_traced(p) for p in paths]
+    else:
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            salidas = list(pool.map(_parse_file_traced, paths, chunksize=chunksize))
+    for _, payload in salidas:
+        telemetry.record(payload)
+    return [df for df, _ in salidas]
+
+
+def save_table(df, output_file):
+    """Guarda el DataFrame como .csv o .xlsx según la extensión, sin índice."""
+    if output_file.lower().endswith('.csv'):
+        df.to_csv(output_file, index=False)
+    else:
+        df.to_excel(output_file, index=False)
+
+
+# ----------------------------------------------------------
+# Dataset Parquet tipado y particionado
+# ----------------------------------------------------------
+def source_metadata(path):
+    """
+    Especie, estructura (MON/DIM), método y ronda de relajación a partir
+    de la ruta; el nombre del archivo tiene prioridad sobre las carpetas
+    (p. ej. TopModels/Dimer/Human/SM-NCCHUMANO-RELAXED03-03.html).
+    Los campos que no aparecen quedan como 'NA' (Relaxed: 'Base').
+    """
+    path = os.path.normpath(path).replace('\\', '/')
+    directory, name = os.path.split(path)
+    tokens = [t for part in (name, directory)
+              for t in re.split(r'[/\-_. ]+', part.upper()) if t]
+    meta = {'Species': 'NA', 'Structure': 'NA', 'Method': 'NA', 'Relaxed': 'Base'}
+    for token in reversed(tokens):  # Los primeros (nombre de archivo) ganan
+        species = next((v for k, v in SPECIES_TOKENS.items() if k in token), None)
+        if species:
+            meta['Species'] = species
+        if token in STRUCTURE_TOKENS:
+            meta['Structure'] = STRUCTURE_TOKENS[token]
+        if token in METHOD_TOKENS:
+            meta['Method'] = token
+        relaxed = re.fullmatch(r'RELAXED(\d*)', token)
+        if relaxed:
+            meta['Relaxed'] = f"Relaxed{int(relaxed[1])}" if relaxed[1] else 'Relaxed'
+    return meta
+
+
+def column_type(col):
+    """Tipo Arrow fijo de una columna del dataset."""
+    if col in INTEGER_COLUMNS:
+        return pa.int64()
+    if col in FLOAT_COLUMNS:
+        return pa.float64()
+    if col == 'Druggability':
+        return DRUGGABILITY_TYPE
+    return pa.string()
+
+
+def typed_frame(df):
+    """
+    Convierte las cadenas extraídas del HTML a los tipos del esquema fijo
+    (ver column_type): números con pd.to_numeric(errors='coerce') (Index
+    como entero con nulos), Druggability como categoría y el resto como
+    str. El tipo no depende de los valores de la página.
+    """
+    out = {}
+    for col in df.columns:
+        values = df[col]
+        if col == 'Druggability':
+            out[col] = pd.Categorical(values, categories=DRUGGABILITY_LEVELS)
+        elif col in INTEGER_COLUMNS or col in FLOAT_COLUMNS:
+            numbers = pd.to_numeric(values.mask(values == ''), errors='coerce')
+            out[col] = numbers.astype('Int64' if col in INTEGER_COLUMNS else 'float64')
+        else:
+            out[col] = values.astype(str)
+    return pd.DataFrame(out, index=df.index)
+
+
+def typed_table(df):
+    """Tabla Arrow de typed_frame(df) con el esquema fijo de sus columnas."""
+    schema = pa.schema([(col, column_type(col)) for col in df.columns])
+    return pa.Table.from_pandas(typed_frame(df), preserve_index=False).cast(schema)
+
+
+def dataset_path(root, meta, source):
+    """Archivo Parquet de una página dentro de su partición."""
+    parts = [f"{col}={meta[col]}" for col in PARTITION_COLUMNS]
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(root, *parts, stem + '.parquet')
+
+
+def write_dataset(paths, frames, root):
+    """
+    Guarda cada página como un Parquet tipado (un archivo por modelo) en
+    root/Species=.../Structure=.../<modelo>.parquet, con las columnas
+    de SOURCE_COLUMNS que no son de partición. Reescribir una página
+    sustituye solo su archivo. Devuelve las rutas escritas.
+
+    Todas las tablas se construyen y se validan contra el esquema común
+    antes de tocar el dataset: si una página no encaja, se lanza el error
+    sin haber escrito ningún archivo.
+    """
+    schemas = []
+    common = os.path.join(root, COMMON_METADATA)
+    if os.path.exists(common):
+        schemas.append(pq.read_schema(common))
+    tables = []
+    for path, frame in zip(paths, frames):
+        meta = source_metadata(path)
+        table = typed_table(frame.assign(**{col: meta[col] for col in SOURCE_COLUMNS
+                                            if col not in PARTITION_COLUMNS}))
+        tables.append((dataset_path(root, meta, path), table))
+        schemas.append(table.schema.remove_metadata())
+    # Unión de columnas de todas las páginas, para leer sin inspeccionarlas
+    unified = pa.unify_schemas(schemas) if schemas else None
+
+    written = []
+    for out, table in tables:
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        pq.write_table(table, out + '.tmp')
+        written.append(out)
+    for out in written:
+        os.replace(out + '.tmp', out)
+    if unified is not None:
+        pq.write_metadata(unified, common + '.tmp')
+        os.replace(common + '.tmp', common)
+    return written
+
+
+def read_dataset(root, filters=None, columns=None):
+    """
+    Lee el dataset con filtros empujados a Parquet (misma sintaxis que
+    pandas.read_parquet, p. ej. [('Species', '=', 'Human')]): los filtros
+    por partición descartan carpetas enteras y el resto se evalúa con
+    las estadísticas de cada archivo antes de leer sus filas. Las
+    columnas enteras se devuelven como Int64 (con nulos).
+    """
+    partitioning = pa.schema([(col, pa.string()) for col in PARTITION_COLUMNS])
+    common = os.path.join(root, COMMON_METADATA)
+    schema = None
+    if os.path.exists(common):
+        schema = pq.read_schema(common)
+        for field in partitioning:
+            if schema.get_field_index(field.name) < 0:
+                schema = schema.append(field)
+    # Solo los .parquet de las particiones (otros archivos en root se ignoran)
+    files = sorted(glob(os.path.join(root, *['*'] * len(PARTITION_COLUMNS), '*.parquet')))
+    dataset = ds.dataset(files, schema=schema, format='parquet', partition_base_dir=root,
+                         partitioning=ds.partitioning(partitioning, flavor='hive'))
+    filter_expr = pq.filters_to_expression(filters) if filters else None
+    # Los enteros con nulos (Index) se mantienen como Int64 en lugar de
+    # pasar a float64 en todas las páginas
+    return dataset.to_table(columns=columns, filter=filter_expr).to_pandas(
+        types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+def run_batch(paths, output_file, out_dir=None, workers=None, dataset=None):
+    """
+    Parsea paths y guarda la tabla combinada en output_file (si no es
+    None); con out_dir también un .xlsx por página (nombre del HTML) y
+    con dataset el dataset Parquet tipado (ver write_dataset).
+    Devuelve la tabla.
+    """
+    frames = parse_files(paths, workers)
+    if dataset:
+        write_dataset(paths, frames, dataset)
+
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+        for path, frame in zip(paths, frames):
+            stem = os.path.splitext(os.path.basename(path))[0]
+            frame.drop(columns='SourceFile').to_excel(
+                os.path.join(out_dir, stem + '.xlsx'), index=False)
+
+    combined = pd.concat(frames, ignore_index=True)
+    if output_file:
+        save_table(combined, output_file)
+    print(f"ok {output_file or dataset} ({len(paths)} archivos, {len(combined)} cavidades)")
+    return combined
+
+
 # ----------------------------------------------------------
-rows = []  # Lista para almacenar cada entrada como diccionario
-for row in tbody.find_all('tr', recursive=False):
-    # Saltamos filas de detalle (tienen atributo 'id')
-    if row.get('id'):
-        continue
-
-    # Extraemos celdas de la fila principal
-    cells = row.find_all('td', recursive=False)
-    entry = {
-        'Index':        cells[0].get_text(strip=True),
-        'Pred Max pKd': cells[1].get_text(strip=True),
-        'Pred Ave pKd': cells[2].get_text(strip=True),
-        'DrugScore':    cells[3].get_text(strip=True),
-        'Druggability': cells[4].get_text(strip=True),
-    }
-
-    # La siguiente fila contiene la tabla de detalles colapsables
-    det = row.find_next_sibling('tr')
-    tbl = det.find('table')
-    # Iteramos por cada fila de detalle (clave: <th>, valor: <td>)
-    for dtr in tbl.find_all('tr'):
-        key = dtr.find('th').get_text(strip=True)
-        val = dtr.find('td').get_text(strip=True)
-        entry[key] = val
-
-    # Añadimos la entrada completa a la lista
-    rows.append(entry)
-
-# ----------------------------------------------------------
-# Creación de DataFrame y exportación a Excel
-# ----------------------------------------------------------
-df = pd.DataFrame(rows)
-output_file = "SM-NCCHUMANO-RELAXED03-03.xlsx"
-# Guardamos los datos en un archivo .xlsx sin incluir índice
-df.to_excel(output_file, index=False)
-
-print(f"ok {output_file}")  # Confirmación de generación del archivo
+# Ejecución desde línea de comandos
+# ----------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Extrae las tablas de cavidades de páginas de resultados de CavityPlus."
+    )
+    parser.add_argument('inputs', nargs='*',
+                        help="Carpetas, patrones glob o archivos HTML (vacío = html_doc)")
+    parser.add_argument('-o', '--output',
+                        help=f"Tabla combinada de salida (.xlsx o .csv; por defecto "
+                             f"{DEFAULT_OUTPUT}, o ninguna si se usa --dataset)")
+    parser.add_argument('--dataset',
+                        help="Carpeta del dataset Parquet tipado y particionado")
+    parser.add_argument('--out-dir',
+                        help="Además, guarda un .xlsx por archivo HTML en esta carpeta")
+    parser.add_argument('--workers', type=int, help="Número de procesos")
+    args = parser.parse_args(argv)
+
+    if not args.inputs:
+        # Sin entradas: comportamiento original sobre el html_doc pegado
+        df = pd.DataFrame(parse_cavityplus(io.BytesIO(html_doc.encode('utf-8'))))
+        save_table(df, args.output or DEFAULT_OUTPUT)
+        print(f"ok {args.output or DEFAULT_OUTPUT}")  # Confirmación de generación del archivo
+        return
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        raise SystemExit("No se encontraron archivos HTML en las entradas indicadas.")
+    output = args.output or (None if args.dataset else DEFAULT_OUTPUT)
+    run_batch(paths, output, args.out_dir, args.workers, args.dataset)
+    if telemetry.ENABLED:
+        telemetry.print_summary()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from glob import glob
+
+import matplotlib
+matplotlib.use('Agg')  # El pipeline siempre exporta figuras sin pantalla
+
+# ----------------------------------------------------------
+# Configuración del pipeline
+# ----------------------------------------------------------
+# Estado entre ejecuciones: huella de cada etapa y hashes de archivos
+STATE_NAME = '.pipeline_state.json'
+STATE_VERSION = 1
+# Etapas independientes ejecutadas a la vez (el presupuesto de procesos
+# de --workers se reparte entre ellas)
+JOBS = 2
+
+# Flujo (DAG):
+#   HTML de CavityPlus -> tablas de cavidades -> resúmenes por carpeta
+#   PDBs de los modelos -> RawDataLocal.csv (Ramachandran local, opcional)
+#   RawData.csv (MolProbity) -> datos del dashboard (caché Feather)
+#   PDBs del ensamble -> matriz RMSD -> heatmap
+
+
+# ----------------------------------------------------------
+# Hashes de contenido con caché por tamaño y mtime
+# ----------------------------------------------------------
+class FileHashes:
+    """
+    sha256 de archivos, reutilizando el valor guardado en el estado si
+    tamaño y mtime no cambiaron (no se vuelve a leer el archivo).
+    """
+
+    def __init__(self, cached=None):
+        self.entries = dict(cached or {})
+        self._lock = threading.Lock()
+
+    def digest(self, path):
+        key = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            cached = self.entries.get(key)
+        if cached and cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns:
+            return cached['sha256']
+        with open(path, 'rb') as fh:
+            sha = hashlib.file_digest(fh, 'sha256').hexdigest()
+        with self._lock:
+            self.entries[key] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha}
+        return sha
+
+
+def load_state(path):
+    """Devuelve (huellas por etapa, hashes cacheados) del estado guardado."""
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return {}, {}
+    if data.get('version') != STATE_VERSION:
+        return {}, {}
+    return data.get('stages', {}), data.get('files', {})
+
+
+def save_state(path, stages, files):
+    """Escribe el estado de forma atómica (archivo temporal + replace)."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump({'version': STATE_VERSION, 'stages': stages, 'files': files},
+                  fh, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# ----------------------------------------------------------
+# Etapas
+# ----------------------------------------------------------
+class Stage:
+    """
+    Nodo del DAG.
+
+    - name: identificador de la etapa.
+    - deps: etapas de las que depende (deben terminar antes).
+    - inputs: función que devuelve los archivos de entrada; se evalúa
+      cuando las dependencias han terminado, así ve sus salidas nuevas.
+    - outputs: función que devuelve los archivos que la etapa produce.
+    - params: parámetros que también forman parte de la huella.
+    - run: función sin argumentos que hace el trabajo.
+    """
+
+    def __init__(self, name, inputs, outputs, run, deps=(), params=None):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.run = run
+        self.deps = tuple(deps)
+        self.params = params or {}
+
+    def fingerprint(self, hashes, dep_fingerprints):
+        """Huella de contenido: entradas, parámetros y huellas de las dependencias."""
+        payload = {
+            'stage': self.name,
+            'params': self.params,
+            'inputs': [[os.path.abspath(p), hashes.digest(p)] for p in sorted(self.inputs())],
+            'deps': [dep_fingerprints[d] for d in self.deps],
+        }
+        raw = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(raw).hexdigest()
+
+    def missing_outputs(self):
+        return [p for p in self.outputs() if not os.path.exists(p)]
+
+
+def cavity_tables_stage(html_inputs, table, out_dir, workers=None, dataset=None):
+    """
+    HTML de CavityPlus -> tabla combinada, un .xlsx por página en out_dir
+    y/o el dataset Parquet tipado en dataset.
+    """
+    import parsingCavityPlus
+
+    def inputs():
+        return parsingCavityPlus.expand_inputs(html_inputs)
+
+    def outputs():
+        paths = [table] if table else []
+        if dataset:
+            paths += [parsingCavityPlus.dataset_path(dataset, parsingCavityPlus.source_metadata(p), p)
+                      for p in inputs()]
+        if out_dir:
+            paths += [os.path.join(out_dir, os.path.splitext(os.path.basename(p))[0] + '.xlsx')
+                      for p in inputs()]
+        return paths
+
+    def run():
+        paths = inputs()
+        if not paths:
+            raise RuntimeError("No se encontraron archivos HTML en las entradas indicadas.")
+        parsingCavityPlus.run_batch(paths, table, out_dir, workers, dataset)
+
+    return Stage('cavity_tables', inputs, outputs, run,
+                 params={'table': table, 'out_dir': out_dir, 'dataset': dataset})
+
+
+def folder_summaries_stage(folders, deps=(), workers=1):
+    """Carpetas de .xlsx -> resumen.txt por carpeta (scoresResume)."""
+    import scoresResume
+
+    def inputs():
+        return [p for folder in folders for p in glob(os.path.join(folder, '*.xlsx'))]
+
+    def outputs():
+        return [os.path.join(folder, 'resumen.txt') for folder in folders]
+
+    def run():
+        scoresResume.process_folders(folders, incremental=True, workers=workers)
+
+    return Stage('folder_summaries', inputs, outputs, run, deps=deps,
+                 params={'folders': list(folders)})
+
+
+def ramachandran_scores_stage(pdb_inputs, rawdata, pattern='*.pdb', grids=None, workers=None):
+    """
+    PDBs de los modelos -> puntuación Ramachandran local (aproximada, con
+    Source = 'local') en el CSV rawdata. El CSV no se reescribe: solo se
+    añaden los modelos que aún no tiene, y un CSV de MolProbity sin
+    columna Source se rechaza (ver ramachandranScore.write_rows).
+    """
+    import ramachandranScore
+
+    def inputs():
+        paths = ramachandranScore.expand_inputs(pdb_inputs, pattern)
+        return paths + [grids] if grids else paths
+
+    def run():
+        paths = ramachandranScore.expand_inputs(pdb_inputs, pattern)
+        if grids:
+            ramachandranScore.load_grids(grids)
+        rows = ramachandranScore.score_files(paths, workers, grids)
+        ramachandranScore.write_rows(rows, rawdata)
+
+    return Stage('ramachandran_scores', inputs, lambda: [rawdata], run,
+                 params={'rawdata': rawdata, 'pattern': pattern})
+
+
+def dashboard_data_stage(rawdata, deps=()):
+    """RawData.csv -> DataFrame con metadatos en su sidecar Feather."""
+    import rawData
+
+    def outputs():
+        if not os.path.exists(rawdata):
+            return [rawdata]
+        return [rawData.cache_path_for(rawdata)]
+
+    def run():
+        rawData.load_data(rawdata, use_cache=True)
+
+    return Stage('dashboard_data', lambda: [rawdata], outputs, run, deps=deps,
+                 params={'cache_version': rawData.CACHE_VERSION})
+
+
+def rmsd_heatmap_stage(pdb_dir, out, png, pattern='*.pdb', selection='CA',
+                       cluster=False, workers=None):
+    """PDBs del ensamble -> matriz RMSD condensada (.npy) y su heatmap."""
+    import rmsdEnsemble
+
+    def inputs():
+        return glob(os.path.join(pdb_dir, pattern))
+
+    def outputs():
+        paths = [out, out + '.labels.txt']
+        return paths + [png] if png else paths
+
+    def run():
+        rmsdEnsemble.run_ensemble(pdb_dir, out, pattern=pattern, selection=selection,
+                                  png=png, cluster=cluster, workers=workers)
+
+    return Stage('rmsd_heatmap', inputs, outputs, run,
+                 params={'pattern': pattern, 'selection': selection, 'cluster': cluster,
+                         'out': out, 'png': png})
+
+
+# ----------------------------------------------------------
+# Ejecución incremental del DAG
+# ----------------------------------------------------------
+def run_pipeline(stages, state_path=STATE_NAME, jobs=JOBS, force=False, dry_run=False):
+    """
+    Ejecuta las etapas respetando sus dependencias; hasta `jobs` etapas
+    independientes se lanzan a la vez en hilos. Los procesos de cada
+    etapa se fijan al construirla (ver stage_workers), de modo que el
+    total queda acotado por jobs x procesos por etapa.
+
+    Una etapa se vuelve a ejecutar si cambia su huella (contenido de las
+    entradas, parámetros o huella de una dependencia), si falta alguna de
+    sus salidas o con force=True. Con dry_run solo se informa de lo que
+    se ejecutaría; las etapas que dependen de una obsoleta se dan por
+    obsoletas.
+
+    Devuelve {etapa: 'ok' | 'al día' | 'obsoleta' | 'error' | 'omitida'}.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        unknown = [d for d in stage.deps if d not in by_name]
+        if unknown:
+            raise ValueError(f"{stage.name}: dependencias desconocidas {unknown}")
+
+    saved, cached_files = load_state(state_path)
+    hashes = FileHashes(cached_files)
+    fingerprints = {}
+    status = {}
+    lock = threading.Lock()
+
+    def process(stage):
+        fp = stage.fingerprint(hashes, fingerprints)
+        stale = (force or saved.get(stage.name) != fp or bool(stage.missing_outputs())
+                 or any(status[d] == 'obsoleta' for d in stage.deps))
+        if not stale:
+            return fp, 'al día'
+        if dry_run:
+            return fp, 'obsoleta'
+        print(f"[pipeline] {stage.name}: ejecutando")
+        stage.run()
+        # Huella tras la ejecución (las entradas pueden haber cambiado en la etapa)
+        return stage.fingerprint(hashes, fingerprints), 'ok'
+
+    pending = dict(by_name)
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                deps = [status.get(d) for d in stage.deps]
+                if any(s in ('error', 'omitida') for s in deps):
+                    status[name] = 'omitida'
+                    del pending[name]
+                elif all(s is not None for s in deps):
+                    running[pool.submit(process, stage)] = name
+                    del pending[name]
+            if not running:
+                if pending:
+                    raise ValueError(f"Dependencias cíclicas entre {sorted(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    fp, result = future.result()
+                except Exception as exc:
+                    print(f"[pipeline] {name}: error: {exc}")
+                    status[name] = 'error'
+                    continue
+                with lock:
+                    fingerprints[name] = fp
+                    status[name] = result
+                    if result == 'ok':
+                        saved[name] = fp
+                        # Se guarda tras cada etapa: un fallo posterior no repite esta
+                        save_state(state_path, saved, hashes.entries)
+
+    if not dry_run:
+        save_state(state_path, saved, hashes.entries)
+    return status
+
+
+def stage_workers(workers=None, jobs=JOBS):
+    """
+    Procesos de cada etapa: el presupuesto total (workers, por defecto
+    todos los núcleos) repartido entre las etapas simultáneas, para no
+    lanzar jobs x workers procesos.
+    """
+    total = workers or os.cpu_count() or 1
+    return max(1, total // max(1, jobs))
+
+
+def build_stages(args):
+    """Etapas del DAG según las entradas indicadas en la línea de comandos."""
+    stages = []
+    workers = stage_workers(args.workers, args.jobs)
+    summary_deps = []
+    if args.html:
+        table = args.cavity_table or (None if args.dataset else 'cavidades.xlsx')
+        stages.append(cavity_tables_stage(args.html, table, args.cavity_dir,
+                                          workers, args.dataset))
+        summary_deps.append('cavity_tables')
+    folders = list(args.folders or [])
+    if args.html and args.cavity_dir and args.cavity_dir not in folders:
+        folders.insert(0, args.cavity_dir)
+    if folders:
+        stages.append(folder_summaries_stage(folders, summary_deps, workers))
+    dashboard_deps = []
+    if args.rama_pdbs:
+        stages.append(ramachandran_scores_stage(args.rama_pdbs, args.rama_output, args.pattern,
+                                                args.grids, workers))
+        # Solo si se pidió explícitamente el mismo CSV que el dashboard
+        if args.rama_output == args.rawdata:
+            dashboard_deps.append('ramachandran_scores')
+    if args.rawdata:
+        stages.append(dashboard_data_stage(args.rawdata, dashboard_deps))
+    if args.pdb_dir:
+        stages.append(rmsd_heatmap_stage(args.pdb_dir, args.rmsd_out, args.heatmap,
+                                         args.pattern, args.atoms, args.cluster,
+                                         # Sin --workers, RMSD en serie (sin tiles)
+                                         workers if args.workers else None))
+    return stages
+
+
+# ----------------------------------------------------------
+# Ejecución desde línea de comandos
+# ----------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Pipeline incremental: HTML de CavityPlus -> tablas -> resúmenes, "
+                    "PDBs -> RawData.csv -> dashboard y PDBs -> heatmap RMSD."
+    )
+    parser.add_argument('--html', nargs='+',
+                        help="Carpetas, patrones glob o archivos HTML de CavityPlus")
+    parser.add_argument('--cavity-dir',
+                        help="Carpeta para un .xlsx por página (se resume también)")
+    parser.add_argument('--cavity-table',
+                        help="Tabla combinada de cavidades (.xlsx o .csv; por defecto "
+                             "cavidades.xlsx, o ninguna si se usa --dataset)")
+    parser.add_argument('--dataset',
+                        help="Dataset Parquet tipado de cavidades (parsingCavityPlus)")
+    parser.add_argument('--folders', nargs='+',
+                        help="Carpetas de .xlsx adicionales a resumir")
+    parser.add_argument('--rawdata', help="CSV de MolProbity para el dashboard")
+    parser.add_argument('--rama-pdbs', nargs='+',
+                        help="PDBs o carpetas a puntuar con ramachandranScore")
+    parser.add_argument('--rama-output', default='RawDataLocal.csv',
+                        help="CSV de las puntuaciones locales (aproximadas, columna Source)")
+    parser.add_argument('--grids', help="Rejillas Ramachandran propias (.npz)")
+    parser.add_argument('--pdb-dir', help="Carpeta con los PDB del ensamble")
+    parser.add_argument('--pattern', default='*.pdb', help="Patrón de archivos PDB")
+    parser.add_argument('--atoms', choices=['CA', 'backbone'], default='CA',
+                        help="Átomos usados para el RMSD")
+    parser.add_argument('--cluster', action='store_true',
+                        help="Ordena el heatmap por agrupamiento jerárquico")
+    parser.add_argument('--rmsd-out', default='rmsd.npy', help="Matriz RMSD condensada")
+    parser.add_argument('--heatmap', default='heatmap_rmsd.png', help="PNG del heatmap")
+    parser.add_argument('--workers', type=int,
+                        help="Procesos en total (por defecto todos los núcleos), repartidos "
+                             "entre las etapas simultáneas")
+    parser.add_argument('--jobs', type=int, default=JOBS,
+                        help="Etapas independientes ejecutadas a la vez")
+    parser.add_argument('--state', default=STATE_NAME, help="Archivo de estado del pipeline")
+    parser.add_argument('--force', action='store_true', help="Ejecuta todas las etapas")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Solo muestra qué etapas están obsoletas")
+    args = parser.parse_args(argv)
+
+    stages = build_stages(args)
+    if not stages:
+        parser.error("Indica al menos una entrada: --html, --folders, --rawdata, --rama-pdbs o --pdb-dir")
+    status = run_pipeline(stages, args.state, args.jobs, args.force, args.dry_run)
+    for stage in stages:
+        print(f"{stage.name:20s} {status[stage.name]}")
+    if any(s in ('error', 'omitida') for s in status.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python
+
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from glob import glob
+
+import numpy as np
+
+import telemetry
+
+# ----------------------------------------------------------
+# Configuración: columnas de RawData.csv y rejillas de referencia
+# ----------------------------------------------------------
+# Mismo esquema que las filas copiadas del servidor de MolProbity, más
+# la columna Source que marca las filas aproximadas de este script
+COLUMNS = [
+    'FileName',
+    'Ramachandran Favored (>98%)',
+    'Ramachandran Outliers (<0.05%)',
+    'Ramachandran Z-Score (abs(ZScore)<2)',
+    'Source',
+]
+# Valor de Source en las filas de este script (las de MolProbity no lo llevan)
+SOURCE = 'local'
+# CSV de salida por defecto: separado del RawData.csv de MolProbity
+DEFAULT_OUTPUT = 'RawDataLocal.csv'
+
+# Tamaño de celda (grados) de las rejillas phi/psi
+GRID_STEP = 1
+GRID_SIZE = 360 // GRID_STEP
+
+# Fracción de la densidad de referencia dentro de cada contorno, como en
+# MolProbity: favorecida = 98 %, permitida = 99.95 %
+FAVORED_MASS = 0.98
+ALLOWED_MASS = 0.9995
+
+# Distancia C(i-1)-N(i) máxima (Å) para considerar continua la cadena
+PEPTIDE_BOND_MAX = 2.0
+
+# Densidades de referencia aproximadas por clase de residuo, como mezcla
+# de gaussianas periódicas: (phi, psi, sd_phi, sd_psi, peso).
+# NO son las distribuciones Top8000 de MolProbity: reproducen la forma de
+# las regiones clásicas (hélice alfa, lámina beta, PPII, alfa izquierda)
+# y bastan para ordenar modelos entre sí, pero los porcentajes y el
+# Z-score no son idénticos a los del servidor. Con --grids se pueden
+# usar rejillas propias (p. ej. derivadas de Top8000).
+REFERENCE = {
+    'general': [
+        (-63, -42, 12, 12, 0.45),
+        (-120, 130, 25, 20, 0.25),
+        (-68, 145, 12, 15, 0.20),
+        (-90, 0, 20, 20, 0.04),
+        (60, 40, 10, 12, 0.04),
+        (-100, 80, 40, 60, 0.02),
+    ],
+    'glycine': [
+        (-65, -40, 15, 15, 0.20),
+        (65, 40, 15, 15, 0.20),
+        (180, 180, 30, 30, 0.25),
+        (-80, 175, 20, 20, 0.15),
+        (80, -175, 20, 20, 0.15),
+        (0, 0, 60, 60, 0.05),
+    ],
+    'proline': [
+        (-65, -30, 10, 15, 0.45),
+        (-67, 145, 10, 15, 0.50),
+        (-85, 70, 10, 15, 0.05),
+    ],
+    'prepro': [
+        (-62, -40, 15, 15, 0.30),
+        (-125, 150, 25, 20, 0.35),
+        (-70, 140, 12, 15, 0.30),
+        (55, 45, 10, 10, 0.05),
+    ],
+}
+CATEGORIES = list(REFERENCE)
+
+# Niveles de las rejillas de clasificación
+OUTLIER, ALLOWED, FAVORED = 0, 1, 2
+
+# Rejillas cargadas con --grids (None = densidades de REFERENCE)
+_custom_grids = None
+
+
+# ----------------------------------------------------------
+# Rejillas de referencia: densidad, contornos y momentos del Z-score
+# ----------------------------------------------------------
+def _wrap(delta):
+    # Diferencia angular en (-180, 180]
+    return (delta + 180.0) % 360.0 - 180.0
+
+
+def reference_density(components):
+    """Densidad normalizada (GRID_SIZE x GRID_SIZE) indexada [phi, psi]."""
+    centers = np.arange(GRID_SIZE) * GRID_STEP - 180.0 + GRID_STEP / 2
+    phi, psi = np.meshgrid(centers, centers, indexing='ij')
+    density = np.zeros_like(phi)
+    for mphi, mpsi, sphi, spsi, weight in components:
+        dphi = _wrap(phi - mphi) / sphi
+        dpsi = _wrap(psi - mpsi) / spsi
+        density += weight / (sphi * spsi) * np.exp(-0.5 * (dphi ** 2 + dpsi ** 2))
+    density += density.max() * 1e-9  # Sin celdas de densidad cero (log finito)
+    return density / density.sum()
+
+
+def contour_levels(density):
+    """
+    Nivel de cada celda (OUTLIER/ALLOWED/FAVORED) según la masa acumulada
+    de las celdas más densas, como los contornos de MolProbity.
+    """
+    flat = density.ravel()
+    order = np.argsort(flat)[::-1]
+    mass = np.cumsum(flat[order])
+    levels = np.full(flat.size, OUTLIER, dtype=np.int8)
+    levels[order[mass - flat[order] < ALLOWED_MASS]] = ALLOWED
+    levels[order[mass - flat[order] < FAVORED_MASS]] = FAVORED
+    return levels.reshape(density.shape)
+
+
+@lru_cache(maxsize=None)
+def reference_grids():
+    """
+    Para cada clase de residuo: (niveles, log_densidad, media, varianza).
+    Media y varianza del log de la densidad bajo la propia referencia
+    sirven para el Z-score aproximado.
+    """
+    grids = {}
+    for category in CATEGORIES:
+        if _custom_grids is not None and category in _custom_grids:
+            density = np.asarray(_custom_grids[category], dtype=np.float64)
+            density = density + density.max() * 1e-9
+            density /= density.sum()
+        else:
+            density = reference_density(REFERENCE[category])
+        logp = np.log(density)
+        mean = float((density * logp).sum())
+        var = float((density * logp ** 2).sum()) - mean ** 2
+        grids[category] = (contour_levels(density), logp, mean, var)
+    return grids
+
+
+def load_grids(path):
+    """
+    Sustituye las densidades de referencia por las de un .npz con una
+    rejilla GRID_SIZE x GRID_SIZE (índices [phi, psi], desde -180°) por
+    clase: general, glycine, proline, prepro. Las clases ausentes siguen
+    usando REFERENCE.
+    """
+    global _custom_grids
+    with np.load(path) as data:
+        grids = {k: data[k] for k in data.files if k in REFERENCE}
+    for name, grid in grids.items():
+        if grid.shape != (GRID_SIZE, GRID_SIZE):
+            raise ValueError(f"{path}: la rejilla {name} debe ser {GRID_SIZE}x{GRID_SIZE}")
+    _custom_grids = grids
+    reference_grids.cache_clear()
+
+
+# ----------------------------------------------------------
+# Lectura de la cadena principal y ángulos diedros
+# ----------------------------------------------------------
+def read_backbone(path):
+    """
+    Átomos N, CA y C de cada residuo del primer modelo de un PDB.
+
+    Devuelve (chains, resnums, resnames, coords) con coords de forma
+    (n_residuos, 3, 3) en el orden N, CA, C. Los residuos sin alguno de
+    los tres átomos se descartan; para ubicaciones alternativas se
+    conserva la primera.
+    """
+    slots = {'N': 0, 'CA': 1, 'C': 2}
+    residues = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as fh:
+        for line in fh:
+            if line.startswith('ENDMDL'):
+                break  # Solo el primer modelo
+            if not line.startswith('ATOM'):
+                continue
+            slot = slots.get(line[12:16].strip())
+            if slot is None:
+                continue
+            key = (line[21], int(line[22:26]), line[26].strip())
+            entry = residues.get(key)
+            if entry is None:
+                entry = residues[key] = [line[17:20].strip(), [None, None, None]]
+            if entry[1][slot] is None:
+                entry[1][slot] = (float(line[30:38]), float(line[38:46]), float(line[46:54]))
+
+    complete = [(key, name, atoms) for key, (name, atoms) in residues.items()
+                if all(a is not None for a in atoms)]
+    chains = np.array([key[0] for key, _, _ in complete])
+    resnums = np.array([key[1] for key, _, _ in complete], dtype=np.int64)
+    resnames = np.array([name for _, name, _ in complete])
+    coords = np.array([atoms for _, _, atoms in complete], dtype=np.float64).reshape(-1, 3, 3)
+    return chains, resnums, resnames, coords
+
+
+def dihedrals(p0, p1, p2, p3):
+    """Ángulos diedros (grados) de arrays de puntos (n, 3), en un solo paso."""
+    b0 = p0 - p1
+    b1 = p2 - p1
+    b2 = p3 - p2
+    b1 = b1 / np.linalg.norm(b1, axis=1, keepdims=True)
+    v = b0 - np.einsum('ij,ij->i', b0, b1)[:, None] * b1
+    w = b2 - np.einsum('ij,ij->i', b2, b1)[:, None] * b1
+    x = np.einsum('ij,ij->i', v, w)
+    y = np.einsum('ij,ij->i', np.cross(b1, v), w)
+    return np.degrees(np.arctan2(y, x))
+
+
+def phi_psi(chains, coords):
+    """
+    phi/psi de los residuos con vecino a ambos lados en la misma cadena y
+    enlace peptídico continuo (los extremos y cortes no tienen ambos
+    ángulos). Devuelve (índices_de_residuo, phi, psi).
+    """
+    if len(coords) < 3:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+    N, CA, C = coords[:, 0], coords[:, 1], coords[:, 2]
+    # Enlace i -> i+1 válido: misma cadena y C(i)-N(i+1) a distancia peptídica
+    linked = (chains[:-1] == chains[1:]) & (
+        np.linalg.norm(N[1:] - C[:-1], axis=1) <= PEPTIDE_BOND_MAX)
+    idx = np.flatnonzero(linked[:-1] & linked[1:]) + 1
+    phi = dihedrals(C[idx - 1], N[idx], CA[idx], C[idx])
+    psi = dihedrals(N[idx], CA[idx], C[idx], N[idx + 1])
+    return idx, phi, psi
+
+
+def residue_categories(resnames, idx):
+    """Clase de referencia de cada residuo evaluado (índices en CATEGORIES)."""
+    names = resnames[idx]
+    nxt = resnames[np.minimum(idx + 1, len(resnames) - 1)]
+    cat = np.full(len(idx), CATEGORIES.index('general'), dtype=np.int64)
+    cat[nxt == 'PRO'] = CATEGORIES.index('prepro')
+    cat[names == 'GLY'] = CATEGORIES.index('glycine')
+    cat[names == 'PRO'] = CATEGORIES.index('proline')
+    return cat
+
+
+# ----------------------------------------------------------
+# Puntuación de un modelo
+# ----------------------------------------------------------
+def score_backbone(chains, resnames, coords):
+    """
+    Porcentaje de residuos en región favorecida, porcentaje de outliers y
+    Z-score aproximado de un modelo.
+
+    Cada par phi/psi se clasifica por consulta directa a la rejilla de su
+    clase. El Z-score es la media por residuo del log de la densidad de
+    referencia estandarizado con la media y la desviación de su clase
+    bajo la propia referencia: negativo = conformaciones poco habituales,
+    positivo = más ideales de lo normal. Al ser una media no crece con la
+    longitud de la cadena, así que se lee en la escala de MolProbity
+    (|Z| < 2 aceptable), aunque no está calibrado con el mismo conjunto
+    de datos que su Rama-Z.
+    """
+    idx, phi, psi = phi_psi(chains, coords)
+    if len(idx) == 0:
+        return np.nan, np.nan, np.nan
+    cat = residue_categories(resnames, idx)
+    i = np.floor((phi + 180.0) / GRID_STEP).astype(np.int64) % GRID_SIZE
+    j = np.floor((psi + 180.0) / GRID_STEP).astype(np.int64) % GRID_SIZE
+
+    grids = reference_grids()
+    levels = np.empty(len(idx), dtype=np.int8)
+    z_sum = 0.0
+    for k, category in enumerate(CATEGORIES):
+        mask = cat == k
+        if not mask.any():
+            continue
+        grid, logp, mean, var = grids[category]
+        levels[mask] = grid[i[mask], j[mask]]
+        # Suma de los Z por residuo de esta clase
+        z_sum += (float(logp[i[mask], j[mask]].sum()) - mean * mask.sum()) / np.sqrt(var)
+
+    n = len(idx)
+    favored = 100.0 * np.count_nonzero(levels == FAVORED) / n
+    outliers = 100.0 * np.count_nonzero(levels == OUTLIER) / n
+    zscore = z_sum / n
+    return favored, outliers, zscore
+
+
+def score_file(path, tr=telemetry.NULL_TRACE):
+    """Fila de RawData.csv para un PDB: el nombre del archivo (sin extensión) y sus métricas."""
+    chains, _, resnames, coords = read_backbone(path)
+    tr.mark('read')
+    favored, outliers, zscore = score_backbone(chains, resnames, coords)
+    tr.mark('score')
+    tr.count('residues', len(coords))
+    return {
+        COLUMNS[0]: os.path.splitext(os.path.basename(path))[0],
+        COLUMNS[1]: round(favored, 2),
+        COLUMNS[2]: round(outliers, 2),
+        COLUMNS[3]: round(zscore, 2),
+        COLUMNS[4]: SOURCE,
+    }
+
+
+def _score_file_traced(path):
+    # Unidad de trabajo del pool; la traza vuelve al proceso principal
+    tr = telemetry.trace('ramachandranScore.file', file=os.path.basename(path))
+    return score_file(path, tr), tr.close()
+
+
+def _init_worker(grids_path):
+    # Los procesos hijos cargan las mismas rejillas que el principal
+    if grids_path:
+        load_grids(grids_path)
+
+
+def score_files(paths, workers=None, grids_path=None):
+    """
+    Puntúa varios PDBs repartidos en un pool de procesos.
+
+    Parámetros:
+    - paths: lista de archivos PDB.
+    - workers: número de procesos (None = todos los núcleos).
+    - grids_path: .npz de rejillas propias (ver load_grids).
+
+    Devuelve la lista de filas en el mismo orden que paths.
+    """
+    if len(paths) <= 1 or workers == 1:
+        salidas = [_score_file_traced(p) for p in paths]
+    else:
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(grids_path,)) as pool:
+            salidas = list(pool.map(_score_file_traced, paths, chunksize=chunksize))
+    for _, payload in salidas:
+        telemetry.record(payload)
+    return [row for row, _ in salidas]
+
+
+def expand_inputs(inputs, pattern='*.pdb'):
+    """Carpetas, patrones glob o rutas sueltas -> lista ordenada de PDBs."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(glob(os.path.join(item, pattern)))
+        elif any(ch in item for ch in '*?['):
+            paths.extend(glob(item))
+        else:
+            paths.append(item)
+    return sorted(set(paths))
+
+
+def write_rows(rows, output_file):
+    """
+    Escribe las filas en formato RawData.csv sin reescribir nunca un CSV
+    existente: si output_file ya existe, solo se añaden al final las filas
+    cuyo FileName aún no está, respetando sus columnas (las que no calcula
+    este script quedan vacías), de modo que el dashboard las recoge sin
+    reiniciarse.
+
+    Los valores son aproximados (ver REFERENCE) y cada fila lleva
+    Source = SOURCE. Un CSV existente sin columna Source (p. ej. el
+    exportado de MolProbity) se rechaza: sus filas no podrían
+    distinguirse de las aproximadas. Las líneas nuevas usan el mismo fin
+    de línea que el archivo.
+
+    Devuelve el número de filas escritas.
+    """
+    header = COLUMNS
+    known = set()
+    newline = '\n'
+    exists = os.path.exists(output_file) and os.path.getsize(output_file) > 0
+    if exists:
+        with open(output_file, 'r', encoding='utf-8', newline='') as fh:
+            reader = csv.reader(fh)
+            header = next(reader)
+            for col in (COLUMNS[0], COLUMNS[4]):
+                if col not in header:
+                    raise ValueError(
+                        f"{output_file} no tiene la columna {col}: escribe las "
+                        f"puntuaciones locales en otro CSV (p. ej. {DEFAULT_OUTPUT})")
+            col = header.index(COLUMNS[0])
+            known = {line[col] for line in reader if len(line) > col}
+        # Fin de línea del archivo y si el último registro está terminado
+        with open(output_file, 'rb') as fh:
+            first = fh.readline()
+            if first.endswith(b'\r\n'):
+                newline = '\r\n'
+            fh.seek(-1, os.SEEK_END)
+            needs_newline = fh.read(1) not in (b'\n', b'\r')
+    nuevas = []
+    for row in rows:
+        if row[COLUMNS[0]] not in known:
+            known.add(row[COLUMNS[0]])
+            nuevas.append(row)
+    if exists and not nuevas:
+        return 0
+    with open(output_file, 'a' if exists else 'w', encoding='utf-8', newline='') as fh:
+        if exists and needs_newline:
+            fh.write(newline)
+        writer = csv.DictWriter(fh, fieldnames=header, extrasaction='ignore', restval='',
+                                lineterminator=newline)
+        if not exists:
+            writer.writeheader()
+        writer.writerows(nuevas)
+    return len(nuevas)
+
+
+# ----------------------------------------------------------
+# Ejecución desde línea de comandos
+# ----------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Puntuación Ramachandran local (favored/outliers/Z) de modelos PDB "
+                    "en el formato de RawData.csv."
+    )
+    parser.add_argument('inputs', nargs='+', help="Carpetas, patrones glob o archivos PDB")
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT,
+                        help="CSV de salida (con columna Source); si existe solo se "
+                             "añaden los modelos que no tiene")
+    parser.add_argument('--pattern', default='*.pdb', help="Patrón de archivos en carpetas")
+    parser.add_argument('--grids', help="Rejillas de referencia propias (.npz)")
+    parser.add_argument('--workers', type=int, help="Número de procesos")
+    args = parser.parse_args(argv)
+
+    paths = expand_inputs(args.inputs, args.pattern)
+    if not paths:
+        raise SystemExit("No se encontraron archivos PDB en las entradas indicadas.")
+    if args.grids:
+        load_grids(args.grids)
+    rows = score_files(paths, args.workers, args.grids)
+    written = write_rows(rows, args.output)
+    print(f"ok {args.output} ({written} de {len(rows)} modelos nuevos)")
+    if telemetry.ENABLED:
+        telemetry.print_summary()
+
+
+if __name__ == '__main__':
+    main()
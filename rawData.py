@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+import glob
+import hashlib
+import io
+import os
+import re
+
+import pandas as pd
+
+# ----------------------------------------------------------
+# Lectura de RawData.csv: metadatos del nombre de archivo y caché
+# ----------------------------------------------------------
+# Módulo sin dependencias de Dash, para que los scripts de línea de
+# comandos (modelRanking, pipeline) lean el CSV sin construir la app.
+META_COLUMNS = ['Structure', 'Software', 'Protein', 'ModelBase', 'Relaxed']
+# Una sola pasada sobre FileName: cada lookahead equivale a una de las
+# búsquedas independientes (primera coincidencia) y captura su campo.
+FILENAME_PATTERN = re.compile(
+    r'^(?=(?P<Structure>MON|DIM))?'
+    r'(?=.*?-(?P<Software>AF|RF|SM|MD))?'
+    r'(?=.*?-(?P<Protein>NCChumano|NCCAnguila))?'
+    r'(?=.*?-(?P<ModelBase>\d{2}))?'
+    r'(?=.*?-(?P<Relaxed>Relaxed\d?))?',
+    re.DOTALL
+)
+# Versión del formato de caché (cambiarla invalida los sidecars existentes)
+CACHE_VERSION = 1
+
+# ----------------------------------------------------------
+# Función para cargar y procesar el CSV con nombres de archivo
+# ----------------------------------------------------------
+def parse_filenames(names):
+    """
+    Extrae Structure, Software, Protein, ModelBase y Relaxed de una serie
+    de nombres con una sola expresión compilada, evaluada una vez por
+    nombre distinto.
+    """
+    codes, uniques = pd.factorize(names)
+    meta = pd.Series(uniques, dtype=object).str.extract(FILENAME_PATTERN)
+    meta = meta.reindex(codes)  # -1 (nombre ausente) -> fila NaN
+    meta.index = names.index
+    meta['Relaxed'] = meta['Relaxed'].fillna('Base')  # Asigna 'Base' cuando no hay etiqueta Relaxed
+    return meta
+
+
+def _add_metadata(df):
+    meta = parse_filenames(df['FileName'])
+    for col in META_COLUMNS:
+        df[col] = meta[col]
+    # Metadatos como categóricos: códigos enteros en lugar de objetos str
+    df[META_COLUMNS] = df[META_COLUMNS].astype('category')
+    return df
+
+
+def _cache_path(file_path, digest):
+    return f"{file_path}.{digest[:16]}.v{CACHE_VERSION}.feather"
+
+
+def cache_path_for(path):
+    """Sidecar Feather que corresponde al contenido actual de path."""
+    with open(path, 'rb') as fh:
+        digest = hashlib.sha256(fh.read()).hexdigest()
+    return _cache_path(path, digest)
+
+
+def _read_csv_bytes(file_path, use_cache=True, complete_lines=False):
+    """
+    Lee el CSV y devuelve (df, nbytes, tail, digest): el DataFrame con
+    metadatos, los bytes consumidos, sus últimos bytes (para detectar
+    anexos) y el hash de esos bytes.
+
+    Con complete_lines=True se ignora una última línea sin salto de línea
+    (una fila que aún se está escribiendo).
+
+    El resultado parseado se guarda en un sidecar Feather junto al CSV,
+    identificado por el hash del contenido; si existe, se evita volver a
+    parsear el CSV y a aplicar las expresiones regulares.
+    """
+    with open(file_path, 'rb') as fh:
+        raw = fh.read()
+    if complete_lines and b'\n' in raw:
+        raw = raw[:raw.rfind(b'\n') + 1]
+    digest = hashlib.sha256(raw).hexdigest()
+    cache = _cache_path(file_path, digest)
+
+    df = None
+    if use_cache and os.path.exists(cache):
+        try:
+            df = pd.read_feather(cache)
+        except (ImportError, ValueError, OSError):
+            df = None  # Sidecar ilegible: se vuelve a parsear
+    if df is None:
+        df = _add_metadata(pd.read_csv(io.BytesIO(raw)))
+        if use_cache:
+            _write_cache(df, file_path, digest)
+    return df, len(raw), raw[-64:], digest
+
+
+def _write_cache(df, file_path, digest):
+    # Sustituye sidecars de versiones anteriores del CSV
+    cache = _cache_path(file_path, digest)
+    try:
+        df.to_feather(cache + '.tmp')
+        os.replace(cache + '.tmp', cache)
+    except (ImportError, ValueError, TypeError, OSError) as exc:
+        print(f"Aviso: no se pudo guardar la caché {cache}: {exc}")
+        return
+    for old in glob.glob(f"{glob.escape(file_path)}.*.feather"):
+        if old != cache:
+            os.remove(old)
+
+
+def load_data(file_path, use_cache=True):
+    """
+    Carga datos desde CSV y extrae metadatos de la columna FileName:
+    - Estructura: MON o DIM
+    - Software: AF, RF, SM o MD
+    - Proteína: NCChumano o NCCAnguila
+    - Modelo base: dos dígitos
+    - Nivel de relajación: Base o RelaxedX
+
+    Con use_cache=True se reutiliza el sidecar Feather del mismo contenido.
+    """
+    df, _, _, _ = _read_csv_bytes(file_path, use_cache)
+    print(f"Cargando: {file_path}")
+    return df
+
+# ----------------------------------------------------------
+# Recarga en caliente de filas añadidas al CSV
+# ----------------------------------------------------------
+class LiveData:
+    """
+    Mantiene el DataFrame de un CSV al que se añaden filas al final.
+
+    Solo se leen líneas completas: una fila a medio escribir se incorpora
+    cuando llega su salto de línea. refresh() compara tamaño y mtime con
+    la última lectura; si el archivo creció con el mismo contenido previo
+    solo lee los bytes nuevos y los concatena. Si se reescribe (aunque
+    conserve la longitud) o se acorta, se recarga entero (con caché).
+    """
+
+    def __init__(self, file_path, use_cache=True):
+        self.file_path = file_path
+        self.use_cache = use_cache
+        self.df = None
+        self.offset = 0
+        self.tail = b''
+        self.digest = None
+        # (tamaño, mtime_ns) del archivo en la última lectura
+        self.stamp = None
+
+    def _stamp(self):
+        st = os.stat(self.file_path)
+        return st.st_size, st.st_mtime_ns
+
+    def load(self):
+        # La marca se toma antes de leer: un cambio posterior se detecta después
+        self.stamp = self._stamp()
+        self.df, self.offset, self.tail, self.digest = _read_csv_bytes(
+            self.file_path, self.use_cache, complete_lines=True)
+        print(f"Cargando: {self.file_path}")
+        return self.df
+
+    def refresh(self):
+        """Incorpora cambios del CSV; devuelve True si el DataFrame cambió."""
+        stamp = self._stamp()
+        if stamp == self.stamp:
+            return False
+        size = stamp[0]
+        with open(self.file_path, 'rb') as fh:
+            if size == self.offset:
+                # Misma longitud: touch (mismo contenido) o CSV corregido
+                same = hashlib.sha256(fh.read()).hexdigest() == self.digest
+                if same:
+                    self.stamp = stamp
+                    return False
+                self.load()
+                return True
+            fh.seek(max(self.offset - len(self.tail), 0))
+            same_prefix = size > self.offset and fh.read(len(self.tail)) == self.tail
+            chunk = fh.read(size - self.offset) if same_prefix else b''
+        if not same_prefix:
+            self.load()  # Reescritura: recarga completa
+            return True
+
+        # Solo líneas completas; el resto se lee en la próxima llamada
+        self.stamp = stamp
+        end = chunk.rfind(b'\n') + 1
+        if end == 0:
+            return False
+        chunk = chunk[:end]
+        new = pd.read_csv(io.BytesIO(chunk), header=None,
+                          names=[c for c in self.df.columns if c not in META_COLUMNS])
+        new = _add_metadata(new)
+        df = pd.concat([self.df, new], ignore_index=True)
+        df[META_COLUMNS] = df[META_COLUMNS].astype(str).where(df[META_COLUMNS].notna()).astype('category')
+
+        self.offset += end
+        self.tail = (self.tail + chunk)[-64:]
+        self.df = df
+        print(f"Filas nuevas en {self.file_path}: {len(new)}")
+        with open(self.file_path, 'rb') as fh:
+            self.digest = hashlib.sha256(fh.read(self.offset)).hexdigest()
+        if self.use_cache:
+            _write_cache(df, self.file_path, self.digest)
+        return True
@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob
+
+import numpy as np
+
+import condensedMatrix as cm
+from heatMaps import plot_heatmap_with_values
+
+# ----------------------------------------------------------
+# Configuración de selección de átomos
+# ----------------------------------------------------------
+# Conjuntos de átomos admitidos para la superposición
+ATOM_SELECTIONS = {
+    'CA': ('CA',),
+    'backbone': ('N', 'CA', 'C', 'O'),
+}
+
+# Número de modelos por bloque al recorrer la matriz (controla memoria)
+BLOCK_SIZE = 128
+# Tamaño de tile en el modo paralelo (filas x columnas de la matriz)
+TILE_SIZE = 256
+
+
+# ----------------------------------------------------------
+# Lectura de coordenadas desde archivos PDB
+# ----------------------------------------------------------
+def read_pdb_atoms(path, atom_names=('CA',)):
+    """
+    Lee los registros ATOM del primer modelo de un PDB.
+
+    Parámetros:
+    - path: ruta al archivo PDB.
+    - atom_names: nombres de átomo a conservar (p. ej. ('CA',)).
+
+    Devuelve un diccionario {(cadena, resSeq, iCode, átomo): (x, y, z)}
+    en el orden en que aparecen en el archivo. Para ubicaciones
+    alternativas se conserva la primera.
+    """
+    wanted = set(atom_names)
+    atoms = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as fh:
+        for line in fh:
+            if line.startswith('ENDMDL'):
+                break  # Solo el primer modelo
+            if not line.startswith('ATOM'):
+                continue
+            name = line[12:16].strip()
+            if name not in wanted:
+                continue
+            key = (line[21], int(line[22:26]), line[26].strip(), name)
+            if key in atoms:
+                continue  # Ubicación alternativa ya registrada
+            atoms[key] = (float(line[30:38]), float(line[38:46]), float(line[46:54]))
+    return atoms
+
+
+def load_ensemble(directory, pattern='*.pdb', selection='CA'):
+    """
+    Carga un ensamble de PDBs con átomos emparejados entre modelos.
+
+    Parámetros:
+    - directory: carpeta con los modelos.
+    - pattern: patrón glob de los archivos a leer.
+    - selection: 'CA' o 'backbone' (ver ATOM_SELECTIONS).
+
+    Devuelve (labels, coords) donde coords es un array
+    (n_modelos, n_átomos, 3) con los átomos comunes a todos los
+    modelos, en el orden del primer modelo.
+    """
+    paths = sorted(glob(os.path.join(directory, pattern)))
+    if not paths:
+        raise FileNotFoundError(f"No se encontraron PDBs en {directory} ({pattern})")
+
+    atom_names = ATOM_SELECTIONS[selection]
+    models = [read_pdb_atoms(p, atom_names) for p in paths]
+
+    # Átomos presentes en todos los modelos, en el orden del primero
+    common = set(models[0])
+    for atoms in models[1:]:
+        common.intersection_update(atoms)
+    keys = [k for k in models[0] if k in common]
+    if not keys:
+        raise ValueError("Los modelos no comparten átomos con la selección indicada.")
+
+    coords = np.array([[atoms[k] for k in keys] for atoms in models], dtype=np.float64)
+    labels = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    return labels, coords
+
+
+# ----------------------------------------------------------
+# Superposición de Kabsch vectorizada
+# ----------------------------------------------------------
+def center_coords(coords):
+    """
+    Centra cada modelo en su centroide y precalcula sus normas cuadradas.
+
+    Devuelve (X, sqnorm): X con la misma forma que coords y sqnorm
+    con la suma de cuadrados de cada modelo.
+    """
+    X = coords - coords.mean(axis=1, keepdims=True)
+    sqnorm = np.einsum('mni,mni->m', X, X)
+    return X, sqnorm
+
+
+def rmsd_block(X, sqnorm, rows, cols):
+    """
+    RMSD superpuesto entre los modelos rows y cols (índices o slices).
+
+    Las matrices de covarianza de todos los pares se obtienen con un único
+    producto matricial y sus valores singulares con una SVD apilada, sin
+    bucle en Python por par. La rotación óptima no se construye: el RMSD
+    mínimo sale directamente de los valores singulares (Kabsch).
+    """
+    A, B = X[rows], X[cols]
+    a, n, _ = A.shape
+    b = B.shape[0]
+
+    # H[p, q] = A[p]^T B[q]  ->  (a, b, 3, 3) con una sola GEMM
+    H = A.transpose(0, 2, 1).reshape(a * 3, n) @ B.transpose(1, 0, 2).reshape(n, b * 3)
+    H = H.reshape(a, 3, b, 3).transpose(0, 2, 1, 3)
+
+    s = np.linalg.svd(H, compute_uv=False)
+    # Corrección de reflexión: signo del determinante de H
+    d = np.sign(np.linalg.det(H))
+    traza = s[..., 0] + s[..., 1] + d * s[..., 2]
+
+    msd = (sqnorm[rows][:, None] + sqnorm[cols][None, :] - 2.0 * traza) / n
+    return np.sqrt(np.clip(msd, 0.0, None))
+
+
+def store_block(out, block, i0, j0, m):
+    """
+    Copia en la forma condensada out la parte i < j de un bloque cuyas
+    esquinas son (i0, j0); cada fila del bloque es un tramo contiguo.
+    """
+    width = block.shape[1]
+    for r in range(block.shape[0]):
+        i = i0 + r
+        start = max(j0, i + 1)
+        if start >= j0 + width:
+            continue
+        pos = cm.condensed_index(i, start, m)
+        out[pos:pos + j0 + width - start] = block[r, start - j0:]
+
+
+def rmsd_condensed(coords, block_size=BLOCK_SIZE):
+    """
+    Calcula la matriz RMSD todos-contra-todos de un ensamble en forma
+    condensada float32 (triángulo superior, ver condensedMatrix).
+
+    Parámetros:
+    - coords: array (n_modelos, n_átomos, 3) con átomos emparejados.
+    - block_size: modelos por bloque (limita la memoria de cada SVD apilada).
+    """
+    X, sqnorm = center_coords(np.asarray(coords, dtype=np.float64))
+    m = X.shape[0]
+    cond = np.empty(cm.condensed_size(m), dtype=cm.DTYPE)
+
+    # Solo bloques del triángulo superior
+    for i0 in range(0, m, block_size):
+        rows = slice(i0, min(i0 + block_size, m))
+        for j0 in range(i0, m, block_size):
+            cols = slice(j0, min(j0 + block_size, m))
+            store_block(cond, rmsd_block(X, sqnorm, rows, cols), i0, j0, m)
+    return cond
+
+
+def rmsd_matrix(coords, block_size=BLOCK_SIZE):
+    """
+    Calcula la matriz RMSD todos-contra-todos de un ensamble.
+
+    Devuelve un array cuadrado float32 simétrico con diagonal cero; para
+    ensambles grandes conviene rmsd_condensed.
+    """
+    return cm.squareform(rmsd_condensed(coords, block_size))
+
+
+# ----------------------------------------------------------
+# Modo paralelo por tiles con salida en memmap reanudable
+# ----------------------------------------------------------
+# Estado de cada proceso trabajador (abierto una vez en el initializer)
+_worker = {}
+
+
+def _tiles(m, tile_size):
+    """Tiles del triángulo superior como (i0, i1, j0, j1), en orden fijo."""
+    starts = range(0, m, tile_size)
+    return [(i0, min(i0 + tile_size, m), j0, min(j0 + tile_size, m))
+            for i0 in starts for j0 in starts if j0 >= i0]
+
+
+def _init_worker(coords_path, sqnorm_path, out_path):
+    # Las coordenadas se mapean en modo lectura: todos los procesos
+    # comparten las mismas páginas del sistema operativo sin copiarlas.
+    _worker['X'] = np.load(coords_path, mmap_mode='r')
+    _worker['sqnorm'] = np.load(sqnorm_path, mmap_mode='r')
+    _worker['out'] = np.load(out_path, mmap_mode='r+')
+
+
+def _compute_tile(tile_id, tile):
+    i0, i1, j0, j1 = tile
+    rows, cols = slice(i0, i1), slice(j0, j1)
+    block = rmsd_block(_worker['X'], _worker['sqnorm'], rows, cols)
+    out = _worker['out']
+    store_block(out, block, i0, j0, _worker['X'].shape[0])
+    # El tile queda en disco (msync + fsync) antes de marcarse como terminado
+    out.flush()
+    fd = os.open(out.filename, os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return tile_id
+
+
+def _read_done(fh):
+    """
+    Ids de tiles terminados en el .done (tras la cabecera). Una última
+    línea sin salto de línea es una escritura cortada y se ignora: "12"
+    podría ser el inicio de "123".
+    """
+    done = set()
+    for line in fh:
+        if line.endswith('\n') and line.strip():
+            done.add(int(line))
+    return done
+
+
+def rmsd_matrix_parallel(coords, out_path, tile_size=TILE_SIZE, workers=None):
+    """
+    Calcula la matriz RMSD por tiles en un pool de procesos.
+
+    Parámetros:
+    - coords: array (n_modelos, n_átomos, 3) con átomos emparejados.
+    - out_path: archivo .npy de salida (forma condensada float32), escrito
+      como memmap en disco.
+    - tile_size: modelos por lado de cada tile.
+    - workers: número de procesos (None = todos los núcleos).
+
+    Junto a out_path se guardan las coordenadas centradas (.coords.npy,
+    .sqnorm.npy) y la lista de tiles terminados (.done). Si el cálculo se
+    interrumpe, una nueva llamada con las mismas coordenadas y tile_size
+    solo calcula los tiles pendientes.
+
+    Devuelve la forma condensada como memmap de solo lectura.
+    """
+    X, sqnorm = center_coords(np.asarray(coords, dtype=np.float64))
+    m = X.shape[0]
+    coords_path = out_path + '.coords.npy'
+    sqnorm_path = out_path + '.sqnorm.npy'
+    done_path = out_path + '.done'
+    header = f"tile_size={tile_size} condensed={np.dtype(cm.DTYPE).name}"
+
+    # ¿Podemos reanudar? Misma entrada, mismo tiling y salida existente
+    done = set()
+    if os.path.exists(done_path) and os.path.exists(out_path) and os.path.exists(coords_path):
+        previo = np.load(coords_path, mmap_mode='r')
+        with open(done_path, 'r', encoding='utf-8') as fh:
+            cabecera = fh.readline().strip()
+            if previo.shape == X.shape and np.array_equal(previo, X) and cabecera == header:
+                done = _read_done(fh)
+
+    if not done:
+        np.save(coords_path, X)
+        np.save(sqnorm_path, sqnorm)
+        out = np.lib.format.open_memmap(out_path, mode='w+', dtype=cm.DTYPE,
+                                        shape=(cm.condensed_size(m),))
+        out.flush()
+        del out
+        with open(done_path, 'w', encoding='utf-8') as fh:
+            fh.write(header + "\n")
+
+    tiles = _tiles(m, tile_size)
+    pendientes = [(k, t) for k, t in enumerate(tiles) if k not in done]
+    print(f"Tiles: {len(tiles)} en total, {len(pendientes)} pendientes")
+
+    if pendientes:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(coords_path, sqnorm_path, out_path)) as pool, \
+                open(done_path, 'a', encoding='utf-8') as progreso:
+            futuros = [pool.submit(_compute_tile, k, t) for k, t in pendientes]
+            for futuro in as_completed(futuros):
+                progreso.write(f"{futuro.result()}\n")
+                progreso.flush()
+                os.fsync(progreso.fileno())
+
+    return np.load(out_path, mmap_mode='r')
+
+
+def run_ensemble(directory, out, pattern='*.pdb', selection='CA', png=None,
+                 title='Heatmap RMSD', cluster=False, workers=None, tile_size=TILE_SIZE):
+    """
+    Flujo completo: PDBs -> RMSD condensado en out (+ out.labels.txt) y,
+    si se indica png, el heatmap. Con workers usa el modo por tiles.
+    Devuelve (labels, cond).
+    """
+    labels, coords = load_ensemble(directory, pattern, selection)
+    print(f"Modelos: {coords.shape[0]}; átomos emparejados: {coords.shape[1]}")
+
+    if workers:
+        cond = rmsd_matrix_parallel(coords, out, tile_size, workers)
+    else:
+        cond = rmsd_condensed(coords)
+        np.save(out, cond)
+    # Etiquetas en el mismo orden que las filas de la matriz
+    with open(out + '.labels.txt', 'w', encoding='utf-8') as fh:
+        fh.write('\n'.join(labels) + '\n')
+    print(f"ok {out}")
+
+    if png:
+        plot_heatmap_with_values(cond, labels, title, png, show=False, cluster=cluster)
+    return labels, cond
+
+
+# ----------------------------------------------------------
+# Ejecución desde línea de comandos
+# ----------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Matriz RMSD todos-contra-todos desde una carpeta de PDBs."
+    )
+    parser.add_argument('directory', help="Carpeta con los modelos PDB")
+    parser.add_argument('--pattern', default='*.pdb', help="Patrón glob de archivos")
+    parser.add_argument('--atoms', default='CA', choices=sorted(ATOM_SELECTIONS),
+                        help="Átomos usados en la superposición")
+    parser.add_argument('--out', default='rmsd_matrix.npy',
+                        help="Archivo .npy de salida (forma condensada float32)")
+    parser.add_argument('--png', help="Si se indica, guarda el heatmap en esta ruta")
+    parser.add_argument('--title', default='Heatmap RMSD', help="Título del heatmap")
+    parser.add_argument('--cluster', action='store_true',
+                        help="Ordena el heatmap por agrupamiento jerárquico")
+    parser.add_argument('--workers', type=int,
+                        help="Modo paralelo por tiles con N procesos (salida memmap reanudable)")
+    parser.add_argument('--tile-size', type=int, default=TILE_SIZE,
+                        help="Modelos por lado de cada tile en el modo paralelo")
+    args = parser.parse_args(argv)
+
+    run_ensemble(args.directory, args.out, pattern=args.pattern, selection=args.atoms,
+                 png=args.png, title=args.title, cluster=args.cluster,
+                 workers=args.workers, tile_size=args.tile_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,203 @@
 import pandas as pd
+import numpy as np
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
 import plotly.express as px
-import re
+import plotly.graph_objects as go
+import os
+import glob
+import hashlib
+import shutil
+import threading
+import time
+from collections import OrderedDict
 
+import flask
+
+import columnStore
+import modelRanking
+import telemetry
+# Lectura de RawData.csv (compartida con modelRanking y pipeline)
+from rawData import (CACHE_VERSION, FILENAME_PATTERN, META_COLUMNS, LiveData,
+                     cache_path_for, load_data, parse_filenames)
+
+# ----------------------------------------------------------
+# Columnas de calidad Ramachandran y configuración
 # ----------------------------------------------------------
-# Función para cargar y procesar el CSV con nombres de archivo
+RAMA_COLUMNS = ['Ramachandran Favored (>98%)',
+                'Ramachandran Outliers (<0.05%)',
+                'Ramachandran Z-Score (abs(ZScore)<2)']
+# Orden Ramachandran: más Favored, menos Outliers, menor Z-Score
+RAMA_ASCENDING = [False, True, True]
+# Combinaciones de filtros recordadas por el índice (LRU) y bytes máximos
+# de sus posiciones: "Mostrar todos" guarda hasta n enteros por clave
+FILTER_CACHE_SIZE = 256
+FILTER_CACHE_BYTES = 64 << 20
+# Más filas que esto en el box-plot -> cuartiles calculados en el servidor
+BOX_POINTS_MAX = 5000
+# Cada cuántos segundos se buscan filas nuevas en el CSV
+REFRESH_SECONDS = 10
+# NCC_SHARED_STORE=1: los workers abren un almacén columnar compartido
+# (memory-mapped) en lugar de parsear cada uno su copia del CSV
+SHARED_STORE = os.environ.get('NCC_SHARED_STORE', '') not in ('', '0')
+# Columnas que necesitan el ranking y la distribución
+BAR_COLUMNS = ['FileName', 'Ramachandran Favored (>98%)', 'Software', 'Protein']
+BOX_COLUMNS = ['Software', 'Ramachandran Favored (>98%)']
+# Colores iniciales por software (se aplican en el navegador)
+DEFAULT_COLORS = {'AF': 'blue', 'RF': 'green', 'SM': 'red', 'MD': 'purple'}
+# Ranking multicriterio: remuestreos bootstrap por petición y filas mostradas
+RANKING_RESAMPLES = 1000
+RANKING_TABLE_ROWS = 15
+# Con 4 o más criterios el frente de Pareto es O(n · |frente|) en el peor
+# caso: por encima de estas filas se calcula sobre las mejores según el
+# orden Ramachandran del ranking
+RANKING_FRONT_MAX = 5000
+
 # ----------------------------------------------------------
-def load_data(file_path):
+# Índice de filtrado: bitmaps por valor y orden Ramachandran
+# ----------------------------------------------------------
+def filter_arrays(df):
     """
-    Carga datos desde CSV y extrae metadatos de la columna FileName:
-    - Estructura: MON o DIM
-    - Software: AF, RF, SM o MD
-    - Proteína: NCChumano o NCCAnguila
-    - Modelo base: dos dígitos
-    - Nivel de relajación: Base o RelaxedX
+    Arrays del FilterIndex de df: un bitmap por valor de cada columna de
+    metadatos (filas de bitmap_<col>), los códigos de software y el rango
+    Ramachandran. Devuelve (arrays, valores_por_columna).
     """
-    df = pd.read_csv(file_path)
-    print(f"Cargando: {file_path}")
+    n = len(df)
+    arrays, values = {}, {}
+    for col in META_COLUMNS:
+        cat = df[col].astype('category')
+        codes = cat.cat.codes.to_numpy()
+        values[col] = cat.cat.categories.tolist()
+        bitmaps = [np.packbits(codes == k) for k in range(len(values[col]))]
+        arrays[f"bitmap_{col}"] = (np.stack(bitmaps) if bitmaps
+                                   else np.zeros((0, (n + 7) // 8), dtype=np.uint8))
+    arrays['software_codes'] = df['Software'].astype('category').cat.codes.to_numpy()
 
-    # Extraemos con expresiones regulares
-    df['Structure'] = df['FileName'].str.extract(r'^(MON|DIM)')
-    df['Software']  = df['FileName'].str.extract(r'-(AF|RF|SM|MD)')
-    df['Protein']   = df['FileName'].str.extract(r'-(NCChumano|NCCAnguila)')
-    df['ModelBase'] = df['FileName'].str.extract(r'-(\d{2})')
-    df['Relaxed']   = df['FileName'].str.extract(r'-(Relaxed\d?)')
-    df['Relaxed']   = df['Relaxed'].fillna('Base')  # Asigna 'Base' cuando no hay etiqueta Relaxed
-    return df
+    # Orden Ramachandran estable (igual que sort_values multi-columna)
+    order = df.reset_index(drop=True).sort_values(
+        by=RAMA_COLUMNS, ascending=RAMA_ASCENDING, kind='stable'
+    ).index.to_numpy()
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    arrays['rank'] = rank
+    return arrays, values
+
+
+class FilterIndex:
+    """
+    Estructuras precalculadas sobre un DataFrame de load_data:
+    - Un bitmap empaquetado (np.packbits) por cada valor de cada columna
+      de metadatos; un filtro es un OR de bitmaps por columna y un AND
+      entre columnas.
+    - El rango de cada fila en el orden Ramachandran, calculado una vez.
+    - Una caché LRU de posiciones por combinación normalizada de filtros,
+      acotada en claves (cache_size) y en bytes (cache_bytes); la última
+      entrada se conserva aunque sola supere cache_bytes.
+    """
+
+    def __init__(self, data, cache_size=FILTER_CACHE_SIZE, cache_bytes=FILTER_CACHE_BYTES):
+        # data: DataFrame de load_data o ColumnStore con los arrays ya calculados
+        self.df = data
+        self.n = len(data)
+        if isinstance(data, columnStore.ColumnStore):
+            arrays, values = data.arrays, data.meta['bitmap_values']
+        else:
+            arrays, values = filter_arrays(data)
+        self.bitmaps = {
+            col: dict(zip(values[col], arrays[f"bitmap_{col}"])) for col in META_COLUMNS
+        }
+        self.empty = np.zeros((self.n + 7) // 8, dtype=np.uint8)
+        # Códigos de software para el top por grupo (-1 = sin software)
+        self.software_codes = arrays['software_codes']
+        self.rank = arrays['rank']
+
+        self.cache_size = cache_size
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def positions(self, key):
+        """Posiciones de las filas que cumplen key, desde la caché si están."""
+        with self._lock:
+            pos = self._cache.get(key)
+            if pos is not None:
+                self._cache.move_to_end(key)
+                return pos
+        pos = self._positions(key)
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = pos
+                self._cached_bytes += pos.nbytes
+            while len(self._cache) > 1 and (len(self._cache) > self.cache_size
+                                            or self._cached_bytes > self.cache_bytes):
+                _, old = self._cache.popitem(last=False)
+                self._cached_bytes -= old.nbytes
+        return pos
+
+    def _select(self, col, values):
+        # OR de los bitmaps de los valores pedidos en una columna
+        bits = self.empty
+        for value in values:
+            bits = bits | self.bitmaps[col].get(value, self.empty)
+        return bits
+
+    def _positions(self, key):
+        """Posiciones (enteras) de las filas que cumplen key; ver normalize_filters."""
+        filters, models_per_software = key
+        bits = None
+        for col, values in filters:
+            sel = self._select(col, values)
+            bits = sel if bits is None else bits & sel
+        if bits is None:
+            pos = np.arange(self.n)
+        else:
+            pos = np.flatnonzero(np.unpackbits(bits, count=self.n))
+
+        if models_per_software is not None:
+            # Orden Ramachandran precalculado y top-N por software
+            pos = pos[np.argsort(self.rank[pos], kind='stable')]
+            codes = self.software_codes[pos]
+            by_group = np.argsort(codes, kind='stable')
+            sorted_codes = codes[by_group]
+            starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+            lengths = np.diff(np.r_[starts, len(pos)])
+            cumcount = np.empty(len(pos), dtype=np.int64)
+            cumcount[by_group] = np.arange(len(pos)) - np.repeat(starts, lengths)
+            # groupby descarta filas sin software
+            pos = pos[(codes >= 0) & (cumcount < models_per_software)]
+        pos.setflags(write=False)  # Se comparte desde la caché
+        return pos
+
+
+def normalize_filters(relaxed, structures, software, protein, models,
+                      relaxation_levels, all_models, models_per_software):
+    """
+    Convierte los valores de la UI en una clave hashable y canónica:
+    los filtros inactivos desaparecen y cada lista se ordena sin repetidos.
+    """
+    def canon(values):
+        return tuple(sorted(set(values or ()), key=str))
+
+    filters = []
+    if relaxed:
+        filters.append(('Relaxed', canon(relaxation_levels)))
+    for col, values in (('Structure', structures), ('Software', software),
+                        ('Protein', protein), ('ModelBase', models)):
+        if values:
+            filters.append((col, canon(values)))
+    return tuple(filters), (None if all_models else models_per_software)
+
+
+# Índice del DataFrame activo (se reconstruye si cambia el DataFrame)
+_filter_index = None
+
+def get_filter_index(df):
+    global _filter_index
+    if _filter_index is None or _filter_index.df is not df:
+        _filter_index = FilterIndex(df)
+    return _filter_index
 
 # ----------------------------------------------------------
 # Función para filtrar el DataFrame según inputs de usuario
@@ -37,52 +207,281 @@ def filter_data(df, relaxed, structures, software, top_n, protein, models,
     """
     Aplica filtros seleccionados en la UI y ordena por Ramachandran.
     - Si all_models=False, agrupa por software y limita por models_per_software.
+
+    Los filtros se resuelven con el FilterIndex del DataFrame (bitmaps y
+    orden precalculados); las posiciones resultantes quedan en caché.
     """
-    # Filtrado por nivel de relajación
-    if relaxed:
-        df = df[df['Relaxed'].isin(relaxation_levels)]
-    # Estructura MON/DIM
-    if structures:
-        df = df[df['Structure'].isin(structures)]
-    # Software
-    if software:
-        df = df[df['Software'].isin(software)]
-    # Proteína
-    if protein:
-        df = df[df['Protein'].isin(protein)]
-    # Modelos base
-    if models:
-        df = df[df['ModelBase'].isin(models)]
-
-    # Si NO mostrar todos, ordena y agrupa por software
-    if not all_models:
-        df = df.sort_values(
-            by=['Ramachandran Favored (>98%)',
-                'Ramachandran Outliers (<0.05%)',
-                'Ramachandran Z-Score (abs(ZScore)<2)'],
-            ascending=[False, True, True]
-        )
-        df = df.groupby('Software').head(models_per_software)
-    return df
+    return take_rows(df, filter_positions(df, relaxed, structures, software, protein, models,
+                                          relaxation_levels, all_models, models_per_software))
+
+
+def filter_positions(df, relaxed, structures, software, protein, models,
+                     relaxation_levels, all_models, models_per_software):
+    """Como filter_data, pero devuelve las posiciones de fila (sin copiar el DataFrame)."""
+    key = normalize_filters(relaxed, structures, software, protein, models,
+                            relaxation_levels, all_models, models_per_software)
+    return get_filter_index(df).positions(key)
+
+
+def take_rows(data, positions, columns=None):
+    """
+    Filas positions de un DataFrame o de un ColumnStore, solo con las
+    columnas indicadas (todas si es None): lo único que se copia.
+    """
+    if isinstance(data, columnStore.ColumnStore):
+        return data.take(positions, columns)
+    frame = data if columns is None else data[columns]
+    return frame.iloc[positions]
+
+
+def encode_filter_key(key):
+    """Clave de filtros en forma JSON (para un dcc.Store)."""
+    filters, mps = key
+    return {'filters': [[col, list(values)] for col, values in filters], 'mps': mps}
+
+
+def decode_filter_key(data):
+    """Inversa de encode_filter_key: vuelve a la clave hashable del índice."""
+    filters = tuple((col, tuple(values)) for col, values in data['filters'])
+    return filters, data['mps']
+
+# ----------------------------------------------------------
+# Ranking paginado: selección parcial del top-N en el servidor
+# ----------------------------------------------------------
+def rank_page(positions, rank, top_n, page):
+    """
+    Devuelve las posiciones de la página `page` (desde 1) del ranking
+    Ramachandran, con `top_n` modelos por página, ya ordenadas.
+
+    Usa np.argpartition (O(n)) para aislar la página y solo ordena sus
+    top_n elementos, en lugar de ordenar toda la selección.
+    """
+    n = len(positions)
+    start = min((page - 1) * top_n, n)
+    stop = min(start + top_n, n)
+    if start == stop:
+        return positions[:0]
+    keys = rank[positions]
+    kth = [start, stop - 1] if stop - 1 > start else [start]
+    part = np.argpartition(keys, kth)[start:stop]
+    return positions[part[np.argsort(keys[part])]]
+
+
+def page_count(n_rows, top_n):
+    return max(1, -(-n_rows // top_n))
+
+# ----------------------------------------------------------
+# Construcción de figuras con tamaño acotado
+# ----------------------------------------------------------
+def build_bar_figure(page_df, color_map=None):
+    """
+    Gráfico de barras del ranking de la página actual; la página tiene
+    como mucho el máximo del slider top-n, así que siempre cabe en SVG.
+
+    Cada traza lleva su software en `meta`, para que el navegador pueda
+    cambiar los colores sin volver a construir la figura.
+    """
+    order = {'FileName': page_df['FileName'].tolist()}
+    fig = px.bar(page_df, x='FileName', y='Ramachandran Favored (>98%)',
+                 color='Software', color_discrete_map=color_map,
+                 pattern_shape='Protein', category_orders=order,
+                 range_y=[90, 100], title='Comparación de Ramachandran Favored')
+    fig.add_hline(y=98, line_dash='dash', line_color='red')
+    fig.for_each_trace(lambda t: t.update(meta=t.legendgroup.split(', ')[0]))
+    return fig
+
+
+def build_box_figure(filtered_df):
+    """
+    Box-plot por software. Con más de BOX_POINTS_MAX filas se envían al
+    navegador solo los cuartiles y bigotes calculados aquí, no cada punto.
+    """
+    col = 'Ramachandran Favored (>98%)'
+    if len(filtered_df) <= BOX_POINTS_MAX:
+        return px.box(filtered_df, x='Software', y=col,
+                      title='Distribución por Software')
+
+    values = filtered_df[[col, 'Software']].dropna()
+    grouped = values.groupby('Software', observed=True)[col]
+    q = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    q1, q3 = q[0.25], q[0.75]
+    # Bigotes: datos extremos dentro de 1.5 IQR (convención de Plotly)
+    lo = values['Software'].map(q1 - 1.5 * (q3 - q1)).astype(float)
+    hi = values['Software'].map(q3 + 1.5 * (q3 - q1)).astype(float)
+    y = values[col]
+    lower = y.where(y >= lo).groupby(values['Software'], observed=True).min()
+    upper = y.where(y <= hi).groupby(values['Software'], observed=True).max()
+
+    fig = go.Figure(go.Box(x=[str(s) for s in q.index], q1=q1, median=q[0.5], q3=q3,
+                           lowerfence=lower.reindex(q.index), upperfence=upper.reindex(q.index),
+                           mean=grouped.mean().reindex(q.index), boxpoints=False))
+    fig.update_layout(title='Distribución por Software',
+                      xaxis_title='Software', yaxis_title=col)
+    return fig
 
 # ----------------------------------------------------------
 # Estadísticas: promedio y desviación estándar por software
 # ----------------------------------------------------------
 def calculate_statistics(df):
-    stats = df.groupby('Software')['Ramachandran Favored (>98%)']\
+    stats = df.groupby('Software', observed=True)['Ramachandran Favored (>98%)']\
               .agg(['mean', 'std']).reset_index()
     return stats
 
+
+def build_stats_table(stats):
+    """Tabla HTML con el promedio y la desviación estándar por software."""
+    header = html.Tr([html.Th('Software'), html.Th('Promedio'), html.Th('Desv. estándar')])
+    rows = [html.Tr([html.Td(str(r.Software)), html.Td(f"{r.mean:.2f}"),
+                     html.Td('' if pd.isna(r.std) else f"{r.std:.2f}")])
+            for r in stats.itertuples(index=False)]
+    return html.Table([header] + rows)
+
 # ----------------------------------------------------------
-# Carga inicial de datos
+# Ranking multicriterio: frente de Pareto e intervalos bootstrap
 # ----------------------------------------------------------
-file_path = 'RawData.csv'
-df = load_data(file_path)
+def build_pareto_table(ranking, criteria, max_rows=RANKING_TABLE_ROWS):
+    """
+    Tabla HTML con los mejores modelos (primero los del frente de Pareto);
+    Missing indica cuántos criterios no tiene el modelo.
+    """
+    columns = ['FileName', 'Score', 'Missing'] + list(criteria)
+    header = html.Tr([html.Th('Pareto')] + [html.Th(c) for c in columns])
+    rows = [html.Tr([html.Td('*' if r['Pareto'] else '')] +
+                    [html.Td(f"{r[c]:.2f}" if isinstance(r[c], float) else str(r[c]))
+                     for c in columns])
+            for r in ranking.head(max_rows).to_dict('records')]
+    return html.Table([header] + rows)
+
+
+def build_ci_figure(ci):
+    """Medias con intervalo de confianza bootstrap por software y relajación."""
+    fig = go.Figure()
+    for group, sub in ci.groupby('Group', sort=False):
+        fig.add_trace(go.Scatter(
+            x=sub['Value'].astype(str), y=sub['mean'], mode='markers', name=group,
+            error_y=dict(type='data', symmetric=False,
+                         array=sub['ci_high'] - sub['mean'],
+                         arrayminus=sub['mean'] - sub['ci_low'])))
+    fig.update_layout(title=f"Puntuación combinada (IC {modelRanking.CONFIDENCE:.0%} bootstrap)",
+                      xaxis_title='Software / Relajación', yaxis_title='Score')
+    return fig
+
+# ----------------------------------------------------------
+# Fuente de datos (carga diferida: importar el módulo no lee el CSV)
+# ----------------------------------------------------------
+file_path = os.environ.get('NCC_RAWDATA', 'RawData.csv')
+source = LiveData(file_path)
+df = None
+# Recargas del CSV en este proceso (versión de datos sin SHARED_STORE)
+reloads = 0
+
+
+def use_data_source(path, use_cache=True):
+    """Cambia el CSV que sirve la app; se cargará en la próxima petición."""
+    global file_path, source, df
+    file_path = path
+    source = LiveData(path, use_cache)
+    df = None
+
+
+def get_data(version=None):
+    """
+    Datos actuales, cargados la primera vez que se necesitan: el
+    DataFrame de LiveData o, con SHARED_STORE, el ColumnStore compartido.
+
+    Con SHARED_STORE, version es la versión de datos de la petición (el
+    nombre del almacén, ver refresh_data): si no es la del almacén abierto,
+    otro worker ya detectó un CSV nuevo y este cambia de almacén antes de
+    responder, en lugar de seguir leyendo uno ya borrado.
+    """
+    global df
+    if (SHARED_STORE and df is not None and isinstance(version, str)
+            and version != os.path.basename(df.directory)):
+        refresh_shared_store()
+    if df is None:
+        if SHARED_STORE:
+            df = open_shared_store(file_path)
+        else:
+            df = source.df if source.df is not None else source.load()
+    return df
+
+
+# ----------------------------------------------------------
+# Almacén compartido para despliegues con varios workers
+# ----------------------------------------------------------
+def _store_path(file_path, digest):
+    return f"{file_path}.{digest[:16]}.v{CACHE_VERSION}.store"
+
+
+def _find_store(file_path, st):
+    # Almacén existente del mismo tamaño y mtime del CSV (sin leer el CSV)
+    for directory in glob.glob(f"{glob.escape(file_path)}.*.v{CACHE_VERSION}.store"):
+        manifest = columnStore.read_manifest(directory)
+        if manifest and manifest['meta'].get('source') == [st.st_size, st.st_mtime_ns]:
+            return directory
+    return None
+
+
+def open_shared_store(path):
+    """
+    Abre el almacén columnar del CSV, creándolo si no existe.
+
+    El primer worker parsea el CSV (o su sidecar Feather) y escribe las
+    columnas y los arrays del FilterIndex como .npy; los siguientes solo
+    abren esos archivos con memory-mapping, así que arrancan sin parsear
+    nada y comparten la memoria de las páginas en caché del sistema.
+    """
+    st = os.stat(path)
+    directory = _find_store(path, st)
+    if directory is None:
+        with open(path, 'rb') as fh:
+            digest = hashlib.sha256(fh.read()).hexdigest()
+        directory = _store_path(path, digest)
+        if columnStore.read_manifest(directory) is not None:
+            # Mismo contenido con otro tamaño/mtime (touch, copia): se
+            # actualiza la marca para no volver a leer el CSV
+            columnStore.update_meta(directory, source=[st.st_size, st.st_mtime_ns])
+        else:
+            frame = load_data(path)
+            arrays, values = filter_arrays(frame)
+            columnStore.build_store(frame, directory, arrays,
+                                    {'source': [st.st_size, st.st_mtime_ns],
+                                     'bitmap_values': values})
+            # Almacenes de versiones anteriores del CSV (los workers que aún
+            # los tengan abiertos conservan su mapeo hasta cambiar de almacén)
+            for old in glob.glob(f"{glob.escape(path)}.*.v{CACHE_VERSION}.store"):
+                if old != directory:
+                    shutil.rmtree(old, ignore_errors=True)
+    store = columnStore.ColumnStore(directory)
+    print(f"Almacén compartido: {directory} ({len(store)} filas)")
+    return store
+
+
+def refresh_shared_store():
+    """
+    Con SHARED_STORE: cambia al almacén del CSV actual si su contenido
+    cambió. Si solo cambió la marca (touch o copia del mismo CSV) se
+    conserva el almacén abierto y su FilterIndex; devuelve False.
+    """
+    global df
+    st = os.stat(file_path)
+    stamp = [st.st_size, st.st_mtime_ns]
+    if df is not None and df.meta.get('source') == stamp:
+        return False
+    store = open_shared_store(file_path)
+    if df is not None and store.directory == df.directory:
+        df.meta['source'] = stamp
+        return False
+    df = store
+    return True
 
 # ----------------------------------------------------------
 # Inicialización de la aplicación Dash
 # ----------------------------------------------------------
 app = dash.Dash(__name__)
+# Aplicación WSGI para servidores multi-proceso, p. ej.:
+#   NCC_SHARED_STORE=1 gunicorn -w 4 scoresDashboard:server
+server = app.server
 app.layout = html.Div([
     html.H1("Visualización de Ramachandran Favored"),
     # Filtros en UI: relaxed, estructura, software, proteína, modelo, relajación
@@ -97,64 +496,250 @@ app.layout = html.Div([
     dcc.Checklist(id='all-models-filter', options=[{'label':'Mostrar todos','value': True}], value=[]),
     # Selección de colores por software
     html.Label("Selecciona colores por software:"),
-    dcc.Input(id='color-af', type='text', placeholder='AF', value='blue'),
-    dcc.Input(id='color-rf', type='text', placeholder='RF', value='green'),
-    dcc.Input(id='color-sm', type='text', placeholder='SM', value='red'),
-    dcc.Input(id='color-md', type='text', placeholder='MD', value='purple'),
+    dcc.Input(id='color-af', type='text', placeholder='AF', value=DEFAULT_COLORS['AF']),
+    dcc.Input(id='color-rf', type='text', placeholder='RF', value=DEFAULT_COLORS['RF']),
+    dcc.Input(id='color-sm', type='text', placeholder='SM', value=DEFAULT_COLORS['SM']),
+    dcc.Input(id='color-md', type='text', placeholder='MD', value=DEFAULT_COLORS['MD']),
     # Sliders para top_n y modelos por software
     dcc.Slider(id='top-n-filter', min=1, max=120, step=1, value=10,
                marks={i:str(i) for i in range(10,121,10)}),
     dcc.Slider(id='models-per-software-filter', min=1, max=20, step=1, value=5,
                marks={i:str(i) for i in range(1,11)}),
+    # Paginación del ranking (top_n modelos por página)
+    html.Label("Página del ranking:"),
+    dcc.Input(id='page-filter', type='number', min=1, step=1, value=1),
+    html.Span(id='page-info'),
+    # Sondeo de filas nuevas en el CSV (sin reiniciar el servidor)
+    dcc.Interval(id='data-refresh', interval=REFRESH_SECONDS * 1000),
+    dcc.Store(id='data-version', data=0),
+    # Selección activa (solo la clave de filtros; las filas quedan en el
+    # servidor) y figura del ranking antes de aplicar los colores
+    dcc.Store(id='selection'),
+    dcc.Store(id='bar-base'),
     # Gráficas
     dcc.Graph(id='bar-plot'),
     html.H2("Promedio y Desviación Estándar por Software"),
-    dcc.Graph(id='box-plot')
+    html.Div(id='stats-table'),
+    dcc.Graph(id='box-plot'),
+    html.H2("Ranking multicriterio (frente de Pareto)"),
+    html.Span(id='pareto-info'),
+    html.Div(id='pareto-table'),
+    dcc.Graph(id='ci-plot')
 ])
 
 # ----------------------------------------------------------
-# Callback para actualizar gráficas según filtros
+# Callback de recarga: incorpora filas añadidas a RawData.csv
+# ----------------------------------------------------------
+@app.callback(
+    Output('data-version','data'),
+    Input('data-refresh','n_intervals'),
+    prevent_initial_call=True
+)
+def refresh_data(_):
+    """
+    Versión de los datos tras recargar: cambia en cada recarga aunque el
+    número de filas sea el mismo (p. ej. un CSV corregido). Con
+    SHARED_STORE es el nombre del almacén (incluye el digest del CSV), que
+    coincide en todos los workers; si no, un contador de recargas.
+    """
+    global df, reloads
+    if SHARED_STORE:
+        if not refresh_shared_store():
+            return dash.no_update
+        return os.path.basename(df.directory)
+    if source.df is None:
+        get_data()
+    elif source.refresh():
+        df = source.df
+    else:
+        return dash.no_update
+    reloads += 1
+    return reloads
+
+# ----------------------------------------------------------
+# Callbacks: selección -> (ranking | distribución) -> colores
 # ----------------------------------------------------------
+# Los filtros se resuelven una vez y solo viaja su clave; el ranking y la
+# distribución se recalculan por separado a partir de las posiciones
+# cacheadas en el FilterIndex, y los colores se aplican en el navegador.
 @app.callback(
-    [Output('bar-plot','figure'), Output('box-plot','figure')],
+    Output('selection','data'),
     [Input('relaxed-filter','value'), Input('structure-filter','value'),
      Input('software-filter','value'), Input('protein-filter','value'),
      Input('model-filter','value'), Input('relaxation-filter','value'),
-     Input('all-models-filter','value'), Input('top-n-filter','value'),
-     Input('models-per-software-filter','value'),
+     Input('all-models-filter','value'),
+     Input('models-per-software-filter','value'), Input('data-version','data')]
+)
+def update_selection(relaxed, structures, software, protein, models,
+                     relaxation_levels, all_models, models_per_software,
+                     data_version=None):
+    tr = telemetry.trace('update_selection')
+    df = get_data(data_version)
+    # Clave canónica de filtros (relaxed y all_models como booleanos)
+    key = normalize_filters(bool(relaxed), structures, software, protein, models,
+                            relaxation_levels, bool(all_models), models_per_software)
+    # Aplicamos filtro (posiciones de fila, cacheadas por el índice)
+    positions = get_filter_index(df).positions(key)
+    tr.mark('filter')
+    tr.count('rows_total', len(df))
+    tr.count('rows_filtered', len(positions))
+    tr.finish()
+    return dict(encode_filter_key(key), version=data_version, rows=len(positions))
+
+
+def selection_positions(selection):
+    """Posiciones de fila de la selección guardada en el Store."""
+    df = get_data(selection.get('version'))
+    return df, get_filter_index(df).positions(decode_filter_key(selection))
+
+
+@app.callback(
+    [Output('bar-base','data'), Output('page-info','children')],
+    [Input('selection','data'), Input('top-n-filter','value'),
+     Input('page-filter','value')]
+)
+def update_ranking(selection, top_n, page=1):
+    if selection is None:
+        return dash.no_update, dash.no_update
+    tr = telemetry.trace('update_ranking')
+    df, positions = selection_positions(selection)
+    tr.mark('filter')
+
+    # Página del ranking: solo estas filas viajan al navegador
+    top_n = top_n or 1
+    pages = page_count(len(positions), top_n)
+    page = min(max(int(page or 1), 1), pages)
+    page_df = take_rows(df, rank_page(positions, get_filter_index(df).rank, top_n, page),
+                        BAR_COLUMNS)
+    tr.mark('top_n')
+
+    # Gráfico de ranking con línea de referencia (colores por defecto)
+    bar_fig = build_bar_figure(page_df, DEFAULT_COLORS)
+    tr.mark('bar_figure')
+    tr.count('rows_plotted', len(page_df))
+    tr.finish()
+
+    info = f" {page} de {pages} ({len(positions)} modelos)"
+    return bar_fig, info
+
+
+@app.callback(
+    [Output('box-plot','figure'), Output('stats-table','children')],
+    Input('selection','data')
+)
+def update_distribution(selection):
+    if selection is None:
+        return dash.no_update, dash.no_update
+    tr = telemetry.trace('update_distribution')
+    df, positions = selection_positions(selection)
+    tr.mark('filter')
+
+    # Estadísticas y box-plot sobre toda la selección
+    filtered_df = take_rows(df, positions, BOX_COLUMNS)
+    stats_df = calculate_statistics(filtered_df)
+    tr.mark('statistics')
+    box_fig = build_box_figure(filtered_df)
+    tr.mark('box_figure')
+    tr.finish()
+    return box_fig, build_stats_table(stats_df)
+
+
+@app.callback(
+    [Output('pareto-table','children'), Output('ci-plot','figure'),
+     Output('pareto-info','children')],
+    Input('selection','data')
+)
+def update_model_ranking(selection):
+    if selection is None:
+        return dash.no_update, dash.no_update, dash.no_update
+    tr = telemetry.trace('update_model_ranking')
+    df, positions = selection_positions(selection)
+    tr.mark('filter')
+    if len(positions) == 0:
+        tr.finish()
+        return html.Table([]), go.Figure(), " 0 modelos"
+
+    # Solo las columnas de criterios (y las de agrupación) de la selección,
+    # acotada a las RANKING_FRONT_MAX mejores según el orden Ramachandran
+    total = len(positions)
+    if total > RANKING_FRONT_MAX:
+        positions = rank_page(positions, get_filter_index(df).rank, RANKING_FRONT_MAX, 1)
+    criteria = modelRanking.find_criteria(df.columns)
+    ranking, criteria, _ = modelRanking.rank_models(
+        take_rows(df, positions, ['FileName', 'Software', 'Relaxed'] + list(criteria)),
+        criteria)
+    tr.mark('pareto')
+    ci = modelRanking.bootstrap_ci(ranking, ['Software', 'Relaxed'], 'Score',
+                                   RANKING_RESAMPLES)
+    tr.mark('bootstrap')
+    tr.count('rows_ranked', len(ranking))
+    tr.finish()
+
+    info = f" {int(ranking['Pareto'].sum())} de {len(ranking)} modelos en el frente"
+    if total > len(ranking):
+        info += f" (mejores {len(ranking)} de {total} según Ramachandran)"
+    return build_pareto_table(ranking, criteria), build_ci_figure(ci), info
+
+
+# Mapa de colores dinámico: se aplica sobre la figura base en el navegador,
+# cambiar un color no genera ninguna petición al servidor
+app.clientside_callback(
+    """
+    function(base, af, rf, sm, md) {
+        if (!base) {
+            return window.dash_clientside.no_update;
+        }
+        const colors = {AF: af, RF: rf, SM: sm, MD: md};
+        const data = base.data.map(function(trace) {
+            const color = colors[trace.meta];
+            if (!color) {
+                return trace;
+            }
+            return Object.assign({}, trace, {marker: Object.assign({}, trace.marker, {color: color})});
+        });
+        return Object.assign({}, base, {data: data});
+    }
+    """,
+    Output('bar-plot','figure'),
+    [Input('bar-base','data'),
      Input('color-af','value'), Input('color-rf','value'),
      Input('color-sm','value'), Input('color-md','value')]
 )
-def update_graphs(relaxed, structures, software, protein, models,
-                  relaxation_levels, all_models, top_n,
-                  models_per_software, color_af, color_rf,
-                  color_sm, color_md):
-    # Convertimos a booleanos
-    relaxed = bool(relaxed)
-    all_models = bool(all_models)
-    # Aplicamos filtro
-    filtered_df = filter_data(df, relaxed, structures, software,
-                              top_n, protein, models,
-                              relaxation_levels, all_models,
-                              models_per_software)
-
-    # Mapa de colores dinámico
-    color_map = {'AF': color_af, 'RF': color_rf,
-                 'SM': color_sm, 'MD': color_md}
-
-    # Gráfico de barras con líneas de referencia
-    bar_fig = px.bar(filtered_df, x='FileName', y='Ramachandran Favored (>98%)',
-                     color='Software', color_discrete_map=color_map,
-                     pattern_shape='Protein',
-                     range_y=[90, 100], title='Comparación de Ramachandran Favored')
-    bar_fig.add_hline(y=98, line_dash='dash', line_color='red')
-
-    # Estadísticas y box-plot
-    stats_df = calculate_statistics(filtered_df)
-    box_fig = px.box(filtered_df, x='Software', y='Ramachandran Favored (>98%)',
-                     title='Distribución por Software')
 
-    return bar_fig, box_fig
+# ----------------------------------------------------------
+# Telemetría: tiempo por petición y endpoint de percentiles
+# ----------------------------------------------------------
+# La serialización JSON de las figuras ocurre en Dash después del
+# callback; el tiempo total de la petición y el tamaño de la respuesta
+# permiten separarla del trabajo medido en las trazas de los callbacks
+# (update_selection, update_ranking, update_distribution y
+# update_model_ranking, con marcas filter, top_n, bar_figure,
+# statistics, box_figure, pareto y bootstrap).
+@app.server.before_request
+def _telemetry_start():
+    if telemetry.ENABLED and flask.request.path != '/telemetry':
+        flask.g.telemetry_t0 = time.perf_counter()
+
+
+@app.server.after_request
+def _telemetry_end(response):
+    t0 = flask.g.get('telemetry_t0')
+    if t0 is not None:
+        telemetry.record({
+            'event': f"http {flask.request.path}",
+            'ts': time.time(),
+            'pid': os.getpid(),
+            'total': time.perf_counter() - t0,
+            'stages': {},
+            'counts': {'response_bytes': response.calculate_content_length() or 0},
+        })
+    return response
+
+
+@app.server.route('/telemetry')
+def telemetry_endpoint():
+    # Percentiles p50/p95/p99 por etapa de las últimas muestras de este proceso
+    return flask.jsonify(enabled=telemetry.ENABLED, events=telemetry.summary())
 
 # ----------------------------------------------------------
 # Ejecución de la app
@@ -1,8 +1,16 @@
 #!/usr/bin/env python
 
-import pandas as pd
-from glob import glob
+import argparse
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+
+import pandas as pd
+
+import telemetry
+from parsingCavityPlus import PARTITION_COLUMNS, read_dataset
 
 # -----------------------------
 # Configuración de parámetros
@@ -18,138 +26,399 @@ FOLDERS = [
     r".\TopModels\Monomer\Human"
 ]
 
+# Manifiesto por carpeta con la huella y las métricas de cada archivo
+MANIFEST_NAME = '.resumen_manifest.json'
+MANIFEST_VERSION = 2
+
+
 # ----------------------------------------------------------------
-# Procesamiento de cada carpeta: lectura, filtrado y cálculo de métricas
+# Cálculo de métricas por archivo
 # ----------------------------------------------------------------
-for folder in FOLDERS:
-    # Patrón para encontrar todos los archivos .xlsx en la carpeta
-    pattern = os.path.join(folder, '*.xlsx')
-    # Ruta para el archivo de resumen de esta carpeta
-    resumen_path = os.path.join(folder, 'resumen.txt')
+def _index_value(value):
+    return None if pd.isna(value) else int(value)
+
+
+def summarize_frame(df, name):
+    """
+    Filtra las cavidades de un archivo y calcula sus métricas.
+
+    Parámetros:
+    - df: DataFrame leído del .xlsx.
+    - name: nombre del archivo (para los mensajes).
+
+    Devuelve (linea, resultado): la línea a escribir en el resumen y el
+    diccionario de métricas, o None si el archivo se omite.
+    """
+    # --------------------------------------------------
+    # Validación: comprobamos columnas mínimas requeridas
+    # --------------------------------------------------
+    required_cols = {'Index', 'Druggability', 'DrugScore', 'Surface Area (Å2)'}
+    if not required_cols.issubset(df.columns):
+        return f"Omitido (faltan columnas): {name}", None
+
+    # --------------------------------------------------
+    # Filtrado: descartamos cavidades débilmente drogas y puntuaciones negativas
+    # --------------------------------------------------
+    df_f = df[(df['DrugScore'] >= 0) & (df['Druggability'] != 'Weak')].copy()
+    if df_f.empty:
+        return f"Sin datos válidos tras filtrar: {name}", None
+
+    # --------------------------------------------------
+    # Cálculo de métricas por archivo
+    # - Convertimos Druggability a valor numérico
+    # - Obtenemos los top 3 índices según DrugScore
+    # - Calculamos superficie máxima y su índice
+    # --------------------------------------------------
+    df_f['drugg_score'] = df_f['Druggability'].astype(str).map(drugg_map)
+    # Index como entero con nulos, igual desde un .xlsx (celdas vacías o
+    # "N/A") que desde el dataset Parquet; un índice nulo se informa como None
+    df_f['Index'] = pd.to_numeric(df_f['Index'], errors='coerce').astype('Int64')
+    top3 = [_index_value(v) for v in df_f.nlargest(3, 'DrugScore')['Index']]
+    max_surface = df_f['Surface Area (Å2)'].max()
+    idx_surface = _index_value(df_f.loc[df_f['Surface Area (Å2)'].idxmax(), 'Index'])
+
+    resultado = {
+        'archivo': name,
+        'promedio_druggability': df_f['drugg_score'].mean(),
+        'conteo_strong': int((df_f['Druggability'] == 'Strong').sum()),
+        'max_drugscore': df_f['DrugScore'].max(),
+        'avg_drugscore': df_f['DrugScore'].mean(),
+        'max_surface_area': max_surface,
+        'index_max_surface': idx_surface,
+        'top3_indices': top3
+    }
+
+    # Línea con los datos clave para el resumen
+    linea = (
+        f"{name}: Top 3 índices por DrugScore = {top3}; "
+        f"Superficie máxima = {max_surface:.2f} (Index {idx_surface})"
+    )
+    return linea, resultado
+
+
+def summarize_file(filepath, tr=telemetry.NULL_TRACE):
+    """Lee un .xlsx y devuelve (linea, resultado) como summarize_frame."""
+    df = pd.read_excel(filepath)
+    tr.mark('read_excel')
+    tr.count('rows', len(df))
+    salida = summarize_frame(df, os.path.basename(filepath))
+    tr.mark('metrics')
+    return salida
+
+
+# ----------------------------------------------------------------
+# Manifiesto incremental: huella de contenido y métricas cacheadas
+# ----------------------------------------------------------------
+def _file_sha256(filepath):
+    with open(filepath, 'rb') as fh:
+        return hashlib.file_digest(fh, 'sha256').hexdigest()
+
+
+def _to_builtin(value):
+    # Los escalares de numpy/pandas se guardan como tipos nativos de Python
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Tipo no serializable: {type(value)!r}")
+
+
+def load_manifest(folder):
+    """Devuelve las entradas cacheadas {archivo: entrada} de la carpeta."""
+    path = os.path.join(folder, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    if data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('files', {})
+
+
+def save_manifest(folder, files):
+    """Escribe el manifiesto de forma atómica (archivo temporal + replace)."""
+    path = os.path.join(folder, MANIFEST_NAME)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, fh,
+                  ensure_ascii=False, indent=1, default=_to_builtin)
+    os.replace(tmp, path)
+
+
+def lookup_cached(filepath, cached):
+    """
+    Devuelve la entrada de manifiesto aún válida para filepath, o None.
+
+    Si tamaño y mtime coinciden se reutiliza sin leer el archivo; si no,
+    se compara el hash de contenido (p. ej. tras copiar la carpeta).
+    """
+    if cached is None:
+        return None
+    st = os.stat(filepath)
+    if cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns:
+        return cached
+    if cached['size'] == st.st_size and cached['sha256'] == _file_sha256(filepath):
+        return dict(cached, mtime_ns=st.st_mtime_ns)
+    return None
+
+
+def make_entry(filepath, linea, resultado):
+    """Entrada de manifiesto para un archivo recién procesado."""
+    st = os.stat(filepath)
+    return {
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'sha256': _file_sha256(filepath),
+        'linea': linea,
+        'resultado': resultado,
+    }
+
+
+# --------------------------------
+# Generación del resumen por carpeta
+# --------------------------------
+def write_summary(resumen, entries):
+    """
+    Escribe en el archivo abierto (y en consola) las líneas por archivo y
+    la sección de ganadores por métrica.
+
+    Parámetros:
+    - resumen: archivo de texto abierto en escritura.
+    - entries: lista ordenada de (linea, resultado) por archivo.
+    """
     resultados = []  # Lista para almacenar resultados por archivo
+    for linea, resultado in entries:
+        resumen.write(linea + '\n')
+        print(linea)
+        if resultado is not None:
+            resultados.append(resultado)
+
+    if not resultados:
+        mensaje = "No se encontraron datos válidos en ningún archivo."
+        resumen.write(mensaje + '\n')
+        print(mensaje)
+        return
+
+    # Convertimos a DataFrame para análisis global
+    res_df = pd.DataFrame(resultados)
+    # Seleccionamos los mejores por cada métrica
+    gan_prom = res_df.loc[res_df['promedio_druggability'].idxmax()]
+    gan_strong = res_df.loc[res_df['conteo_strong'].idxmax()]
+    gan_maxds = res_df.loc[res_df['max_drugscore'].idxmax()]
+    gan_avgds = res_df.loc[res_df['avg_drugscore'].idxmax()]
+    gan_surf = res_df.loc[res_df['max_surface_area'].idxmax()]
+
+    # Escribimos tabla de resultados por archivo
+    resumen.write("\nResumen por archivo:\n")
+    resumen.write(
+        res_df[
+            ['archivo', 'promedio_druggability', 'conteo_strong',
+             'max_drugscore', 'avg_drugscore', 'max_surface_area']
+        ].to_string(index=False) + '\n\n'
+    )
+    print("\nResumen por archivo:")
+    print(
+        res_df[
+            ['archivo', 'promedio_druggability', 'conteo_strong',
+             'max_drugscore', 'avg_drugscore', 'max_surface_area']
+        ].to_string(index=False), '\n'
+    )
+
+    # Escribimos cuáles archivos lideran cada métrica
+    resumen.write(
+        f"Mejor promedio de Druggability: {gan_prom['archivo']}"
+        f" ({gan_prom['promedio_druggability']:.2f})\n"
+    )
+    resumen.write(
+        f"Mayor número de Strong:       {gan_strong['archivo']}"
+        f" ({gan_strong['conteo_strong']})\n"
+    )
+    resumen.write(
+        f"DrugScore máximo:            {gan_maxds['archivo']}"
+        f" ({gan_maxds['max_drugscore']})\n"
+    )
+    resumen.write(
+        f"DrugScore promedio:          {gan_avgds['archivo']}"
+        f" ({gan_avgds['avg_drugscore']:.2f})\n"
+    )
+    resumen.write(
+        f"Superficie máxima:           {gan_surf['archivo']}"
+        f" ({gan_surf['max_surface_area']:.2f}, "
+        f"Index {gan_surf['index_max_surface']})\n"
+    )
+
+    # Mostramos por consola los líderes de cada métrica
+    print(f"Mejor promedio de Druggability: {gan_prom['archivo']} ({gan_prom['promedio_druggability']:.2f})")
+    print(f"Mayor número de Strong:       {gan_strong['archivo']} ({gan_strong['conteo_strong']})")
+    print(f"DrugScore máximo:            {gan_maxds['archivo']} ({gan_maxds['max_drugscore']})")
+    print(f"DrugScore promedio:          {gan_avgds['archivo']} ({gan_avgds['avg_drugscore']:.2f})")
+    print(f"Superficie máxima:           {gan_surf['archivo']} ({gan_surf['max_surface_area']:.2f}, "
+          f"Index {gan_surf['index_max_surface']})\n")
+
+
+# ----------------------------------------------------------------
+# Procesamiento de cada carpeta: lectura, filtrado y cálculo de métricas
+# ----------------------------------------------------------------
+def _summarize_entry(filepath):
+    # Unidad de trabajo del pool: lectura del .xlsx y entrada de manifiesto.
+    # La traza vuelve al proceso principal junto con el resultado.
+    tr = telemetry.trace('scoresResume.file', file=os.path.basename(filepath))
+    linea, resultado = summarize_file(filepath, tr)
+    entry = make_entry(filepath, linea, resultado)
+    tr.mark('manifest')
+    return entry, tr.close()
+
+
+def summarize_files(filepaths, workers=1):
+    """
+    Procesa varios .xlsx y devuelve sus entradas de manifiesto en el mismo
+    orden que filepaths.
+
+    Parámetros:
+    - filepaths: lista de archivos a leer.
+    - workers: número de procesos (1 = serie, None = todos los núcleos).
+    """
+    if workers == 1 or len(filepaths) <= 1:
+        salidas = [_summarize_entry(fp) for fp in filepaths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            salidas = list(pool.map(_summarize_entry, filepaths))
+    for _, payload in salidas:
+        telemetry.record(payload)
+    return [entry for entry, _ in salidas]
+
+
+def process_folders(folders, incremental=True, workers=1):
+    """
+    Resume todos los .xlsx de cada carpeta en su resumen.txt.
+
+    Parámetros:
+    - folders: carpetas con los archivos de cavidades.
+    - incremental: si es True, solo se leen los archivos nuevos o
+      modificados según el manifiesto; el resto usa métricas cacheadas.
+    - workers: procesos para leer en paralelo los archivos pendientes de
+      todas las carpetas (1 = serie, None = todos los núcleos).
 
-    # Abrimos el archivo de resumen en modo escritura
-    with open(resumen_path, 'w', encoding='utf-8') as resumen:
-        # Iteramos sobre cada archivo que cumpla el patrón
-        for filepath in glob(pattern):
-            # Leemos el Excel y obtenemos el nombre de archivo
-            df = pd.read_excel(filepath)
+    Los archivos se recorren en orden alfabético y los resúmenes se
+    escriben carpeta por carpeta, así que la salida no depende del orden
+    en que terminen los procesos. Devuelve las rutas de los resúmenes.
+    """
+    # Primera pasada: qué archivos siguen vigentes en el manifiesto
+    plans = []
+    pendientes = []
+    for folder in folders:
+        # Patrón para encontrar todos los archivos .xlsx en la carpeta
+        pattern = os.path.join(folder, '*.xlsx')
+        manifest = load_manifest(folder) if incremental else {}
+        plan = []
+        for filepath in sorted(glob(pattern)):
             name = os.path.basename(filepath)
+            entry = lookup_cached(filepath, manifest.get(name))
+            if entry is None:
+                pendientes.append(filepath)
+            plan.append((name, filepath, entry))
+        plans.append((folder, plan))
+
+    # Segunda pasada: lectura de los pendientes de todas las carpetas a la vez
+    nuevos = dict(zip(pendientes, summarize_files(pendientes, workers)))
+
+    resumenes = []
+    for folder, plan in plans:
+        # Ruta para el archivo de resumen de esta carpeta
+        resumen_path = os.path.join(folder, 'resumen.txt')
+        files = {}
+        entries = []
+        for name, filepath, entry in plan:
+            if entry is None:
+                entry = nuevos[filepath]
+            files[name] = entry
+            entries.append((entry['linea'], entry['resultado']))
+
+        # Abrimos el archivo de resumen en modo escritura
+        with open(resumen_path, 'w', encoding='utf-8') as resumen:
+            write_summary(resumen, entries)
+        save_manifest(folder, files)
+        # Mensaje final indicando la ubicación del archivo resumen
+        print(f"Archivo de resumen generado en: {resumen_path}\n")
+        resumenes.append(resumen_path)
+    return resumenes
+
+
+# ----------------------------------------------------------------
+# Modo dataset: consulta del Parquet tipado de parsingCavityPlus
+# ----------------------------------------------------------------
+# Columnas necesarias para las métricas (el resto no se lee del disco)
+DATASET_COLUMNS = ['SourceFile', 'Index', 'Druggability', 'DrugScore', 'Surface Area (Å2)']
+
+
+def dataset_filters(species=None, structure=None, method=None, relaxed=None):
+    """Filtros de pyarrow para los valores indicados (None = sin filtro)."""
+    filters = []
+    for col, values in (('Species', species), ('Structure', structure),
+                        ('Method', method), ('Relaxed', relaxed)):
+        if values:
+            filters.append((col, 'in', list(values)))
+    return filters or None
+
+
+def process_dataset(root, filters=None, out_dir=None):
+    """
+    Resume el dataset Parquet de cavidades: un resumen por partición
+    (Species, Structure), con el mismo formato que resumen.txt.
+
+    Los filtros se aplican al leer (carpetas de partición descartadas y
+    estadísticas por archivo), y las columnas ya vienen tipadas, así que
+    no hay que leer ni convertir libros de Excel. Devuelve las rutas de
+    los resúmenes.
+    """
+    df = read_dataset(root, filters, DATASET_COLUMNS + PARTITION_COLUMNS)
+    if df.empty:
+        print("El filtro no selecciona ninguna cavidad.")
+        return []
+    out_dir = out_dir or '.'
+    os.makedirs(out_dir, exist_ok=True)
+    resumenes = []
+    for (species, structure), group in df.groupby(PARTITION_COLUMNS, observed=True, sort=True):
+        entries = [summarize_frame(frame, name)
+                   for name, frame in group.groupby('SourceFile', observed=True, sort=True)]
+        resumen_path = os.path.join(out_dir, f"resumen_{species}_{structure}.txt")
+        with open(resumen_path, 'w', encoding='utf-8') as resumen:
+            write_summary(resumen, entries)
+        print(f"Archivo de resumen generado en: {resumen_path}\n")
+        resumenes.append(resumen_path)
+    return resumenes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Resume las cavidades de cada carpeta de modelos en resumen.txt."
+    )
+    parser.add_argument('folders', nargs='*', default=FOLDERS,
+                        help="Carpetas a procesar (por defecto FOLDERS)")
+    parser.add_argument('--full', action='store_true',
+                        help="Ignora el manifiesto y vuelve a leer todos los .xlsx")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Procesos para leer los .xlsx en paralelo (0 = todos los núcleos)")
+    parser.add_argument('--dataset',
+                        help="Lee el dataset Parquet de parsingCavityPlus en lugar de carpetas")
+    parser.add_argument('--species', nargs='+', help="Modo dataset: especies (Human, Anguila)")
+    parser.add_argument('--structure', nargs='+', help="Modo dataset: MON y/o DIM")
+    parser.add_argument('--method', nargs='+', help="Modo dataset: AF, RF, SM y/o MD")
+    parser.add_argument('--relaxed', nargs='+', help="Modo dataset: Base, Relaxed1...")
+    parser.add_argument('--out-dir', help="Modo dataset: carpeta de los resúmenes (por defecto la actual)")
+    args = parser.parse_args(argv)
+
+    if args.dataset:
+        filters = dataset_filters(args.species, args.structure, args.method, args.relaxed)
+        process_dataset(args.dataset, filters, args.out_dir)
+        if telemetry.ENABLED:
+            telemetry.print_summary()
+        return
+
+    process_folders(args.folders, incremental=not args.full,
+                    workers=args.workers or None)
+    if telemetry.ENABLED:
+        telemetry.print_summary()
+
 
-            # --------------------------------------------------
-            # Validación: comprobamos columnas mínimas requeridas
-            # --------------------------------------------------
-            required_cols = {'Index', 'Druggability', 'DrugScore', 'Surface Area (Å2)'}
-            if not required_cols.issubset(df.columns):
-                linea = f"Omitido (faltan columnas): {name}"
-                resumen.write(linea + '\n')
-                print(linea)
-                continue  # Pasamos al siguiente archivo
-
-            # --------------------------------------------------
-            # Filtrado: descartamos cavidades débilmente drogas y puntuaciones negativas
-            # --------------------------------------------------
-            df_f = df[(df['DrugScore'] >= 0) & (df['Druggability'] != 'Weak')].copy()
-            if df_f.empty:
-                linea = f"Sin datos válidos tras filtrar: {name}"
-                resumen.write(linea + '\n')
-                print(linea)
-                continue
-
-            # --------------------------------------------------
-            # Cálculo de métricas por archivo
-            # - Convertimos Druggability a valor numérico
-            # - Obtenemos los top 3 índices según DrugScore
-            # - Calculamos superficie máxima y su índice
-            # --------------------------------------------------
-            df_f['drugg_score'] = df_f['Druggability'].map(drugg_map)
-            top3 = df_f.nlargest(3, 'DrugScore')['Index'].tolist()
-            max_surface = df_f['Surface Area (Å2)'].max()
-            idx_surface = int(df_f.loc[df_f['Surface Area (Å2)'].idxmax(), 'Index'])
-
-            # Guardamos los resultados en la lista
-            resultados.append({
-                'archivo': name,
-                'promedio_druggability': df_f['drugg_score'].mean(),
-                'conteo_strong': int((df_f['Druggability'] == 'Strong').sum()),
-                'max_drugscore': df_f['DrugScore'].max(),
-                'avg_drugscore': df_f['DrugScore'].mean(),
-                'max_surface_area': max_surface,
-                'index_max_surface': idx_surface,
-                'top3_indices': top3
-            })
-
-            # Escribimos en el resumen una línea con los datos clave
-            linea = (
-                f"{name}: Top 3 índices por DrugScore = {top3}; "
-                f"Superficie máxima = {max_surface:.2f} (Index {idx_surface})"
-            )
-            resumen.write(linea + '\n')
-            print(linea)
-
-        # --------------------------------
-        # Generación del resumen final
-        # --------------------------------
-        if not resultados:
-            mensaje = "No se encontraron datos válidos en ningún archivo."
-            resumen.write(mensaje + '\n')
-            print(mensaje)
-        else:
-            # Convertimos a DataFrame para análisis global
-            res_df = pd.DataFrame(resultados)
-            # Seleccionamos los mejores por cada métrica
-            gan_prom = res_df.loc[res_df['promedio_druggability'].idxmax()]
-            gan_strong = res_df.loc[res_df['conteo_strong'].idxmax()]
-            gan_maxds = res_df.loc[res_df['max_drugscore'].idxmax()]
-            gan_avgds = res_df.loc[res_df['avg_drugscore'].idxmax()]
-            gan_surf = res_df.loc[res_df['max_surface_area'].idxmax()]
-
-            # Escribimos tabla de resultados por archivo
-            resumen.write("\nResumen por archivo:\n")
-            resumen.write(
-                res_df[
-                    ['archivo', 'promedio_druggability', 'conteo_strong',
-                     'max_drugscore', 'avg_drugscore', 'max_surface_area']
-                ].to_string(index=False) + '\n\n'
-            )
-            print("\nResumen por archivo:")
-            print(
-                res_df[
-                    ['archivo', 'promedio_druggability', 'conteo_strong',
-                     'max_drugscore', 'avg_drugscore', 'max_surface_area']
-                ].to_string(index=False), '\n'
-            )
-
-            # Escribimos cuáles archivos lideran cada métrica
-            resumen.write(
-                f"Mejor promedio de Druggability: {gan_prom['archivo']}"
-                f" ({gan_prom['promedio_druggability']:.2f})\n"
-            )
-            resumen.write(
-                f"Mayor número de Strong:       {gan_strong['archivo']}"
-                f" ({gan_strong['conteo_strong']})\n"
-            )
-            resumen.write(
-                f"DrugScore máximo:            {gan_maxds['archivo']}"
-                f" ({gan_maxds['max_drugscore']})\n"
-            )
-            resumen.write(
-                f"DrugScore promedio:          {gan_avgds['archivo']}"
-                f" ({gan_avgds['avg_drugscore']:.2f})\n"
-            )
-            resumen.write(
-                f"Superficie máxima:           {gan_surf['archivo']}"
-                f" ({gan_surf['max_surface_area']:.2f}, "
-                f"Index {gan_surf['index_max_surface']})\n"
-            )
-
-            # Mostramos por consola los líderes de cada métrica
-            print(f"Mejor promedio de Druggability: {gan_prom['archivo']} ({gan_prom['promedio_druggability']:.2f})")
-            print(f"Mayor número de Strong:       {gan_strong['archivo']} ({gan_strong['conteo_strong']})")
-            print(f"DrugScore máximo:            {gan_maxds['archivo']} ({gan_maxds['max_drugscore']})")
-            print(f"DrugScore promedio:          {gan_avgds['archivo']} ({gan_avgds['avg_drugscore']:.2f})")
-            print(f"Superficie máxima:           {gan_surf['archivo']} ({gan_surf['max_surface_area']:.2f}, "
-                  f"Index {gan_surf['index_max_surface']})\n")
-
-    # Mensaje final indicando la ubicación del archivo resumen
-    print(f"Archivo de resumen generado en: {resumen_path}\n")
+if __name__ == '__main__':
+    main()
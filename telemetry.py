@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+# ----------------------------------------------------------
+# Configuración: instrumentación opcional (desactivada por defecto)
+# ----------------------------------------------------------
+# NCC_TELEMETRY=1 activa la medición; NCC_TELEMETRY_FILE=ruta.jsonl
+# además guarda cada evento como una línea JSON para análisis offline.
+ENABLED = os.environ.get('NCC_TELEMETRY', '') not in ('', '0')
+JSONL_PATH = os.environ.get('NCC_TELEMETRY_FILE') or None
+# Muestras recientes por (evento, etapa) para los percentiles móviles
+WINDOW = 1000
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=WINDOW))
+_counts = defaultdict(lambda: deque(maxlen=WINDOW))
+_jsonl = None
+
+
+def enable(path=None, window=None):
+    """Activa la telemetría en este proceso (y opcionalmente el volcado JSONL)."""
+    global ENABLED, JSONL_PATH, WINDOW
+    ENABLED = True
+    if path:
+        JSONL_PATH = path
+        os.environ['NCC_TELEMETRY_FILE'] = path
+    if window:
+        WINDOW = window
+    # Los procesos hijos (pools) heredan la configuración por entorno
+    os.environ['NCC_TELEMETRY'] = '1'
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+    os.environ.pop('NCC_TELEMETRY', None)
+
+
+# ----------------------------------------------------------
+# Trazas: tiempos por etapa y conteos de un evento
+# ----------------------------------------------------------
+class Trace:
+    """
+    Mide un evento (p. ej. una llamada a update_ranking o un archivo
+    procesado) como una secuencia de etapas: cada mark(nombre) registra
+    el tiempo transcurrido desde la marca anterior.
+    """
+    __slots__ = ('event', 'meta', 'stages', 'counts', '_t0', '_last')
+
+    def __init__(self, event, **meta):
+        self.event = event
+        self.meta = meta
+        self.stages = {}
+        self.counts = {}
+        self._t0 = self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def count(self, name, value):
+        self.counts[name] = value
+
+    def close(self):
+        """Cierra la traza y la devuelve como diccionario (sin registrarla)."""
+        return {
+            'event': self.event,
+            'ts': time.time(),
+            'pid': os.getpid(),
+            'total': time.perf_counter() - self._t0,
+            'stages': self.stages,
+            'counts': self.counts,
+            **self.meta,
+        }
+
+    def finish(self):
+        """Cierra la traza y la registra en este proceso."""
+        record(self.close())
+
+
+class _NullTrace:
+    # Traza vacía cuando la telemetría está desactivada: coste casi nulo
+    __slots__ = ()
+
+    def mark(self, stage):
+        pass
+
+    def count(self, name, value):
+        pass
+
+    def close(self):
+        return None
+
+    def finish(self):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+def trace(event, **meta):
+    """Nueva traza para event, o NULL_TRACE si la telemetría está desactivada."""
+    return Trace(event, **meta) if ENABLED else NULL_TRACE
+
+
+def record(payload):
+    """
+    Registra una traza cerrada (p. ej. devuelta por un proceso del pool):
+    actualiza las ventanas móviles y la añade al JSONL si está configurado.
+    """
+    global _jsonl
+    if payload is None:
+        return
+    event = payload['event']
+    with _lock:
+        _samples[(event, 'total')].append(payload['total'])
+        for stage, seconds in payload['stages'].items():
+            _samples[(event, stage)].append(seconds)
+        for name, value in payload['counts'].items():
+            _counts[(event, name)].append(value)
+        if JSONL_PATH:
+            if _jsonl is None or _jsonl.name != JSONL_PATH:
+                _jsonl = open(JSONL_PATH, 'a', encoding='utf-8', buffering=1)
+            _jsonl.write(json.dumps(payload, ensure_ascii=False) + '\n')
+
+
+# ----------------------------------------------------------
+# Percentiles móviles
+# ----------------------------------------------------------
+def _percentile(sorted_values, q):
+    # Percentil por rango más cercano sobre valores ya ordenados
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summary():
+    """
+    Percentiles p50/p95/p99 (segundos) por evento y etapa sobre las
+    últimas WINDOW muestras, y la media de cada conteo.
+    """
+    with _lock:
+        samples = {key: sorted(values) for key, values in _samples.items()}
+        counts = {key: list(values) for key, values in _counts.items()}
+    out = defaultdict(lambda: {'stages': {}, 'counts': {}})
+    for (event, stage), values in samples.items():
+        out[event]['stages'][stage] = {
+            'n': len(values),
+            'p50': _percentile(values, 50),
+            'p95': _percentile(values, 95),
+            'p99': _percentile(values, 99),
+        }
+    for (event, name), values in counts.items():
+        out[event]['counts'][name] = sum(values) / len(values)
+    return dict(out)
+
+
+def print_summary():
+    """Muestra por consola el resumen de percentiles (en milisegundos)."""
+    for event, data in summary().items():
+        print(f"[telemetría] {event}")
+        for stage, p in data['stages'].items():
+            print(f"  {stage:24s} n={p['n']:<6d} p50={p['p50'] * 1e3:9.2f} ms "
+                  f"p95={p['p95'] * 1e3:9.2f} ms p99={p['p99'] * 1e3:9.2f} ms")
+        for name, mean in data['counts'].items():
+            print(f"  {name:24s} media={mean:.1f}")
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+import cavityConsensus as cc
+
+
+def random_lists(rng, n, universe=80):
+    lists = []
+    for _ in range(n):
+        k = int(rng.integers(0, 15))
+        residues = rng.choice(universe, size=k, replace=False) + 1
+        lists.append(' '.join(f"{'AB'[r % 2]}:ALA{r}" for r in residues))
+    return lists
+
+
+def test_jaccard_pairs_matches_python_sets(monkeypatch):
+    rng = np.random.default_rng(0)
+    lists = random_lists(rng, 300)
+    groups = rng.integers(0, 40, size=len(lists))
+    sets = [set(text.split()) for text in lists]
+    # Bloques pequeños para recorrer varias iteraciones
+    monkeypatch.setattr(cc, 'BLOCK_WORDS', 64)
+
+    bitsets = cc.ResidueSets(lists)
+    np.testing.assert_array_equal(bitsets.sizes, [len(s) for s in sets])
+    for use_groups in (False, True):
+        i, j, score = cc.jaccard_pairs(bitsets, 0.2, groups if use_groups else None)
+        got = {(a, b): s for a, b, s in zip(i.tolist(), j.tolist(), score.tolist())}
+        want = {}
+        for a in range(len(sets)):
+            for b in range(a + 1, len(sets)):
+                if use_groups and groups[a] == groups[b]:
+                    continue
+                union = len(sets[a] | sets[b])
+                s = len(sets[a] & sets[b]) / union if union else 0.0
+                if s >= 0.2:
+                    want[(a, b)] = s
+        assert got.keys() == want.keys()
+        for key, s in want.items():
+            assert abs(got[key] - s) < 1e-12
+
+
+def test_cavities_with_matches_inverted_scan():
+    rng = np.random.default_rng(1)
+    lists = random_lists(rng, 100)
+    bitsets = cc.ResidueSets(lists)
+    for _ in range(20):
+        residues = rng.choice(len(bitsets.labels), size=3, replace=False)
+        labels = {bitsets.labels[r] for r in residues}
+        want = [c for c, text in enumerate(lists) if labels & set(text.split())]
+        np.testing.assert_array_equal(bitsets.cavities_with(residues), want)
+
+
+def test_residue_tokens_and_ranges():
+    sets = cc.ResidueSets(['A:ALA540 A:GLY541 542-544', 'B:LYS10,11;X12 foo-3 A:ALA542-546'])
+    members = [set(sets.labels[r] for r in sets.cav_res[sets.cav_ptr[c]:sets.cav_ptr[c + 1]])
+               for c in range(2)]
+    # Un rango no es el residuo -544: se expande a 542, 543 y 544
+    assert members[0] == {'A:ALA540', 'A:GLY541', '542', '543', '544'}
+    # 'X12' y 'foo-3' no son residuos
+    assert members[1] == {'B:LYS10', '11', 'A:ALA542', 'A:543', 'A:544', 'A:545', 'A:546'}
+
+
+def test_average_linkage_splits_chained_pockets():
+    # Dos bolsillos vecinos (1-10 y 9-18) unidos por cavidades puente
+    pocket_a = ' '.join(f"A:ALA{r}" for r in range(1, 11))
+    pocket_b = ' '.join(f"A:ALA{r}" for r in range(9, 19))
+    bridge = ' '.join(f"A:ALA{r}" for r in range(5, 15))
+    residues = [pocket_a] * 6 + [pocket_b] * 6 + [bridge]
+    cavities = pd.DataFrame({
+        'SourceFile': [f"AF-model{k:02d}.html" for k in range(len(residues))],
+        'Index': 1,
+        'Method': 'AF',
+        'Residues': residues,
+    })
+    _, single = cc.consensus_pockets(cavities, method='single')
+    assert single['Cavities'].tolist() == [13]
+    assigned, pockets = cc.consensus_pockets(cavities)
+    # La cavidad puente queda en uno de los dos bolsillos
+    assert sorted(pockets['Cavities']) == [6, 7]
+    groups = assigned.groupby('Pocket')['SourceFile'].apply(set).tolist()
+    first = {f"AF-model{k:02d}.html" for k in range(6)}
+    second = {f"AF-model{k:02d}.html" for k in range(6, 12)}
+    assert all(g >= first and not g & second or g >= second and not g & first for g in groups)
+
+
+def test_load_cavities_skips_own_outputs(tmp_path):
+    pd.DataFrame({'Index': [1, 2], 'Residues': ['A:ALA1 A:ALA2', 'A:ALA3']}).to_csv(
+        tmp_path / 'AF-model01.csv', index=False)
+    pd.DataFrame({'Pocket': [1], 'Cavities': [2], 'Core Residues': ['A:ALA1']}).to_csv(
+        tmp_path / 'consenso_bolsillos.csv', index=False)
+    pd.DataFrame({'Pocket': [1], 'SourceFile': ['x'], 'Index': [1], 'Residues': ['A:ALA1']}).to_csv(
+        tmp_path / 'asignaciones.csv', index=False)
+    cavities = cc.load_cavities([str(tmp_path)])
+    assert cavities['SourceFile'].tolist() == ['AF-model01.csv', 'AF-model01.csv']
+    assert cavities['Method'].tolist() == ['AF', 'AF']
@@ -0,0 +1,46 @@
+import os
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import numpy as np
+
+import condensedMatrix as cm
+import heatMaps
+
+
+def test_plot_heatmap_tiles_condensed(monkeypatch, tmp_path):
+    rng = np.random.default_rng(0)
+    cond = rng.random(cm.condensed_size(7)).astype(cm.DTYPE)
+    square = cm.squareform(cond)
+    labels = [f"M{k}" for k in range(7)]
+
+    # Bloques dibujados en cada tile, en orden
+    blocks = []
+    imshow = heatMaps.plt.imshow
+    monkeypatch.setattr(heatMaps.plt, 'imshow',
+                        lambda block, **kw: blocks.append(np.array(block)) or imshow(block, **kw))
+
+    outputs = heatMaps.plot_heatmap_tiles(cond, labels, 'test', str(tmp_path / 'c.png'),
+                                          tile_size=3, workers=1)
+    heatMaps.plot_heatmap_tiles(square, labels, 'test', str(tmp_path / 's.png'), tile_size=3, workers=1)
+
+    # Solo el triángulo superior de tiles (c >= r)
+    assert len(outputs) == 6
+    assert all((tmp_path / f"c_r{r}_c{c}.png").exists() for r in range(3) for c in range(r, 3))
+    assert not (tmp_path / 'c_r1_c0.png').exists()
+    assert len(blocks) == 12
+    for got, want in zip(blocks[:6], blocks[6:]):
+        np.testing.assert_array_equal(got, want)
+    np.testing.assert_array_equal(blocks[1], square[0:3, 3:6])
+    np.testing.assert_array_equal(blocks[4], square[3:6, 6:7])
+
+
+def test_plot_heatmap_tiles_parallel(tmp_path):
+    cond = np.random.default_rng(1).random(cm.condensed_size(9)).astype(cm.DTYPE)
+    labels = [f"M{k}" for k in range(9)]
+    outputs = heatMaps.plot_heatmap_tiles(cond, labels, 'test', str(tmp_path / 'p.png'),
+                                          tile_size=4, workers=2)
+    assert outputs == [str(tmp_path / f"p_r{r}_c{c}.png") for r in range(3) for c in range(r, 3)]
+    assert all(os.path.exists(out) for out in outputs)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import modelRanking
+
+
+def brute_front(matrix):
+    # Definición directa: filas sin ninguna otra >= en todo y > en algo
+    ge = (matrix[None, :, :] >= matrix[:, None, :]).all(axis=2)
+    gt = (matrix[None, :, :] > matrix[:, None, :]).any(axis=2)
+    return np.flatnonzero(~(ge & gt).any(axis=1))
+
+
+@pytest.mark.parametrize('k', [1, 2, 3, 4, 5])
+def test_pareto_front_matches_brute_force(k):
+    rng = np.random.default_rng(k)
+    for trial in range(20):
+        n = int(rng.integers(1, 700))
+        # Valores discretos: muchos empates y filas repetidas
+        matrix = rng.integers(0, 6, size=(n, k)).astype(np.float64)
+        if trial % 2:
+            matrix = rng.normal(size=(n, k))
+        np.testing.assert_array_equal(modelRanking.pareto_front(matrix), brute_front(matrix))
+
+
+def test_pareto_front_anticorrelated():
+    # Casi todos los puntos mutuamente no dominados (peor caso de la mezcla)
+    rng = np.random.default_rng(0)
+    for k in (3, 4):
+        matrix = rng.normal(size=(600, k))
+        matrix[:, -1] = -matrix[:, :-1].sum(axis=1) + rng.normal(scale=0.05, size=600)
+        np.testing.assert_array_equal(modelRanking.pareto_front(matrix), brute_front(matrix))
+
+
+def test_composite_score_ignores_missing():
+    matrix = np.array([[1.0, np.nan], [2.0, 5.0], [3.0, 4.0], [np.nan, np.nan]])
+    score = modelRanking.composite_score(matrix)
+    np.testing.assert_allclose(score[:3], [0.0, 0.75, 0.5])
+    assert np.isnan(score[3])
+
+
+def test_bootstrap_means_matches_loop():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(40, 2))
+    values[3, 1] = np.nan
+    means = modelRanking.bootstrap_means(values, resamples=50, seed=7)
+    idx = np.random.default_rng(7).integers(0, 40, size=(50, 40))
+    for r in range(50):
+        np.testing.assert_allclose(means[r], np.nanmean(values[idx[r]], axis=0))
+
+
+def test_find_criteria_known_columns_only():
+    columns = ['FileName', 'Ramachandran Favored (>98%)', 'Clashscore', 'Rotamer Outliers (%)',
+               'Rotamer Favored (%)', 'Clashscore percentile', 'rotamer notes', 'max_drugscore']
+    assert modelRanking.find_criteria(columns) == {
+        'Ramachandran Favored (>98%)': True,
+        'Clashscore': False,
+        'Rotamer Outliers (%)': False,
+        'Rotamer Favored (%)': True,
+        'max_drugscore': True,
+    }
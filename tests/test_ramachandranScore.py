@@ -0,0 +1,36 @@
+import pytest
+
+import ramachandranScore as rs
+
+
+def row(name):
+    return {rs.COLUMNS[0]: name, rs.COLUMNS[1]: 97.1, rs.COLUMNS[2]: 0.1,
+            rs.COLUMNS[3]: -0.3, rs.COLUMNS[4]: rs.SOURCE}
+
+
+def test_write_rows_appends_new_models_only(tmp_path):
+    path = str(tmp_path / rs.DEFAULT_OUTPUT)
+    assert rs.write_rows([row('a'), row('b')], path) == 2
+    assert rs.write_rows([row('a'), row('c')], path) == 1
+    with open(path, 'rb') as fh:
+        lines = fh.read().split(b'\n')
+    assert lines[-1] == b''
+    assert [line.split(b',')[0] for line in lines[1:-1]] == [b'a', b'b', b'c']
+    assert all(line.endswith(b',local') for line in lines[1:-1])
+
+
+def test_write_rows_keeps_file_line_endings(tmp_path):
+    path = tmp_path / 'RawData.csv'
+    path.write_bytes(b'FileName,Ramachandran Favored (>98%),Clashscore,Source\r\nx,99,1.5,')
+    assert rs.write_rows([row('a')], str(path)) == 1
+    assert path.read_bytes() == (b'FileName,Ramachandran Favored (>98%),Clashscore,Source\r\n'
+                                 b'x,99,1.5,\r\na,97.1,,local\r\n')
+
+
+def test_write_rows_rejects_molprobity_csv(tmp_path):
+    path = tmp_path / 'RawData.csv'
+    original = b'FileName,Ramachandran Favored (>98%),Clashscore\nx,99,1.5\n'
+    path.write_bytes(original)
+    with pytest.raises(ValueError, match='Source'):
+        rs.write_rows([row('a')], str(path))
+    assert path.read_bytes() == original
@@ -0,0 +1,37 @@
+import os
+
+from rawData import LiveData
+
+HEADER = "FileName,Ramachandran Favored (>98%)\n"
+
+
+def test_live_data_partial_and_rewritten_lines(tmp_path):
+    path = str(tmp_path / 'RawData.csv')
+    with open(path, 'w') as fh:
+        fh.write(HEADER + "MON-AF-NCChumano-01-000001,99.0\n"
+                 "MON-AF-NCChumano-02-000002,97.5\nMON-RF-NCC")
+    source = LiveData(path, use_cache=False)
+    # La fila a medio escribir no se parsea todavía
+    assert len(source.load()) == 2
+    assert not source.refresh()
+
+    with open(path, 'a') as fh:
+        fh.write("humano-03-000003,95.0\n")
+    assert source.refresh()
+    assert source.df['FileName'].tolist()[-1] == 'MON-RF-NCChumano-03-000003'
+    assert len(source.df) == 3
+
+    # Corrección con la misma longitud: se recarga aunque el tamaño no cambie
+    with open(path) as fh:
+        text = fh.read()
+    with open(path, 'w') as fh:
+        fh.write(text.replace('99.0', '91.0'))
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert source.refresh()
+    assert source.df.iloc[0]['Ramachandran Favored (>98%)'] == 91.0
+
+    # Solo cambia el mtime: sin recarga
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2))
+    assert not source.refresh()
+    assert len(source.df) == 3
@@ -0,0 +1,36 @@
+import numpy as np
+
+import condensedMatrix as cm
+import rmsdEnsemble
+from benchmarks import synthetic
+
+
+def kabsch_rmsd(P, Q):
+    # Kabsch por par con la rotación explícita
+    P = P - P.mean(axis=0)
+    Q = Q - Q.mean(axis=0)
+    U, _, Vt = np.linalg.svd(P.T @ Q)
+    d = np.sign(np.linalg.det(U @ Vt))
+    R = U @ np.diag([1.0, 1.0, d]) @ Vt
+    return np.sqrt(((P @ R - Q) ** 2).sum(axis=1).mean())
+
+
+def test_rmsd_condensed_matches_pairwise_kabsch():
+    coords = synthetic.ensemble_coords(23, 40, seed=3)
+    # Un modelo especular: fuerza la corrección de reflexión
+    coords[5] = coords[5] * [1.0, 1.0, -1.0]
+    cond = rmsdEnsemble.rmsd_condensed(coords, block_size=5)
+    m = len(coords)
+    want = np.array([kabsch_rmsd(coords[i], coords[j])
+                     for i in range(m) for j in range(i + 1, m)])
+    np.testing.assert_allclose(cond, want, rtol=1e-4, atol=1e-4)
+    for i, j in [(0, 1), (3, 17), (21, 22)]:
+        assert cond[cm.condensed_index(i, j, m)] == cond[cm.condensed_index(j, i, m)]
+
+
+def test_rmsd_matrix_parallel_matches_serial(tmp_path):
+    coords = synthetic.ensemble_coords(30, 25, seed=4)
+    out = str(tmp_path / 'rmsd.npy')
+    parallel = rmsdEnsemble.rmsd_matrix_parallel(coords, out, tile_size=8, workers=2)
+    np.testing.assert_allclose(np.asarray(parallel), rmsdEnsemble.rmsd_condensed(coords),
+                               rtol=1e-6)
@@ -0,0 +1,127 @@
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+
+import columnStore
+import rawData
+import scoresDashboard as sd
+from benchmarks import synthetic
+
+
+def baseline_filter(df, relaxed, structures, software, top_n, protein, models,
+                    relaxation_levels, all_models, models_per_software):
+    # filter_data original: máscaras isin encadenadas, orden y groupby
+    if relaxed:
+        df = df[df['Relaxed'].isin(relaxation_levels)]
+    if structures:
+        df = df[df['Structure'].isin(structures)]
+    if software:
+        df = df[df['Software'].isin(software)]
+    if protein:
+        df = df[df['Protein'].isin(protein)]
+    if models:
+        df = df[df['ModelBase'].isin(models)]
+    if not all_models:
+        df = df.sort_values(by=sd.RAMA_COLUMNS, ascending=sd.RAMA_ASCENDING)
+        df = df.groupby('Software').head(models_per_software)
+    return df
+
+
+def random_filters(rng, n):
+    def some(values):
+        k = rng.integers(0, len(values) + 1)
+        return list(rng.choice(values, size=k, replace=False))
+
+    for _ in range(n):
+        yield (bool(rng.integers(2)), some(synthetic.STRUCTURES), some(synthetic.SOFTWARES + ['XX']),
+               10, some(synthetic.PROTEINS), some(['01', '02', '03', '04', '05']),
+               some(['Base', 'Relaxed1', 'Relaxed2', 'Relaxed3']),
+               bool(rng.integers(2)), int(rng.integers(1, 40)))
+
+
+def test_filter_data_matches_baseline(tmp_path):
+    path = synthetic.write_rawdata_csv(str(tmp_path / 'RawData.csv'), 3000, seed=1)
+    df = sd.load_data(path, use_cache=False)
+    # Empates en el orden Ramachandran para comprobar la estabilidad
+    df.loc[::7, sd.RAMA_COLUMNS] = df.loc[3, sd.RAMA_COLUMNS].to_numpy()
+    plain = df.astype({col: object for col in sd.META_COLUMNS})
+
+    rng = np.random.default_rng(0)
+    for args in random_filters(rng, 200):
+        got = sd.filter_data(df, *args)
+        want = baseline_filter(plain, *args)
+        if args[7]:
+            # Sin orden: mismas filas en el orden original
+            np.testing.assert_array_equal(got.index, want.index)
+        else:
+            np.testing.assert_array_equal(np.sort(got.index), np.sort(want.index))
+            # Mismo orden Ramachandran dentro de cada software
+            for software, rows in want.groupby('Software', sort=False):
+                np.testing.assert_array_equal(
+                    got.index[got['Software'] == software], rows.index)
+
+
+def test_filter_index_store_matches_frame(tmp_path):
+    df = synthetic.rawdata_frame(500, seed=2)
+    path = str(tmp_path / 'RawData.csv')
+    df.to_csv(path, index=False)
+    frame = sd.load_data(path, use_cache=False)
+    arrays, values = sd.filter_arrays(frame)
+    directory = str(tmp_path / 'store')
+    columnStore.build_store(frame, directory, arrays, {'bitmap_values': values})
+    store = columnStore.ColumnStore(directory)
+
+    by_frame, by_store = sd.FilterIndex(frame), sd.FilterIndex(store)
+    rng = np.random.default_rng(1)
+    for args in random_filters(rng, 50):
+        key = sd.normalize_filters(*args[:3], *args[4:])
+        np.testing.assert_array_equal(by_frame.positions(key), by_store.positions(key))
+
+
+def test_rank_page_matches_full_sort():
+    rng = np.random.default_rng(3)
+    rank = rng.permutation(1000)
+    positions = np.sort(rng.choice(1000, size=400, replace=False))
+    full = positions[np.argsort(rank[positions])]
+    for top_n, page in itertools.product([1, 7, 50], [1, 2, 9]):
+        np.testing.assert_array_equal(sd.rank_page(positions, rank, top_n, page),
+                                      full[(page - 1) * top_n:page * top_n])
+
+
+def test_filter_cache_bounded_by_bytes():
+    frame = rawData._add_metadata(synthetic.rawdata_frame(2000, seed=3))
+    limit = 3 * 2000 * 8
+    index = sd.FilterIndex(frame, cache_bytes=limit)
+    for k in range(1, 30):
+        # "Mostrar todos" (n posiciones) alternando con top-k por software
+        software = synthetic.SOFTWARES[k % 4:k % 4 + 1]
+        np.testing.assert_array_equal(index.positions(((('Software', tuple(software)),), None)),
+                                      index._positions(((('Software', tuple(software)),), None)))
+        index.positions(((), None))
+        index.positions(((), k))
+    assert index._cached_bytes <= limit
+    assert index._cached_bytes == sum(pos.nbytes for pos in index._cache.values())
+    assert ((), 29) in index._cache
+
+
+def test_shared_store_follows_selection_version(tmp_path, monkeypatch):
+    path = str(tmp_path / 'RawData.csv')
+    synthetic.write_rawdata_csv(path, 300, seed=4)
+    monkeypatch.setattr(sd, 'SHARED_STORE', True)
+    monkeypatch.setattr(sd, 'file_path', path)
+    monkeypatch.setattr(sd, 'df', None)
+    old = sd.get_data()
+
+    # Otro worker detecta un CSV nuevo, crea su almacén y borra el anterior
+    synthetic.write_rawdata_csv(path, 350, seed=5)
+    new = sd.open_shared_store(path)
+    version = os.path.basename(new.directory)
+    assert not os.path.exists(old.directory)
+
+    selection = dict(sd.encode_filter_key(sd.normalize_filters(
+        False, None, None, None, None, None, True, 10)), version=version)
+    data, positions = sd.selection_positions(selection)
+    assert data.directory == new.directory
+    assert len(positions) == 350
@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+
+import parsingCavityPlus
+import scoresResume
+from benchmarks import synthetic
+
+
+def test_dataset_summary_matches_folders_with_null_index(tmp_path):
+    folder = tmp_path / 'Human' / 'MON'
+    folder.mkdir(parents=True)
+    names = ['AF-NCCHUMANO-01', 'RF-NCCHUMANO-02', 'SM-NCCHUMANO-RELAXED03-03']
+    paths, frames = [], []
+    for k, name in enumerate(names):
+        frame = synthetic.cavity_frame(12, seed=k)
+        frame['Druggability'] = np.where(frame.index % 4 == 0, 'Weak', 'Strong')
+        text = frame.astype(str)
+        if k == 0:
+            # "N/A" en la fila de superficie máxima de la primera página
+            row = frame.loc[frame['Druggability'] != 'Weak', 'Surface Area (Å2)'].idxmax()
+            text.loc[row, 'Index'] = 'N/A'
+            frame['Index'] = frame['Index'].astype(object)
+            frame.loc[row, 'Index'] = 'N/A'
+        frame.to_excel(folder / f"{name}.xlsx", index=False)
+        # Páginas como las deja el parser: texto, con SourceFile
+        text.insert(0, 'SourceFile', f"{name}.xlsx")
+        paths.append(str(tmp_path / 'html' / 'Human' / 'Monomer' / f"{name}.html"))
+        frames.append(text)
+
+    root = str(tmp_path / 'dataset')
+    parsingCavityPlus.write_dataset(paths, frames, root)
+    assert parsingCavityPlus.read_dataset(root)['Index'].dtype == 'Int64'
+
+    [from_folder] = scoresResume.process_folders([str(folder)], incremental=False)
+    [from_dataset] = scoresResume.process_dataset(root, out_dir=str(tmp_path / 'out'))
+    with open(from_folder, encoding='utf-8') as a, open(from_dataset, encoding='utf-8') as b:
+        lines_folder, lines_dataset = a.read(), b.read()
+    assert lines_folder == lines_dataset
+    assert '(Index None)' in lines_folder
+    assert '.0,' not in lines_folder.split('\n')[2]
+    assert os.path.basename(from_dataset) == 'resumen_Human_MON.txt'